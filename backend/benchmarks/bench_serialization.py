@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Per-row serialization cost of list responses: old path vs trusted read path.
+
+Old path: License(**doc) per row, then FastAPI's response_model validation of
+the list and JSON encoding. New path: the projected document dicts encoded
+directly by FastJSONResponse.
+
+Usage (from backend/): python benchmarks/bench_serialization.py [--rows 1000 10000 100000]
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from serialization import FastJSONResponse, TrustedReader  # noqa: E402
+from server import Inspection, License  # noqa: E402
+
+
+def make_license(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "number": f"LO{i:05d}/2024-SP",
+        "type": "LO",
+        "title": "Licença de Operação - Refinaria",
+        "company": "Petróleo do Brasil Ltda",
+        "cnpj": "98.765.432/0001-10",
+        "status": "Ativa",
+        "issue_date": "2023-06-20",
+        "expiry_date": "2028-06-20",
+        "issuing_body": "INEA",
+        "activity_type": "Refino de Petróleo",
+        "description": "Operação de refinaria de petróleo",
+        "tenant_id": "bench",
+        "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+
+
+def make_inspection(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "title": f"Vistoria {i}",
+        "location": "Complexo Industrial - São Bernardo do Campo, SP",
+        "scheduled_date": "2024-07-20",
+        "inspector": "Eng. João Santos",
+        "status": "Concluída",
+        "conformity_percentage": 87.5,
+        "checklist_items": [{"item": f"Item {n}", "status": "Conforme", "evidence": ""} for n in range(20)],
+        "observations": "Necessário atualizar certidões de destinação de resíduos",
+        "tenant_id": "bench",
+        "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+
+
+def old_path(model, adapter, documents: List[dict]) -> bytes:
+    models = [model(**document) for document in documents]
+    validated = adapter.validate_python(models, from_attributes=True)
+    return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+
+def new_path(reader: TrustedReader, documents: List[dict]) -> bytes:
+    return FastJSONResponse(reader.fill_all(documents)).body
+
+
+def measure(fn, rows: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best / rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'model':<12}{'rows':>8}{'old µs/row':>14}{'new µs/row':>14}{'speedup':>10}")
+    for model, factory in ((License, make_license), (Inspection, make_inspection)):
+        adapter = TypeAdapter(List[model])
+        reader = TrustedReader(model)
+        for rows in args.rows:
+            documents = [factory(i) for i in range(rows)]
+            old = measure(lambda: old_path(model, adapter, documents), rows, args.repeat)
+            new = measure(lambda: new_path(reader, documents), rows, args.repeat)
+            print(f"{model.__name__:<12}{rows:>8}{old:>14.2f}{new:>14.2f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
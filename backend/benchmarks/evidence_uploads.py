@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+API latency while a field team uploads a burst of inspection photos.
+
+Runs the load_test.py endpoint mix for a few tenants twice:
+
+  baseline  nothing else running
+  uploads   another tenant pushes --photos JPEGs through the resumable
+            upload API (--upload-concurrency at a time, --chunk-mb chunks)
+
+and reports the mix's p50/p99 in each phase plus the upload throughput and
+how long the last photo took to be hashed and thumbnailed.
+
+Usage (from backend/):
+  python benchmarks/evidence_uploads.py --in-memory --photos 100
+  python benchmarks/evidence_uploads.py --mongo-url mongodb://localhost:27017 --photos 300 --upload-concurrency 32
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from load_test import app_client, build_targets, percentile, run_load, seed  # noqa: E402
+
+
+def make_photos(count: int, size: int):
+    from PIL import Image
+
+    rng = random.Random(0)
+    photos = []
+    for n in range(count):
+        image = Image.effect_noise((size, size * 3 // 4), 40 + rng.randrange(40)).convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=90)
+        photos.append((f"foto-{n:04d}.jpg", buffer.getvalue()))
+    return photos
+
+
+async def upload_burst(client, tenant_id: str, inspection_id: str, photos, concurrency: int, chunk: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    params = {"tenant_id": tenant_id}
+    upload_ids = []
+
+    async def upload(filename: str, data: bytes):
+        async with semaphore:
+            response = await client.post(f"/api/inspections/{inspection_id}/evidence/uploads", params=params,
+                                         json={"filename": filename, "size": len(data), "content_type": "image/jpeg"})
+            response.raise_for_status()
+            upload_id = response.json()["id"]
+            offset = 0
+            while offset < len(data):
+                response = await client.patch(f"/api/evidence/uploads/{upload_id}", params=params,
+                                              headers={"Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream"},
+                                              content=data[offset:offset + chunk])
+                response.raise_for_status()
+                offset = response.json()["offset"]
+            upload_ids.append(upload_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(name, data) for name, data in photos))
+    transferred = time.perf_counter() - started
+    pending = set(upload_ids)
+    failed = 0
+    while pending:
+        for upload_id in list(pending):
+            status = (await client.get(f"/api/evidence/uploads/{upload_id}", params=params)).json()["status"]
+            if status != "processing":
+                pending.discard(upload_id)
+                failed += status != "complete"
+        await asyncio.sleep(0.05)
+    return transferred, time.perf_counter() - started, failed
+
+
+async def main_async(args) -> int:
+    os.environ.setdefault("EVIDENCE_DIR", tempfile.mkdtemp(prefix="gaia-evidence-"))
+    os.environ["EVIDENCE_MAX_CHUNK_MB"] = str(max(1, args.chunk_mb))
+    photos = make_photos(args.photos, args.photo_size)
+    volume = sum(len(data) for _, data in photos) / 1e6
+    async with app_client(args) as (client, _):
+        contexts = await seed(client, args.tenants + 1, args.records)
+        team, others = contexts[0], contexts[1:]
+        targets, _ = build_targets(others[0])
+        response = await client.post("/api/inspections", json={
+            "title": "Vistoria de campo", "location": "Área 1", "scheduled_date": "2024-07-20",
+            "inspector": "Equipe de campo", "status": "Em Andamento", "tenant_id": team["tenant_id"],
+        })
+        inspection_id = response.json()["id"]
+
+        print(f"{'phase':<10}{'requests':>9}{'errs':>7}{'p50 ms':>10}{'p99 ms':>10}")
+        for name in ("baseline", "uploads"):
+            jobs = [run_load(client, targets, others, args.concurrency, args.duration)]
+            if name == "uploads":
+                jobs.append(upload_burst(client, team["tenant_id"], inspection_id, photos,
+                                         args.upload_concurrency, args.chunk_mb * 1024 * 1024))
+            results = await asyncio.gather(*jobs)
+            latencies, errors, _ = results[0]
+            values = sorted(v for series in latencies.values() for v in series)
+            print(f"{name:<10}{len(values):>9}{sum(errors.values()):>7}{percentile(values, 0.5):>10.1f}{percentile(values, 0.99):>10.1f}")
+            if name == "uploads":
+                transferred, processed, failed = results[1]
+                print(f"\n{len(photos)} photos, {volume:.1f} MB: sent in {transferred:.1f}s ({volume / transferred:.1f} MB/s), "
+                      f"all processed after {processed:.1f}s, {failed} failed")
+                return 1 if failed else 0
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API latency during a burst of evidence uploads")
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--in-memory", action="store_true", help="use the mongomock-motor stand-in")
+    backend.add_argument("--mongo-url", help="local mongod for an in-process app")
+    parser.add_argument("--db-name", default="gaia_bench")
+    parser.add_argument("--tenants", type=int, default=3, help="tenants running the endpoint mix")
+    parser.add_argument("--records", type=int, default=500, help="records per module per tenant")
+    parser.add_argument("--concurrency", type=int, default=8, help="endpoint mix concurrent clients")
+    parser.add_argument("--photos", type=int, default=100)
+    parser.add_argument("--photo-size", type=int, default=1600, help="photo width in pixels")
+    parser.add_argument("--upload-concurrency", type=int, default=16)
+    parser.add_argument("--chunk-mb", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of endpoint mix per phase")
+    args = parser.parse_args()
+    args.base_url = None
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
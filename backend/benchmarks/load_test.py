@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for every /api endpoint.
+
+Targets are generated from the app's routes (all lazy routers loaded): one per
+method and path, reads and writes alike, plus a few query variants. Routes it
+cannot drive (streams, multipart uploads, ids the seed does not produce) are
+listed as skipped. Whole-tenant rebuilds, batches and exports are picked
+BULK_WEIGHT as often as the rest.
+
+Seeds N tenants x M records through /api/seed-data?records=M, drives
+concurrent async load and reports p50/p95/p99 latency, throughput and RSS.
+A run can be saved as a baseline and later runs fail on regressions.
+
+Backends:
+  --in-memory              in-process app on a mongomock-motor stand-in
+  --mongo-url URL          in-process app on a local mongod
+  --base-url URL           an already running server (e.g. several workers)
+
+In-process runs go through the app's lifespan (index reconciliation,
+background services). The stand-in lacks $unionWith, so there the compliance
+view is computed by union_dashboard_stats instead.
+
+Usage (from backend/):
+  python benchmarks/load_test.py --in-memory --tenants 2 --records 2000 --duration 15
+  python benchmarks/load_test.py --mongo-url mongodb://localhost:27017 --save-baseline benchmarks/baseline.json
+  python benchmarks/load_test.py --mongo-url mongodb://localhost:27017 --baseline benchmarks/baseline.json
+  python benchmarks/load_test.py --base-url http://localhost:8001 --no-writes
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Routes the load test does not drive, with the reason
+SKIPPED_ROUTES = {
+    ("POST", "/api/seed-data"): "setup",
+    ("GET", "/api/events"): "event stream, never completes",
+    ("POST", "/api/reports"): "queues a background job, capped per tenant",
+    ("DELETE", "/api/portfolios/{portfolio_id}"): "would remove the portfolio the other targets read",
+}
+# Required query parameters the targets know how to fill, from the tenant context
+QUERY_VALUES: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "location": lambda t: t["station"],
+    "parameter": lambda t: "ph_level",
+    "start": lambda t: "2000-01-01T00:00:00",
+    "end": lambda t: "2100-01-01T00:00:00",
+    "q": lambda t: "licença",
+    "year": lambda t: datetime.now(timezone.utc).year,
+}
+# Extra targets for list reads with optional parameters
+VARIANTS = [
+    ("/api/licenses", "status", {"status": "Ativa"}),
+    ("/api/licenses", "fields=*", {"fields": "*"}),
+    ("/api/inspections", "fields=*", {"fields": "*"}),
+]
+# Module used for /{module} routes
+DEFAULT_MODULE = "licenses"
+BATCH_ROWS = 20
+BULK_WEIGHT = 0.1
+
+
+class Target(NamedTuple):
+    name: str
+    method: str
+    path: str
+    weight: float
+    # httpx request arguments for a tenant context; None when there is nothing to do yet
+    request: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+    record: Optional[Callable[[Dict[str, Any], httpx.Response], None]] = None
+
+
+def _owner(path: str) -> str:
+    """The path segment after /api/, which names the records its ids belong to."""
+    return path.split("/")[2]
+
+
+def _path_values(method: str, path: str, context: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    values = {}
+    for name in re.findall(r"{(\w+)}", path):
+        if name == "module":
+            values[name] = DEFAULT_MODULE
+        elif method == "DELETE" and _owner(path) in context["created"]:
+            # deletes consume records created by the POST targets
+            created = context["created"][_owner(path)]
+            if not created:
+                return None
+            values[name] = created.pop()
+        elif _owner(path) in context["ids"]:
+            values[name] = context["ids"][_owner(path)]
+        else:
+            return None
+    return values
+
+
+def _body_builder(method: str, path: str, modules: Dict[str, Any]) -> Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    """httpx body arguments for routes that take one, or None when unknown."""
+    module = _owner(path)
+    if module in modules:
+        if (method, path) == ("POST", f"/api/{module}"):
+            return lambda t: {"json": {**t["samples"][module], "tenant_id": t["tenant_id"]}}
+        if method == "PATCH":
+            return lambda t: {"json": t["samples"][module]}
+        if (method, path) == ("POST", "/api/water-monitoring/batch"):
+            return lambda t: {"json": [t["samples"][module]] * BATCH_ROWS}
+        if (method, path) == ("POST", f"/api/{module}/batch"):
+            return lambda t: {"json": {"operations": [{"op": "create", "data": t["samples"][module]}] * BATCH_ROWS}}
+    if (method, path) == ("PUT", "/api/water-monitoring/limits"):
+        return lambda t: {"json": t["limits"]}
+    if (method, path) == ("PUT", "/api/portfolios/{portfolio_id}"):
+        return lambda t: {"json": {"name": "bench", "tenant_ids": [t["tenant_id"]]}}
+    if (method, path) == ("POST", "/api/sync"):
+        return lambda t: {"json": {"mutations": [
+            {"module": DEFAULT_MODULE, "op": "upsert", "id": str(uuid.uuid4()), "data": t["samples"][DEFAULT_MODULE]},
+        ]}}
+    return None
+
+
+def _target(name: str, method: str, path: str, weight: float, query: Dict[str, Callable], body, record=None) -> Target:
+    def request(context):
+        values = _path_values(method, path, context)
+        if values is None:
+            return None
+        params = {"tenant_id": context["tenant_id"], **{k: build(context) for k, build in query.items()}}
+        return {"url": path.format(**values), "params": params, **(body(context) if body else {})}
+    return Target(name, method, path, weight, request, record)
+
+
+def _record_created(module: str) -> Callable[[Dict[str, Any], httpx.Response], None]:
+    def record(context, response):
+        if response.status_code < 400:
+            context["created"][module].append(response.json()["id"])
+    return record
+
+
+def import_server():
+    """The app module with every lazy router loaded; its routes define the targets."""
+    # against --base-url only the routes are needed; the app never connects
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    import server
+
+    server.lazy_routers.load_all()
+    return server
+
+
+def build_targets(context: Dict[str, Any], writes: bool = True) -> Tuple[List[Target], List[str]]:
+    """One target per method and /api path of the app, plus VARIANTS.
+
+    ``context`` is a seeded tenant context, used to tell which path ids can be
+    filled. Returns the targets and the skipped routes with the reason.
+    """
+    from fastapi.routing import APIRoute
+
+    server = import_server()
+    modules = server.MODULES
+    targets: List[Target] = []
+    skipped: List[str] = []
+    for route in server.app.routes:
+        if not isinstance(route, APIRoute) or not route.path.startswith("/api/"):
+            continue
+        for method in sorted(route.methods - {"HEAD", "OPTIONS"}):
+            name = f"{method} {route.path}"
+            reason = SKIPPED_ROUTES.get((method, route.path))
+            if reason is None and not writes and method != "GET":
+                reason = "write (--no-writes)"
+            missing = [p.name for p in route.dependant.query_params
+                       if p.required and p.name != "tenant_id" and p.name not in QUERY_VALUES]
+            if reason is None and missing:
+                reason = f"no value for {', '.join(missing)}"
+            body = _body_builder(method, route.path, modules) if method != "GET" else None
+            if reason is None and route.dependant.body_params and body is None:
+                reason = "request body unknown"
+            # deletes wait for created records; other ids must exist in the seed
+            consumes_created = method == "DELETE" and _owner(route.path) in context["created"]
+            if reason is None and not consumes_created and _path_values(method, route.path, context) is None:
+                reason = "no id for the path in the seeded data"
+            if reason:
+                skipped.append(f"{name}: {reason}")
+                continue
+            # server.is_bulk_route, which needs a request
+            bulk = (route.path in server.BULK_ROUTES or route.path.endswith("/batch") or route.path.endswith("/export")
+                    or (method != "GET" and route.path in server.BULK_WRITE_ROUTES))
+            query = {p.name: QUERY_VALUES[p.name] for p in route.dependant.query_params
+                     if p.required and p.name != "tenant_id"}
+            record = _record_created(_owner(route.path)) if (method, route.path) == ("POST", f"/api/{_owner(route.path)}") and _owner(route.path) in modules else None
+            targets.append(_target(name, method, route.path, BULK_WEIGHT if bulk else 1.0, query, body, record))
+            if method == "GET":
+                for path, variant, params in VARIANTS:
+                    if path == route.path:
+                        extra = {k: (lambda t, v=v: v) for k, v in params.items()}
+                        targets.append(_target(f"{name}?{variant}", method, path, 1.0, {**query, **extra}, None))
+    return targets, skipped
+
+
+async def union_dashboard_stats(db, tenant_id: str) -> Dict[str, Any]:
+    """dashboard.aggregate_dashboard_stats for the stand-in, which lacks $unionWith.
+
+    Each collection's branch runs on its own and the final $facet runs over
+    their union in a scratch collection.
+    """
+    from dashboard import DASHBOARD_COLLECTIONS, _branch, build_stats_pipeline, summarize
+
+    today = datetime.now(timezone.utc).date().isoformat()
+    rows: List[Dict[str, Any]] = []
+    for collection_name in DASHBOARD_COLLECTIONS:
+        rows += await db[collection_name].aggregate(_branch(collection_name, tenant_id, today)).to_list(None)
+    if not rows:
+        return summarize({})
+    scratch = db[f"bench_union_{uuid.uuid4().hex}"]
+    try:
+        await scratch.insert_many(rows)
+        result = await scratch.aggregate(build_stats_pipeline(tenant_id, today)[-1:]).to_list(1)
+    finally:
+        await scratch.drop()
+    return summarize(result[0] if result else {})
+
+
+def rss_mb() -> Tuple[float, float]:
+    current = 0.0
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return current, peak
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+@asynccontextmanager
+async def app_client(args) -> AsyncIterator[Tuple[httpx.AsyncClient, Optional[Any]]]:
+    """A client for the app and, in-process, the ``server`` module after its lifespan started."""
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+            yield client, None
+        return
+
+    os.environ["DB_NAME"] = args.db_name
+    # a few tenants carry the whole load here; per-tenant limits would
+    # measure the limiter, not the endpoints (noisy_neighbour.py covers them)
+    os.environ.setdefault("TENANT_RATE_LIMIT", "1000000")
+    os.environ.setdefault("TENANT_BURST", "1000000")
+    os.environ.setdefault("TENANT_MAX_CONCURRENCY", "100000")
+    os.environ.setdefault("DEADLINE_SCHEDULER_ENABLED", "false")
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+    server = import_server()
+
+    if args.in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--in-memory requires mongomock-motor (pip install mongomock-motor)")
+        server.use_client(AsyncMongoMockClient())
+    else:
+        server.use_client(server.create_client())
+    async with server.lifespan(server.app):
+        if args.in_memory:
+            server.compliance_scores.compute = union_dashboard_stats
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            yield client, server
+
+
+async def seed(client: httpx.AsyncClient, tenants: int, records: int) -> List[Dict[str, Any]]:
+    """Seed each tenant and collect what the targets need: an id and a sample record per module, a portfolio, water limits."""
+    from ingest import PROTECTED_FIELDS
+
+    modules = import_server().MODULES
+    contexts = []
+    for n in range(tenants):
+        tenant_id = f"bench-{n}"
+        params = {"tenant_id": tenant_id}
+        response = await client.post("/api/seed-data", params={**params, "records": records})
+        response.raise_for_status()
+        context: Dict[str, Any] = {"tenant_id": tenant_id, "ids": {}, "samples": {}, "created": {}}
+        for module in modules:
+            response = await client.get(f"/api/{module}", params={**params, "limit": 1, "fields": "*"})
+            response.raise_for_status()
+            for document in response.json()[:1]:
+                context["ids"][module] = document["id"]
+                context["samples"][module] = {k: v for k, v in document.items() if k not in PROTECTED_FIELDS}
+            context["created"][module] = []
+        context["station"] = context["samples"].get("water-monitoring", {}).get("location", "")
+        response = await client.put(f"/api/portfolios/{tenant_id}", params=params,
+                                    json={"name": "bench", "tenant_ids": [tenant_id]})
+        response.raise_for_status()
+        context["ids"]["portfolios"] = tenant_id
+        response = await client.get("/api/water-monitoring/limits", params=params)
+        response.raise_for_status()
+        context["limits"] = {k: v for k, v in response.json().items() if k != "limits"}
+        contexts.append(context)
+    return contexts
+
+
+async def run_load(client, targets: List[Target], contexts, concurrency: int, duration: float):
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    deadline = time.perf_counter() + duration
+    rng = random.Random(0)
+    weights = [target.weight for target in targets]
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            target = rng.choices(targets, weights)[0]
+            context = rng.choice(contexts)
+            request = target.request(context)
+            if request is None:
+                await asyncio.sleep(0)
+                continue
+            started = time.perf_counter()
+            try:
+                response = await client.request(target.method, **request)
+                await response.aread()
+                ok = response.status_code < 400
+                if target.record:
+                    target.record(context, response)
+            except httpx.HTTPError:
+                ok = False
+            latencies[target.name].append((time.perf_counter() - started) * 1000)
+            if not ok:
+                errors[target.name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(latencies, errors, elapsed: float) -> Dict[str, Any]:
+    endpoints = {}
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "p50_ms": round(percentile(values, 0.50), 2),
+            "p95_ms": round(percentile(values, 0.95), 2),
+            "p99_ms": round(percentile(values, 0.99), 2),
+        }
+    total = sum(len(v) for v in latencies.values())
+    current, peak = rss_mb()
+    return {
+        "requests": total,
+        "errors": sum(errors.values()),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "rss_mb": round(current, 1),
+        "peak_rss_mb": round(peak, 1),
+        "endpoints": endpoints,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{'endpoint':<56}{'reqs':>8}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:<56}{stats['requests']:>8}{stats['errors']:>6}"
+              f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    print(f"\nthroughput: {report['throughput_rps']} req/s   requests: {report['requests']}   "
+          f"errors: {report['errors']}   RSS: {report['rss_mb']} MB (peak {report['peak_rss_mb']} MB)")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    if report["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput {report['throughput_rps']} < baseline {baseline['throughput_rps']}")
+    for name, stats in report["endpoints"].items():
+        reference = baseline["endpoints"].get(name)
+        if reference is None:
+            continue
+        if stats["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {stats['p95_ms']} ms > baseline {reference['p95_ms']} ms")
+        if stats["errors"] and not reference["errors"]:
+            regressions.append(f"{name}: {stats['errors']} errors (baseline had none)")
+    return regressions
+
+
+async def main_async(args) -> int:
+    async with app_client(args) as (client, _):
+        seeded = time.perf_counter()
+        contexts = await seed(client, args.tenants, args.records)
+        print(f"seeded {args.tenants} tenants x {args.records} records/module in {time.perf_counter() - seeded:.1f}s")
+
+        targets, skipped = build_targets(contexts[0], writes=not args.no_writes)
+        for line in skipped:
+            print(f"skipped {line}")
+        if args.only:
+            targets = [t for t in targets if t.name in args.only or t.path in args.only]
+        if not targets:
+            sys.exit("no targets to run")
+
+        if args.warmup:
+            await run_load(client, targets, contexts, args.concurrency, args.warmup)
+        latencies, errors, elapsed = await run_load(client, targets, contexts, args.concurrency, args.duration)
+
+    report = summarize(latencies, errors, elapsed)
+    report["config"] = {k: getattr(args, k) for k in ("tenants", "records", "concurrency", "duration")}
+    print_report(report)
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+        print(f"baseline saved to {args.save_baseline}")
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print("no regressions against baseline")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GaiaSystem API load test")
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--in-memory", action="store_true", help="use the mongomock-motor stand-in")
+    backend.add_argument("--mongo-url", help="local mongod for an in-process app")
+    backend.add_argument("--base-url", help="hit a running server instead of an in-process app")
+    parser.add_argument("--db-name", default="gaia_bench")
+    parser.add_argument("--tenants", type=int, default=2)
+    parser.add_argument("--records", type=int, default=1000, help="records per module per tenant")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load first")
+    parser.add_argument("--only", nargs="+", help='restrict to these targets, by name ("GET /api/licenses") or path')
+    parser.add_argument("--no-writes", action="store_true", help="drive reads only (e.g. against a shared --base-url)")
+    parser.add_argument("--json-out", help="write the report as JSON")
+    parser.add_argument("--save-baseline", help="store this run as the baseline")
+    parser.add_argument("--baseline", help="compare against a stored baseline")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed relative p95/throughput regression (default 0.25)")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Quiet tenants' latency while one tenant pulls 1000-row pages in a loop.
+
+Runs the load_test.py endpoint mix for the quiet tenants twice, each time
+alongside a noisy tenant hammering /api/licenses?limit=1000:
+
+  unlimited  the noisy tenant's limits are lifted through its ``tenants`` document
+  limited    the noisy tenant falls back to the default per-tenant limits
+
+and reports the quiet tenants' p50/p99 and how many noisy requests were served
+or throttled in each phase.
+
+Usage (from backend/):
+  python benchmarks/noisy_neighbour.py --in-memory --duration 10
+  python benchmarks/noisy_neighbour.py --mongo-url mongodb://localhost:27017 --noisy-concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from load_test import app_client, build_targets, percentile, run_load, seed  # noqa: E402
+
+UNLIMITED = {"rate": 1e9, "burst": 1e9, "max_concurrency": 100000}
+
+
+async def hammer(client, tenant_id: str, concurrency: int, duration: float) -> Counter:
+    statuses: Counter = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            response = await client.get("/api/licenses", params={"tenant_id": tenant_id, "limit": 1000})
+            await response.aread()
+            statuses[response.status_code] += 1
+            if response.status_code == 429:
+                # a well-behaved client honours Retry-After; a noisy one barely waits
+                await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return statuses
+
+
+async def phase(client, server, name: str, args, targets, quiet, noisy) -> None:
+    if name == "unlimited":
+        await server.db.tenants.update_one({"tenant_id": noisy["tenant_id"]}, {"$set": {"limits": UNLIMITED}}, upsert=True)
+    else:
+        await server.db.tenants.delete_one({"tenant_id": noisy["tenant_id"]})
+    server.tenant_directory.invalidate(noisy["tenant_id"])
+
+    (latencies, errors, _), statuses = await asyncio.gather(
+        run_load(client, targets, quiet, args.concurrency, args.duration),
+        hammer(client, noisy["tenant_id"], args.noisy_concurrency, args.duration),
+    )
+    values = sorted(v for series in latencies.values() for v in series)
+    print(f"{name:<10}{len(values):>9}{sum(errors.values()):>7}{percentile(values, 0.5):>10.1f}"
+          f"{percentile(values, 0.99):>10.1f}{statuses.get(200, 0):>10}{statuses.get(429, 0):>10}")
+
+
+async def main_async(args) -> int:
+    # defaults the noisy tenant gets in the "limited" phase
+    os.environ.setdefault("TENANT_RATE_LIMIT", str(args.rate))
+    os.environ.setdefault("TENANT_BURST", str(args.rate * 2))
+    os.environ.setdefault("TENANT_MAX_CONCURRENCY", str(args.max_concurrency))
+    async with app_client(args) as (client, server):
+        if server is None:
+            sys.exit("needs an in-process app (--in-memory or --mongo-url) to switch the noisy tenant's limits")
+        contexts = await seed(client, args.tenants + 1, args.records)
+        noisy, quiet = contexts[0], contexts[1:]
+        targets, _ = build_targets(quiet[0])
+        # the quiet tenants' closed-loop clients are not what is being limited
+        for context in quiet:
+            await server.db.tenants.update_one({"tenant_id": context["tenant_id"]}, {"$set": {"limits": UNLIMITED}}, upsert=True)
+            server.tenant_directory.invalidate(context["tenant_id"])
+        print(f"{'phase':<10}{'quiet rq':>9}{'errs':>7}{'p50 ms':>10}{'p99 ms':>10}{'noisy ok':>10}{'noisy 429':>10}")
+        for name in ("unlimited", "limited"):
+            await phase(client, server, name, args, targets, quiet, noisy)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-tenant limits against a noisy neighbour")
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--in-memory", action="store_true", help="use the mongomock-motor stand-in")
+    backend.add_argument("--mongo-url", help="local mongod for an in-process app")
+    parser.add_argument("--db-name", default="gaia_bench")
+    parser.add_argument("--tenants", type=int, default=3, help="quiet tenants")
+    parser.add_argument("--records", type=int, default=1000, help="records per module per tenant")
+    parser.add_argument("--concurrency", type=int, default=8, help="quiet tenants' concurrent clients")
+    parser.add_argument("--noisy-concurrency", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=20.0, help="default TENANT_RATE_LIMIT for the run")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="default TENANT_MAX_CONCURRENCY for the run")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    args = parser.parse_args()
+    args.base_url = None
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Worker startup cost: import time of ``server`` and time to first request.
+
+Import time comes from ``python -X importtime -c "import server"`` in a fresh
+interpreter (median of --runs), with the heaviest top-level packages listed.
+Modules that must stay out of ``import server`` (pandas/numpy are only
+needed by the water-quality evaluation, PIL by evidence thumbnails, the
+feature services by the lifespan that starts them) fail the run when they
+show up. Time to first request starts a uvicorn process and measures from
+spawn to the first 200 on /api/, then the first request to a lazily loaded
+router (see lazy_routes.py).
+
+A run can be saved as a baseline and later runs fail on regressions, or be
+held to absolute limits with --max-import-ms / --max-first-request-ms.
+
+Backends for the first-request measurement:
+  --in-memory              uvicorn on a mongomock-motor stand-in
+  --mongo-url URL          uvicorn on a local mongod
+
+Usage (from backend/):
+  python benchmarks/startup.py --in-memory
+  python benchmarks/startup.py --in-memory --max-import-ms 1500 --max-first-request-ms 4000
+  python benchmarks/startup.py --mongo-url mongodb://localhost:27017 --save-baseline benchmarks/startup_baseline.json
+  python benchmarks/startup.py --mongo-url mongodb://localhost:27017 --baseline benchmarks/startup_baseline.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+FORBIDDEN_MODULES = ["pandas", "numpy", "PIL", "reports", "report_writers", "evidence", "compliance", "indexes"]
+
+# Serves the app on the mongomock stand-in; the lifespan keeps an injected client
+IN_MEMORY_SERVER = """
+import sys
+import uvicorn
+from mongomock_motor import AsyncMongoMockClient
+import server
+server.use_client(AsyncMongoMockClient())
+uvicorn.run(server.app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+
+def server_env(args) -> Dict[str, str]:
+    return {
+        **os.environ,
+        # the in-memory stand-in never connects; report workers only get the url
+        "MONGO_URL": args.mongo_url or "mongodb://localhost:27017",
+        "DB_NAME": args.db_name,
+        "DEADLINE_SCHEDULER_ENABLED": "false",
+        "PYTHONPATH": str(BACKEND_DIR),
+    }
+
+
+def parse_importtime(stderr: str) -> Dict[str, Any]:
+    """Total import time of ``server`` and self time summed per top-level package, in ms."""
+    total = None
+    packages: Dict[str, float] = defaultdict(float)
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        module = name.strip()
+        modules.add(module)
+        packages[module.split(".")[0]] += int(self_us) / 1000
+        # the outermost import is indented by one space only
+        if name.rstrip() == " server":
+            total = int(cumulative_us) / 1000
+    if total is None:
+        raise RuntimeError("importtime output has no entry for server")
+    return {"total_ms": total, "packages": dict(packages), "modules": modules}
+
+
+def measure_import(args) -> Dict[str, Any]:
+    runs = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import server"],
+            cwd=BACKEND_DIR, env=server_env(args), capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import server failed:\n{result.stderr[-2000:]}")
+        runs.append(parse_importtime(result.stderr))
+    median = statistics.median(run["total_ms"] for run in runs)
+    last = runs[-1]
+    top = sorted(last["packages"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+    forbidden = sorted(
+        name for name in args.forbid
+        if any(module == name or module.startswith(name + ".") for module in last["modules"])
+    )
+    return {"import_ms": round(median, 1), "top_packages": {name: round(ms, 1) for name, ms in top}, "forbidden": forbidden}
+
+
+def wait_for(client: httpx.Client, path: str, params: Dict[str, str], deadline: float) -> None:
+    while time.monotonic() < deadline:
+        try:
+            response = client.get(path, params=params)
+            if response.status_code == 200:
+                return
+            raise RuntimeError(f"GET {path} answered {response.status_code}: {response.text[:200]}")
+        except httpx.TransportError:
+            time.sleep(0.01)
+    raise RuntimeError(f"GET {path} did not answer in time")
+
+
+def measure_first_request(args) -> Dict[str, Any]:
+    if args.in_memory:
+        command = [sys.executable, "-c", IN_MEMORY_SERVER, str(args.port)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1",
+                   "--port", str(args.port), "--log-level", "warning"]
+    samples: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(args.runs):
+        started = time.monotonic()
+        process = subprocess.Popen(command, cwd=BACKEND_DIR, env=server_env(args),
+                                   stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=30) as client:
+                wait_for(client, "/api/", {}, started + args.timeout)
+                samples["first_request_ms"].append((time.monotonic() - started) * 1000)
+                loaded = time.monotonic()
+                wait_for(client, args.lazy_path, {"tenant_id": "bench-startup"}, loaded + args.timeout)
+                samples["first_lazy_request_ms"].append((time.monotonic() - loaded) * 1000)
+        finally:
+            process.terminate()
+            process.wait(10)
+    return {name: round(statistics.median(values), 1) for name, values in samples.items()}
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"import server:           {report['import_ms']:>8.1f} ms (median of {report['config']['runs']})")
+    print(f"time to first request:   {report['first_request_ms']:>8.1f} ms")
+    print(f"first lazy route:        {report['first_lazy_request_ms']:>8.1f} ms ({report['config']['lazy_path']})")
+    print("\nheaviest packages (self time, ms):")
+    for name, ms in report["top_packages"].items():
+        print(f"  {name:<28}{ms:>8.1f}")
+
+
+def check(report: Dict[str, Any], args, baseline: Optional[Dict[str, Any]]) -> List[str]:
+    regressions = [f"{name} is imported at startup" for name in report["forbidden"]]
+    if args.max_import_ms is not None and report["import_ms"] > args.max_import_ms:
+        regressions.append(f"import {report['import_ms']} ms > limit {args.max_import_ms} ms")
+    if args.max_first_request_ms is not None and report["first_request_ms"] > args.max_first_request_ms:
+        regressions.append(f"first request {report['first_request_ms']} ms > limit {args.max_first_request_ms} ms")
+    if baseline:
+        for metric in ("import_ms", "first_request_ms", "first_lazy_request_ms"):
+            if report[metric] > baseline[metric] * (1 + args.max_regression):
+                regressions.append(f"{metric} {report[metric]} > baseline {baseline[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GaiaSystem API startup benchmark")
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--in-memory", action="store_true", help="use the mongomock-motor stand-in")
+    backend.add_argument("--mongo-url", help="local mongod")
+    parser.add_argument("--db-name", default="gaia_bench")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for an answer")
+    parser.add_argument("--lazy-path", default="/api/reports", help="route of a lazily loaded router")
+    parser.add_argument("--verbose", action="store_true", help="show the server's log output")
+    parser.add_argument("--top", type=int, default=10, help="packages listed by import time")
+    parser.add_argument("--forbid", nargs="*", default=FORBIDDEN_MODULES, help="modules that must not load at startup")
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-first-request-ms", type=float)
+    parser.add_argument("--json-out", help="write the report as JSON")
+    parser.add_argument("--save-baseline", help="store this run as the baseline")
+    parser.add_argument("--baseline", help="compare against a stored baseline")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed relative regression against the baseline (default 0.25)")
+    args = parser.parse_args()
+
+    report = {**measure_import(args), **measure_first_request(args)}
+    report["config"] = {"runs": args.runs, "lazy_path": args.lazy_path, "backend": "in-memory" if args.in_memory else "mongod"}
+    print_report(report)
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+        print(f"baseline saved to {args.save_baseline}")
+    regressions = check(report, args, json.loads(Path(args.baseline).read_text()) if args.baseline else None)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if regressions:
+        sys.exit(1)
+    print("\nno startup regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Throughput scaling with the number of uvicorn workers.
+
+For each worker count, starts ``serve.py --workers N`` against a real mongod,
+drives the load_test.py endpoint mix through HTTP and reports throughput,
+p99 latency, errors and the peak number of server-side connections (sampled
+from serverStatus). A run fails when any request errors: with the bounded
+waitQueueTimeoutMS an exhausted pool surfaces as a 500, not as a hang.
+
+Needs a mongod (a replica set also exercises secondaryPreferred reads); the
+in-memory stand-in cannot be shared between worker processes.
+
+Usage (from backend/):
+  python benchmarks/worker_scaling.py --mongo-url mongodb://localhost:27017 --workers 1 2 4 8
+  python benchmarks/worker_scaling.py --mongo-url ... --workers 1 4 --pool-size 20 --concurrency 256
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from load_test import build_targets, run_load, seed, summarize  # noqa: E402
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/api/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"server at {base_url} did not start in {timeout:.0f}s")
+
+
+async def sample_connections(mongo_url: str, stop: asyncio.Event, samples: List[int]) -> None:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    monitor = AsyncIOMotorClient(mongo_url, maxPoolSize=1)
+    try:
+        while not stop.is_set():
+            status = await monitor.admin.command("serverStatus")
+            samples.append(status["connections"]["current"])
+            try:
+                await asyncio.wait_for(stop.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        monitor.close()
+
+
+def start_server(args, workers: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": args.db_name,
+        "MONGO_MAX_POOL_SIZE": str(args.pool_size),
+        "DEADLINE_SCHEDULER_ENABLED": "false",
+    }
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+async def measure(args, workers: int, contexts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    process = start_server(args, workers)
+    try:
+        await wait_ready(base_url)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+            # seeded once, through the first server
+            if not contexts:
+                contexts.extend(await seed(client, args.tenants, args.records))
+            targets, _ = build_targets(contexts[0])
+            if args.warmup:
+                await run_load(client, targets, contexts, args.concurrency, args.warmup)
+            stop, samples = asyncio.Event(), []
+            sampler = asyncio.create_task(sample_connections(args.mongo_url, stop, samples))
+            latencies, errors, elapsed = await run_load(client, targets, contexts, args.concurrency, args.duration)
+            stop.set()
+            await sampler
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    report = summarize(latencies, errors, elapsed)
+    p99 = max((e["p99_ms"] for e in report["endpoints"].values()), default=0.0)
+    return {
+        "workers": workers,
+        "throughput_rps": report["throughput_rps"],
+        "max_p99_ms": p99,
+        "errors": report["errors"],
+        "peak_connections": max(samples, default=0),
+        "pool_limit": workers * args.pool_size,
+    }
+
+
+async def main_async(args) -> int:
+    contexts: List[Dict[str, Any]] = []
+    rows = []
+    for workers in args.workers:
+        row = await measure(args, workers, contexts)
+        rows.append(row)
+        print(f"workers={workers}: {row['throughput_rps']} req/s, {row['errors']} errors")
+
+    base = rows[0]["throughput_rps"] or 1.0
+    print(f"\n{'workers':>8}{'req/s':>10}{'speedup':>9}{'p99 ms':>10}{'errors':>8}{'conns':>8}{'limit':>8}")
+    for row in rows:
+        print(f"{row['workers']:>8}{row['throughput_rps']:>10.1f}{row['throughput_rps'] / base:>8.2f}x"
+              f"{row['max_p99_ms']:>10.1f}{row['errors']:>8}{row['peak_connections']:>8}{row['pool_limit']:>8}")
+
+    failed = [row for row in rows if row["errors"]]
+    for row in failed:
+        print(f"FAIL: {row['errors']} errors with {row['workers']} workers (pool exhaustion or timeouts)")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GaiaSystem API throughput per worker count")
+    parser.add_argument("--mongo-url", required=True)
+    parser.add_argument("--db-name", default="gaia_bench")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pool-size", type=int, default=50, help="MONGO_MAX_POOL_SIZE per worker")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--records", type=int, default=1000, help="records per module per tenant")
+    parser.add_argument("--concurrency", type=int, default=128)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from dashboard import DASHBOARD_COLLECTIONS, aggregate_dashboard_stats
+from events import ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+SCORES_COLLECTION = "compliance_scores"
+HISTORY_COLLECTION = "compliance_score_history"
+# One document holding the day of the last daily sweep, shared by all workers
+SWEEPS_COLLECTION = "compliance_sweeps"
+
+# Writes to these collections move a tenant's scores: every collection the
+# dashboard summary reads
+SCORED_COLLECTIONS = set(DASHBOARD_COLLECTIONS)
+
+# The dashboard summary, served from the materialized view as a whole
+SCORE_FIELDS = [
+    "compliance_score", "esg_score", "compliance_components", "inspection_conformity_trend",
+    "licenses_total", "licenses_active", "projects_total", "inspections_total", "water_monitoring_total",
+    "waste_total", "commitments_total", "commitments_overdue", "water_alerts", "status_breakdown",
+]
+# A refresh claimed by a worker that died is taken over after this long
+CLAIM_SECONDS = 60
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class ComplianceScores:
+    """Per-tenant compliance/ESG scores materialized in ``compliance_scores``.
+
+    Writes only mark the tenant dirty (an event bus listener); a background
+    task recomputes dirty tenants every ``interval`` seconds, so a burst of
+    writes costs one aggregation. A read of a tenant this worker saw change
+    recomputes it on the spot instead of serving the stale copy. Each refresh
+    also upserts the day's point in ``compliance_score_history``. Once a day
+    every scored tenant is refreshed, since commitments fall overdue with no
+    write at all; the day of that sweep is kept in ``compliance_sweeps`` so
+    only one worker runs it, not every worker on every restart.
+
+    With several workers every one of them hears the same change; the
+    refresh is claimed on the score document and skipped when another worker
+    already computed after the change was seen.
+    """
+
+    def __init__(self, db, interval: float = 5.0):
+        self.db = db
+        self.interval = interval
+        self._dirty: Dict[str, datetime] = {}
+        self._swept_on: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        # replaced in tests
+        self.compute = aggregate_dashboard_stats
+        # called with the tenant id after each refresh (portfolio cache)
+        self.on_refresh: Optional[Callable[[str], None]] = None
+
+    def listener(self, event: ChangeEvent) -> None:
+        if event.collection in SCORED_COLLECTIONS and event.tenant_id is not None:
+            self._dirty.setdefault(event.tenant_id, datetime.now(timezone.utc))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def get(self, tenant_id: str) -> Dict[str, Any]:
+        """The tenant's materialized scores, computed on the spot the first time and after a change."""
+        scores = await self.db[SCORES_COLLECTION].find_one({"tenant_id": tenant_id}, {"_id": 0, "claimed_until": 0})
+        seen_at = self._dirty.get(tenant_id)
+        computed_at = scores.get("computed_at") if scores else None
+        current = seen_at is None or (computed_at is not None and computed_at.replace(tzinfo=timezone.utc) >= seen_at)
+        # documents from before a field joined SCORE_FIELDS are recomputed too
+        if scores is not None and current and all(field in scores for field in SCORE_FIELDS):
+            return scores
+        # changes seen from here on mark the tenant dirty again
+        self._dirty.pop(tenant_id, None)
+        try:
+            return await self.refresh(tenant_id)
+        except BaseException:
+            if seen_at is not None:
+                self._dirty[tenant_id] = min(seen_at, self._dirty.get(tenant_id, seen_at))
+            raise
+
+    async def portfolio(self, tenant_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Scores of many tenants in one indexed ``$in`` query, keyed by tenant.
+
+        Tenants never computed are queued for the background task rather than
+        aggregated here, and are missing from the result until then.
+        """
+        scores = {
+            document["tenant_id"]: document
+            async for document in self.db[SCORES_COLLECTION].find(
+                {"tenant_id": {"$in": tenant_ids}}, {"_id": 0, "claimed_until": 0}
+            )
+        }
+        now = datetime.now(timezone.utc)
+        for tenant_id in tenant_ids:
+            if "compliance_score" not in scores.get(tenant_id, {}):
+                scores.pop(tenant_id, None)
+                self._dirty.setdefault(tenant_id, now)
+        return scores
+
+    async def history(self, tenant_id: str, days: int) -> List[Dict[str, Any]]:
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).date().isoformat()
+        return await self.db[HISTORY_COLLECTION].find(
+            {"tenant_id": tenant_id, "day": {"$gte": since}}, {"_id": 0, "tenant_id": 0}
+        ).sort("day", 1).to_list(None)
+
+    async def refresh(self, tenant_id: str) -> Dict[str, Any]:
+        """Recompute and store one tenant's scores unconditionally."""
+        started = datetime.now(timezone.utc)
+        stats = await self.compute(self.db, tenant_id)
+        scores = {field: stats.get(field) for field in SCORE_FIELDS}
+        await self.db[SCORES_COLLECTION].update_one(
+            {"tenant_id": tenant_id},
+            {"$set": {**scores, "computed_at": started}, "$unset": {"claimed_until": ""}},
+            upsert=True,
+        )
+        await self.db[HISTORY_COLLECTION].update_one(
+            {"tenant_id": tenant_id, "day": started.date().isoformat()},
+            {"$set": {"compliance_score": scores["compliance_score"], "esg_score": scores["esg_score"],
+                      "compliance_components": scores["compliance_components"], "computed_at": started}},
+            upsert=True,
+        )
+        if self.on_refresh is not None:
+            self.on_refresh(tenant_id)
+        return {"tenant_id": tenant_id, **scores, "computed_at": started}
+
+    async def _claim(self, tenant_id: str, seen_at: datetime) -> Optional[bool]:
+        """True when this worker should refresh, False when it is already up to date, None to retry later."""
+        now = datetime.now(timezone.utc)
+        try:
+            claimed = await self.db[SCORES_COLLECTION].find_one_and_update(
+                {"tenant_id": tenant_id,
+                 "computed_at": {"$not": {"$gte": seen_at}},
+                 "claimed_until": {"$not": {"$gt": now}}},
+                {"$set": {"claimed_until": now + timedelta(seconds=CLAIM_SECONDS)}},
+                upsert=True, return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            claimed = None
+        if claimed is not None:
+            return True
+        current = await self.db[SCORES_COLLECTION].find_one({"tenant_id": tenant_id}, {"computed_at": 1})
+        computed_at = current.get("computed_at") if current else None
+        if computed_at is not None and computed_at.replace(tzinfo=timezone.utc) >= seen_at:
+            return False
+        return None
+
+    async def _claim_sweep(self, day: str) -> bool:
+        """True for the one worker that moves the sweep day forward to ``day``.
+
+        Once another worker has set ``day``, the filter misses and the upsert
+        collides with the existing ``_id``.
+        """
+        try:
+            await self.db[SWEEPS_COLLECTION].update_one(
+                {"_id": "daily", "day": {"$ne": day}}, {"$set": {"day": day}}, upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def run_once(self) -> int:
+        today = _today()
+        if self._swept_on != today:
+            if await self._claim_sweep(today):
+                seen_at = datetime.now(timezone.utc)
+                for tenant_id in await self.db[SCORES_COLLECTION].distinct("tenant_id"):
+                    self._dirty.setdefault(tenant_id, seen_at)
+            self._swept_on = today
+        refreshed = 0
+        for tenant_id in list(self._dirty):
+            # changes seen from here on mark the tenant dirty again
+            seen_at = self._dirty.pop(tenant_id)
+            try:
+                claim = await self._claim(tenant_id, seen_at)
+                if claim:
+                    await self.refresh(tenant_id)
+                    refreshed += 1
+            except Exception as e:
+                logger.error("Falha ao recalcular conformidade de %s: %s", tenant_id, e)
+                claim = None
+            if claim is None:
+                self._dirty[tenant_id] = min(seen_at, self._dirty.get(tenant_id, seen_at))
+        return refreshed
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            try:
+                refreshed = await self.run_once()
+                if refreshed:
+                    logger.debug("Índices de conformidade recalculados para %d tenant(s)", refreshed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Falha ao recalcular índices de conformidade: %s", e)
+            await asyncio.sleep(max(0.0, self.interval - (time.perf_counter() - started)))
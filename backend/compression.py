@@ -0,0 +1,187 @@
+import os
+import zlib
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is in requirements.txt
+    brotli = None
+
+MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+# Low qualities keep brotli cheaper than gzip for dynamic JSON at a better ratio
+BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "application/xml", "application/javascript",
+    "text/csv", "text/plain", "text/html",
+)
+# Tags appended to ETags of compressed bodies; stripped from validators again
+ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """``"br"``, ``"gzip"`` or None for an Accept-Encoding header."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def strip_suffix(value: str) -> str:
+    tags = []
+    for tag in value.split(","):
+        tag = tag.strip()
+        for suffix in ENCODING_SUFFIXES:
+            if tag.endswith(suffix + '"'):
+                tag = tag[: -len(suffix) - 1] + '"'
+        tags.append(tag)
+    return ", ".join(tags)
+
+
+def encoded_tags(value: str) -> Dict[str, List[str]]:
+    """Suffixes sent on each tag of an If-None-Match header, by the tag without them (and without ``W/``)."""
+    tags: Dict[str, List[str]] = {}
+    for tag in value.split(","):
+        tag = tag.strip().removeprefix("W/")
+        for suffix in ENCODING_SUFFIXES:
+            if tag.endswith(suffix + '"'):
+                tags.setdefault(tag[: -len(suffix) - 1] + '"', []).append(suffix)
+    return tags
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress ``data`` and flush, so a streamed chunk reaches the client whole."""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """gzip/brotli for text and JSON responses of at least ``minimum_size`` bytes.
+
+    Pure ASGI, so streamed bodies (exports) are compressed chunk by chunk.
+    Server-sent events, ranged and already encoded responses pass through
+    untouched. A compressed body is a different representation, so its ETag
+    gets the encoding appended (``"7-ab12-gzip"``); the suffix is removed from
+    If-None-Match before the request reaches the handlers, which compare
+    their own tags, and put back on the ETag of their 304 so it names the
+    representation the client holds.
+    """
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        sent_suffixes: Dict[str, List[str]] = {}
+        if "if-none-match" in request_headers:
+            sent_suffixes = encoded_tags(request_headers["if-none-match"])
+            headers = MutableHeaders(scope=scope)
+            headers["if-none-match"] = strip_suffix(request_headers["if-none-match"])
+        encoding = negotiate(request_headers.get("accept-encoding", ""))
+
+        def restore_suffix(start) -> None:
+            if start["status"] != 304 or not sent_suffixes:
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            etag = headers.get("etag")
+            suffixes = sent_suffixes.get(etag.removeprefix("W/")) if etag else None
+            if suffixes:
+                suffix = f"-{encoding}" if f"-{encoding}" in suffixes else suffixes[0]
+                headers["ETag"] = f'{etag[:-1]}{suffix}"'
+
+        if encoding is None:
+            if not sent_suffixes:
+                await self.app(scope, receive, send)
+                return
+
+            async def restoring_send(message):
+                if message["type"] == "http.response.start":
+                    restore_suffix(message)
+                await send(message)
+
+            await self.app(scope, receive, restoring_send)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        def compressible(headers: MutableHeaders, status: int) -> bool:
+            media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+            return (
+                status not in (204, 206, 304)
+                and media_type in COMPRESSIBLE_TYPES
+                and "content-encoding" not in headers
+                and "content-range" not in headers
+                and headers.get("accept-ranges", "none") == "none"
+            )
+
+        async def compressing_send(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+            if start is not None:
+                state["start"] = None
+                headers = MutableHeaders(raw=start["headers"])
+                if not compressible(headers, start["status"]) or (not more_body and len(body) < self.minimum_size):
+                    state["passthrough"] = True
+                    restore_suffix(start)
+                    await send(start)
+                    await send(message)
+                    return
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and etag.endswith('"'):
+                    headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+                state["compressor"] = _Compressor(encoding)
+                if not more_body:
+                    body = state["compressor"].finish(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                del headers["Content-Length"]
+                await send(start)
+            compressor = state["compressor"]
+            data = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
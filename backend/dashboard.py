@@ -0,0 +1,184 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+# Collections summarised on the dashboard, in $unionWith order
+DASHBOARD_COLLECTIONS = [
+    "licenses",
+    "projects",
+    "inspections",
+    "water_monitoring",
+    "waste_management",
+    "commitments",
+]
+
+# Weights of each component in the compliance score (renormalised over the
+# components a tenant actually has data for)
+COMPLIANCE_WEIGHTS = {"licenses": 0.35, "inspections": 0.3, "commitments": 0.2, "water": 0.15}
+
+# Water quality and the inspection trend look at recent data only: readings
+# of the last RECENT_DAYS, and completed inspections of the last RECENT_DAYS
+# against the RECENT_DAYS before that
+RECENT_DAYS = 90
+
+# ESG blends compliance with delivery of environmental work
+ESG_WEIGHTS = {"compliance": 0.5, "commitments_progress": 0.25, "projects": 0.25}
+
+LICENSE_ACTIVE = "Ativa"
+LICENSE_CANCELLED = "Cancelada"
+INSPECTION_COMPLETED = "Concluída"
+COMMITMENT_DONE = "Concluído"
+PROJECT_DELIVERING = ("Em Andamento", "Concluído")
+PROJECT_DROPPED = ("Cancelado",)
+WATER_NORMAL = "Normal"
+
+
+def _since(today: str, days: int) -> str:
+    return (datetime.fromisoformat(today) - timedelta(days=days)).date().isoformat()
+
+
+def _branch(collection: str, tenant_id: str, today: str) -> List[Dict[str, Any]]:
+    fields: Dict[str, Any] = {"_id": 0, "c": {"$literal": collection}, "status": 1}
+    if collection == "inspections":
+        fields["conformity_percentage"] = 1
+        fields["period"] = {"$switch": {
+            "branches": [
+                {"case": {"$gte": ["$scheduled_date", _since(today, RECENT_DAYS)]}, "then": "recent"},
+                {"case": {"$gte": ["$scheduled_date", _since(today, 2 * RECENT_DAYS)]}, "then": "previous"},
+            ],
+            "default": "older",
+        }}
+    elif collection == "water_monitoring":
+        fields["recent"] = {"$gte": ["$collection_date", _since(today, RECENT_DAYS)]}
+    elif collection == "commitments":
+        fields["progress"] = 1
+        fields["overdue"] = {
+            "$and": [
+                {"$ne": ["$status", COMMITMENT_DONE]},
+                {"$lt": ["$due_date", today]},
+            ]
+        }
+    return [{"$match": {"tenant_id": tenant_id}}, {"$project": fields}]
+
+
+def build_stats_pipeline(tenant_id: str, today: str) -> List[Dict[str, Any]]:
+    """One aggregation over ``licenses`` that unions in the other collections.
+
+    Only the handful of fields needed for counting leave each collection, and a
+    single ``$facet`` produces every breakdown, so the dashboard costs one
+    round-trip regardless of how many modules it summarises.
+    """
+    first, *others = DASHBOARD_COLLECTIONS
+    pipeline = _branch(first, tenant_id, today)
+    for collection in others:
+        pipeline.append({"$unionWith": {"coll": collection, "pipeline": _branch(collection, tenant_id, today)}})
+    pipeline.append({
+        "$facet": {
+            "by_status": [
+                {"$group": {"_id": {"c": "$c", "status": "$status"}, "count": {"$sum": 1}}},
+            ],
+            "inspections": [
+                {"$match": {"c": "inspections", "status": INSPECTION_COMPLETED}},
+                {"$group": {"_id": None, "avg_conformity": {"$avg": "$conformity_percentage"}}},
+            ],
+            "inspection_periods": [
+                {"$match": {"c": "inspections", "status": INSPECTION_COMPLETED, "period": {"$ne": "older"}}},
+                {"$group": {"_id": "$period", "avg_conformity": {"$avg": "$conformity_percentage"}}},
+            ],
+            "water": [
+                {"$match": {"c": "water_monitoring", "recent": True}},
+                {"$group": {
+                    "_id": None,
+                    "readings": {"$sum": 1},
+                    "normal": {"$sum": {"$cond": [{"$eq": ["$status", WATER_NORMAL]}, 1, 0]}},
+                }},
+            ],
+            "commitments": [
+                {"$match": {"c": "commitments"}},
+                {"$group": {
+                    "_id": None,
+                    "overdue": {"$sum": {"$cond": ["$overdue", 1, 0]}},
+                    "avg_progress": {"$avg": "$progress"},
+                }},
+            ],
+        }
+    })
+    return pipeline
+
+
+def _ratio(part: float, whole: float) -> Optional[float]:
+    return part / whole * 100 if whole else None
+
+
+def _weighted(components: Dict[str, Optional[float]], weights: Dict[str, float]) -> float:
+    available = {k: v for k, v in components.items() if v is not None}
+    if not available:
+        return 0.0
+    total_weight = sum(weights[k] for k in available)
+    return round(sum(v * weights[k] for k, v in available.items()) / total_weight, 1)
+
+
+def summarize(facets: Dict[str, Any]) -> Dict[str, Any]:
+    breakdown: Dict[str, Dict[str, int]] = {c: {} for c in DASHBOARD_COLLECTIONS}
+    for row in facets.get("by_status", []):
+        status = row["_id"].get("status") or "Indefinido"
+        breakdown[row["_id"]["c"]][status] = row["count"]
+    totals = {c: sum(statuses.values()) for c, statuses in breakdown.items()}
+
+    licenses = breakdown["licenses"]
+    projects = breakdown["projects"]
+    inspections = (facets.get("inspections") or [{}])[0]
+    commitments = (facets.get("commitments") or [{}])[0]
+    water = breakdown["water_monitoring"]
+    recent_water = (facets.get("water") or [{}])[0]
+    periods = {row["_id"]: row["avg_conformity"] for row in facets.get("inspection_periods", [])}
+
+    components = {
+        "licenses": _ratio(
+            licenses.get(LICENSE_ACTIVE, 0),
+            totals["licenses"] - licenses.get(LICENSE_CANCELLED, 0),
+        ),
+        "inspections": inspections.get("avg_conformity"),
+        "commitments": _ratio(
+            totals["commitments"] - commitments.get("overdue", 0),
+            totals["commitments"],
+        ),
+        "water": _ratio(recent_water.get("normal", 0), recent_water.get("readings", 0)),
+    }
+    compliance = _weighted(components, COMPLIANCE_WEIGHTS)
+    trend = None
+    if periods.get("recent") is not None and periods.get("previous") is not None:
+        trend = round(periods["recent"] - periods["previous"], 1)
+    esg = _weighted(
+        {
+            "compliance": compliance if any(totals.values()) else None,
+            "commitments_progress": commitments.get("avg_progress"),
+            "projects": _ratio(
+                sum(projects.get(s, 0) for s in PROJECT_DELIVERING),
+                totals["projects"] - sum(projects.get(s, 0) for s in PROJECT_DROPPED),
+            ),
+        },
+        ESG_WEIGHTS,
+    )
+
+    return {
+        "licenses_total": totals["licenses"],
+        "projects_total": totals["projects"],
+        "inspections_total": totals["inspections"],
+        "water_monitoring_total": totals["water_monitoring"],
+        "waste_total": totals["waste_management"],
+        "commitments_total": totals["commitments"],
+        "licenses_active": licenses.get(LICENSE_ACTIVE, 0),
+        "commitments_overdue": commitments.get("overdue", 0),
+        "water_alerts": totals["water_monitoring"] - water.get(WATER_NORMAL, 0),
+        "compliance_score": compliance,
+        "esg_score": esg,
+        "compliance_components": {k: None if v is None else round(v, 1) for k, v in components.items()},
+        "inspection_conformity_trend": trend,
+        "status_breakdown": breakdown,
+    }
+
+
+async def aggregate_dashboard_stats(db, tenant_id: str) -> Dict[str, Any]:
+    today = datetime.now(timezone.utc).date().isoformat()
+    result = await db.licenses.aggregate(build_stats_pipeline(tenant_id, today)).to_list(1)
+    return summarize(result[0] if result else {})
@@ -0,0 +1,91 @@
+import os
+from typing import Any, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+from metrics import MongoCommandListener, MongoPoolListener
+from tenancy import TenantUsageListener
+
+# Pool settings are per process: with W workers the server sees up to
+# W x maxPoolSize connections. MONGO_CONNECTION_BUDGET splits a total between
+# the WEB_CONCURRENCY workers instead of fixing the per-worker size.
+DEFAULT_MAX_POOL_SIZE = 50
+DEFAULT_MIN_POOL_SIZE = 0
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def workers() -> int:
+    return max(1, _env_int("WEB_CONCURRENCY", 1))
+
+
+def max_pool_size() -> int:
+    explicit = _env_int("MONGO_MAX_POOL_SIZE", None)
+    if explicit is not None:
+        return explicit
+    budget = _env_int("MONGO_CONNECTION_BUDGET", None)
+    if budget is not None:
+        return max(1, budget // workers())
+    return DEFAULT_MAX_POOL_SIZE
+
+
+def client_options() -> Dict[str, Any]:
+    """Motor client keyword arguments from the environment.
+
+    Timeouts are bounded so a lost primary or an exhausted pool fails a
+    request within seconds instead of hanging it (pymongo's defaults are 30s
+    server selection, no socket timeout and an unbounded pool wait).
+    """
+    return {
+        "maxPoolSize": max_pool_size(),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", DEFAULT_MIN_POOL_SIZE),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", 60000),
+        "maxConnecting": _env_int("MONGO_MAX_CONNECTING", 4),
+        "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", 30000),
+        "retryReads": True,
+        "retryWrites": True,
+        "appname": os.environ.get("MONGO_APP_NAME", "gaia-api"),
+    }
+
+
+def create_client(url: Optional[str] = None, **overrides: Any) -> AsyncIOMotorClient:
+    """New client with the tuned pool and the metrics listeners.
+
+    Create it inside the running event loop of the process that uses it
+    (the app lifespan), never at import: a client inherited across fork
+    shares sockets with its parent.
+    """
+    options = {**client_options(), **overrides}
+    return AsyncIOMotorClient(
+        url or os.environ["MONGO_URL"],
+        event_listeners=[MongoCommandListener(), MongoPoolListener(), TenantUsageListener()],
+        **options,
+    )
+
+
+def read_preference():
+    """Read preference for list, search and report queries (MONGO_READ_PREFERENCE).
+
+    ``secondaryPreferred`` by default: on a replica set these reads leave the
+    primary to writes; on a standalone server they behave like ``primary``.
+    MONGO_MAX_STALENESS_SECONDS (>= 90) skips lagging secondaries.
+    """
+    name = os.environ.get("MONGO_READ_PREFERENCE", "secondaryPreferred")
+    staleness = _env_int("MONGO_MAX_STALENESS_SECONDS", -1)
+    return make_read_preference(read_pref_mode_from_name(name), None, max_staleness=staleness)
+
+
+def secondary_reads(client: AsyncIOMotorClient, name: str):
+    """Handle on database ``name`` for reads that may be slightly stale.
+
+    Anything that must see the request's own writes (detail after create,
+    version checks, sync, idempotency) stays on the primary handle.
+    """
+    return client.get_database(name, read_preference=read_preference())
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+from datetime import datetime, time as dtime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from pymongo import DeleteOne, UpdateOne
+
+from sync import touch
+
+logger = logging.getLogger(__name__)
+
+DEADLINES_COLLECTION = "upcoming_deadlines"
+
+LICENSE_ACTIVE = "Ativa"
+LICENSE_EXPIRED = "Vencida"
+
+
+class DeadlineSource:
+    def __init__(self, kind: str, date_field: str, at_field: str, closed_statuses: Iterable[str]):
+        self.kind = kind
+        self.date_field = date_field
+        self.at_field = at_field
+        self.closed_statuses = set(closed_statuses)
+
+
+# Collections whose string dates feed the deadlines view. Each keeps a parsed
+# UTC datetime copy (``at_field``) next to the original string so range
+# queries hit an index instead of parsing every document.
+SOURCES: Dict[str, DeadlineSource] = {
+    "licenses": DeadlineSource("expiry", "expiry_date", "expiry_at", {"Cancelada"}),
+    "commitments": DeadlineSource("due", "due_date", "due_at", {"Concluído"}),
+    "inspections": DeadlineSource("scheduled", "scheduled_date", "scheduled_at", {"Concluída", "Cancelada"}),
+}
+
+
+def parse_date(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def add_datetimes(collection_name: str, documents: Iterable[Dict[str, Any]]) -> None:
+    """Set the parsed datetime field in place before a write."""
+    source = SOURCES.get(collection_name)
+    if source is None:
+        return
+    for document in documents:
+        document[source.at_field] = parse_date(document.get(source.date_field))
+
+
+def deadline_entry(collection_name: str, document: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    source = SOURCES[collection_name]
+    due_at = document.get(source.at_field) or parse_date(document.get(source.date_field))
+    if due_at is None or document.get("status") in source.closed_statuses:
+        return None
+    return {
+        "tenant_id": document["tenant_id"],
+        "source": collection_name,
+        "source_id": document["id"],
+        "kind": source.kind,
+        "title": document.get("title") or document.get("number") or "",
+        "status": document.get("status"),
+        "due_at": due_at,
+    }
+
+
+async def sync_deadlines(db, collection_name: str, documents: Iterable[Dict[str, Any]]) -> None:
+    """Upsert (or drop, once closed) the deadline rows for written documents."""
+    if collection_name not in SOURCES:
+        return
+    operations = []
+    for document in documents:
+        # ids are only unique within a tenant (clients may choose them)
+        key = {"tenant_id": document["tenant_id"], "source": collection_name, "source_id": document["id"]}
+        entry = deadline_entry(collection_name, document)
+        if entry is None:
+            operations.append(DeleteOne(key))
+        else:
+            operations.append(UpdateOne(key, {"$set": entry}, upsert=True))
+    for start in range(0, len(operations), 1000):
+        await db[DEADLINES_COLLECTION].bulk_write(operations[start:start + 1000], ordered=False)
+
+
+async def remove_deadlines(db, tenant_id: str, collection_name: str, ids: Iterable[str]) -> None:
+    if collection_name in SOURCES:
+        await db[DEADLINES_COLLECTION].delete_many(
+            {"tenant_id": tenant_id, "source": collection_name, "source_id": {"$in": list(ids)}}
+        )
+
+
+async def backfill(db, batch_size: int = 1000) -> int:
+    """Parse dates of documents written before datetimes were stored."""
+    processed = 0
+    for collection_name, source in SOURCES.items():
+        collection = db[collection_name]
+        cursor = collection.find({source.at_field: {"$exists": False}}).batch_size(batch_size)
+        batch: List[Dict[str, Any]] = []
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                processed += await _backfill_batch(db, collection_name, batch)
+                batch = []
+        if batch:
+            processed += await _backfill_batch(db, collection_name, batch)
+    return processed
+
+
+async def _backfill_batch(db, collection_name: str, batch: List[Dict[str, Any]]) -> int:
+    source = SOURCES[collection_name]
+    add_datetimes(collection_name, batch)
+    await db[collection_name].bulk_write(
+        [UpdateOne({"_id": d["_id"]}, {"$set": {source.at_field: d[source.at_field]}}) for d in batch],
+        ordered=False,
+    )
+    await sync_deadlines(db, collection_name, batch)
+    return len(batch)
+
+
+def _start_of_day(moment: datetime) -> datetime:
+    return datetime.combine(moment.date(), dtime.min, tzinfo=timezone.utc)
+
+
+async def expire_licenses(db, now: Optional[datetime] = None) -> List[str]:
+    """Flip active licenses whose expiry date is past; returns affected tenants.
+
+    A license stays valid through its expiry date and expires at the start of
+    the following day (UTC).
+    """
+    cutoff = _start_of_day(now or datetime.now(timezone.utc))
+    query = {"status": LICENSE_ACTIVE, "expiry_at": {"$lt": cutoff}}
+    expired = await db.licenses.find(query, {"_id": 0, "id": 1, "tenant_id": 1}).to_list(None)
+    if not expired:
+        return []
+    # ids repeat across tenants, so every filter pairs them with their tenant
+    by_tenant: Dict[str, List[str]] = {}
+    for license in expired:
+        by_tenant.setdefault(license["tenant_id"], []).append(license["id"])
+    await db.licenses.update_many(
+        {"$or": [{"tenant_id": tenant_id, "id": {"$in": ids}} for tenant_id, ids in by_tenant.items()],
+         "status": LICENSE_ACTIVE},
+        touch({"$set": {"status": LICENSE_EXPIRED}}),
+    )
+    await db[DEADLINES_COLLECTION].update_many(
+        {"$or": [{"tenant_id": tenant_id, "source_id": {"$in": ids}} for tenant_id, ids in by_tenant.items()],
+         "source": "licenses"},
+        {"$set": {"status": LICENSE_EXPIRED}},
+    )
+    return sorted(by_tenant)
+
+
+async def next_expiry(db) -> Optional[datetime]:
+    license = await db.licenses.find_one(
+        {"status": LICENSE_ACTIVE, "expiry_at": {"$ne": None}}, {"_id": 0, "expiry_at": 1}, sort=[("expiry_at", 1)]
+    )
+    if not license:
+        return None
+    return _start_of_day(parse_date(license["expiry_at"])) + timedelta(days=1)
+
+
+async def upcoming(db, tenant_id: str, days: int, include_overdue: bool = False,
+                   kinds: Optional[List[str]] = None, limit: int = 500) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    window: Dict[str, Any] = {"$lte": now + timedelta(days=days)}
+    if not include_overdue:
+        window["$gte"] = _start_of_day(now)
+    query: Dict[str, Any] = {"tenant_id": tenant_id, "due_at": window}
+    if kinds:
+        query["kind"] = {"$in": kinds}
+    return await db[DEADLINES_COLLECTION].find(query, {"_id": 0}).sort("due_at", 1).to_list(limit)
+
+
+class DeadlineScheduler:
+    """Background task that expires licenses on time.
+
+    Sleeps until the next license expiry or ``interval`` seconds, whichever
+    comes first, so flips happen at the right moment without polling often.
+    ``on_change`` is awaited with each affected tenant id.
+    """
+
+    def __init__(self, db, on_change: Callable[[str], Awaitable[None]], interval: float = 300.0):
+        self.db = db
+        self.on_change = on_change
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> List[str]:
+        tenants = await expire_licenses(self.db)
+        for tenant_id in tenants:
+            await self.on_change(tenant_id)
+        if tenants:
+            logger.info("Licenças vencidas atualizadas para %d tenant(s)", len(tenants))
+        return tenants
+
+    async def _run(self) -> None:
+        try:
+            backfilled = await backfill(self.db)
+            if backfilled:
+                logger.info("Datas convertidas em %d documento(s)", backfilled)
+        except Exception as e:
+            logger.error("Falha ao converter datas: %s", e)
+        while True:
+            delay = self.interval
+            try:
+                await self.run_once()
+                wake_at = await next_expiry(self.db)
+                if wake_at is not None:
+                    delay = min(delay, max(1.0, (wake_at - datetime.now(timezone.utc)).total_seconds()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Falha no agendador de vencimentos: %s", e)
+            await asyncio.sleep(delay)
@@ -0,0 +1,301 @@
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from pymongo.errors import PyMongoError
+
+from sync import ALL_DOCUMENTS, SETTLE_SECONDS, TOMBSTONE_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# Collections whose writes are broadcast
+WATCHED_COLLECTIONS = (
+    "licenses", "projects", "inspections", "water_monitoring", "waste_management", "commitments",
+    "water_quality_settings",
+)
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+POLL_INTERVAL = 2.0
+POLL_BATCH = 1000
+# Recently published writes the poller must not announce twice
+RECENT_LOCAL = 10000
+
+INSERT, UPDATE, DELETE, RESET = "insert", "update", "delete", "reset"
+
+
+class ChangeEvent(NamedTuple):
+    """One write seen by the bus.
+
+    ``tenant_id`` is None only for change-stream updates whose document was
+    deleted before it could be looked up; listeners treat those as touching
+    every tenant. Deletes are read from the sync tombstones, which carry the
+    tenant and the deleted ``id``. ``ids`` are the document ``id`` fields
+    when known. ``document`` is the full written document for single
+    inserts/updates coming from the change stream.
+    """
+    seq: int
+    tenant_id: Optional[str]
+    collection: str
+    operation: str
+    ids: tuple
+    at: datetime
+    document: Optional[Dict[str, Any]] = None
+
+
+class Subscription:
+    """Per-connection queue. On overflow the backlog is replaced by a single
+    ``reset`` event: the client missed deltas and should refetch."""
+
+    def __init__(self, tenant_id: str, collections: Optional[Iterable[str]] = None, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.tenant_id = tenant_id
+        self.collections = set(collections) if collections else None
+        self.queue: "asyncio.Queue[ChangeEvent]" = asyncio.Queue(maxsize)
+
+    def wants(self, event: ChangeEvent) -> bool:
+        return self.collections is None or event.collection in self.collections
+
+    def put(self, event: ChangeEvent) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(event._replace(operation=RESET, ids=(), document=None))
+
+    async def get(self, timeout: float) -> Optional[ChangeEvent]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBus:
+    """In-process fan-out of per-tenant change events.
+
+    Listeners (plain callables: cache invalidation, derived views) get every
+    event. Subscriptions (SSE connections) get their tenant's events.
+
+    Events come from a MongoDB change stream when the server is a replica set,
+    so writes from every worker are seen. On a standalone mongod the bus
+    falls back to the writes this process announces through ``publish_local``
+    plus a poller that picks up other workers' inserts by ``_id`` and their
+    deletes from the tombstones (settled like sync positions). Updates made
+    by other workers are not polled: those subscribers catch up on their
+    next insert, delete or sync.
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.mode = "local"
+        self._listeners: List[Callable[[ChangeEvent], None]] = []
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._seq = itertools.count(1)
+        self._recent: "OrderedDict[tuple, None]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    # -- fan-out ----------------------------------------------------------
+    def add_listener(self, listener: Callable[[ChangeEvent], None]) -> None:
+        self._listeners.append(listener)
+
+    def subscribe(self, tenant_id: str, collections: Optional[Iterable[str]] = None) -> Subscription:
+        subscription = Subscription(tenant_id, collections)
+        self._subscriptions.setdefault(tenant_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscriptions.get(subscription.tenant_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscriptions[subscription.tenant_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(s) for s in self._subscriptions.values())
+
+    def event(self, tenant_id: Optional[str], collection: str, operation: str, ids: Iterable[str] = (),
+              document: Optional[Dict[str, Any]] = None) -> ChangeEvent:
+        return ChangeEvent(next(self._seq), tenant_id, collection, operation, tuple(ids),
+                           datetime.now(timezone.utc), document)
+
+    def _notify_listeners(self, event: ChangeEvent) -> None:
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error("Falha em ouvinte de eventos: %s", e)
+
+    def _notify_subscribers(self, event: ChangeEvent) -> None:
+        if event.tenant_id is None:
+            return
+        for subscription in list(self._subscriptions.get(event.tenant_id, ())):
+            if subscription.wants(event):
+                subscription.put(event)
+
+    def publish(self, event: ChangeEvent) -> None:
+        self._notify_listeners(event)
+        self._notify_subscribers(event)
+
+    def publish_local(self, tenant_id: str, collection: str, operation: str, ids: Iterable[str] = ()) -> None:
+        """Announce a write made by this process.
+
+        Listeners run right away so this worker reads its own writes. When a
+        change stream is running it delivers the same write to subscribers
+        (with the document, or the tombstone for deletes), so they are not
+        notified twice.
+        """
+        event = self.event(tenant_id, collection, operation, ids)
+        self._notify_listeners(event)
+        if self.mode == "changestream":
+            return
+        recent = (ALL_DOCUMENTS,) if operation == RESET else event.ids
+        if operation != UPDATE:
+            for document_id in recent:
+                self._recent[(tenant_id, collection, document_id, operation)] = None
+            while len(self._recent) > RECENT_LOCAL:
+                self._recent.popitem(last=False)
+        self._notify_subscribers(event)
+
+    def _seen_locally(self, tenant_id: Optional[str], collection: str, document_id: Any, operation: str) -> bool:
+        return self._recent.pop((tenant_id, collection, document_id, operation), False) is None
+
+    # -- sources ----------------------------------------------------------
+    async def start(self, db) -> None:
+        if self._task is not None:
+            return
+        try:
+            stream = db.watch(self._pipeline(), full_document="updateLookup")
+            first = await stream.try_next()
+        except Exception as e:
+            logger.info("Change streams indisponíveis (%s); usando eventos locais e polling", e)
+            self._task = asyncio.create_task(self._poll(db))
+            return
+        self.mode = "changestream"
+        if first is not None:
+            self.publish(self._from_change(first))
+        self._task = asyncio.create_task(self._watch(db, stream))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    def _pipeline() -> List[Dict[str, Any]]:
+        # Deletes are announced by their tombstone (every delete of a watched
+        # collection writes one), whose upsert carries the tenant
+        return [{"$match": {
+            "ns.coll": {"$in": [*WATCHED_COLLECTIONS, TOMBSTONE_COLLECTION]},
+            "operationType": {"$in": ["insert", "update", "replace"]},
+        }}]
+
+    def _from_change(self, change: Dict[str, Any]) -> ChangeEvent:
+        document = change.get("fullDocument")
+        operation = UPDATE if change["operationType"] == "replace" else change["operationType"]
+        if change["ns"]["coll"] == TOMBSTONE_COLLECTION:
+            if document is None:
+                return self.event(None, change["ns"]["coll"], DELETE)
+            return self._from_tombstone(document)
+        if document is None:
+            return self.event(None, change["ns"]["coll"], operation)
+        document = {k: v for k, v in document.items() if k != "_id"}
+        ids = (document["id"],) if "id" in document else ()
+        return self.event(document.get("tenant_id"), change["ns"]["coll"], operation, ids, document)
+
+    def _from_tombstone(self, tombstone: Dict[str, Any]) -> ChangeEvent:
+        if tombstone["id"] == ALL_DOCUMENTS:
+            return self.event(tombstone["tenant_id"], tombstone["collection"], RESET)
+        return self.event(tombstone["tenant_id"], tombstone["collection"], DELETE, [tombstone["id"]])
+
+    async def _watch(self, db, stream) -> None:
+        resume_token = None
+        while True:
+            try:
+                async with stream:
+                    while stream.alive:
+                        change = await stream.try_next()
+                        resume_token = stream.resume_token
+                        if change is not None:
+                            self.publish(self._from_change(change))
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.warning("Change stream interrompido, retomando: %s", e)
+                await asyncio.sleep(1.0)
+            stream = db.watch(self._pipeline(), full_document="updateLookup", resume_after=resume_token)
+
+    async def _poll(self, db) -> None:
+        last_ids: Dict[str, Any] = {}
+        deleted_after = (datetime.now(timezone.utc), None)
+        while True:
+            try:
+                deleted_after = await self._poll_tombstones(db, deleted_after)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Falha no polling de %s: %s", TOMBSTONE_COLLECTION, e)
+            for name in WATCHED_COLLECTIONS:
+                try:
+                    if name not in last_ids:
+                        # start from the newest document; retried while the server is unreachable
+                        latest = await db[name].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+                        last_ids[name] = latest["_id"] if latest else None
+                    else:
+                        last_ids[name] = await self._poll_collection(db, name, last_ids[name])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("Falha no polling de %s: %s", name, e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll_collection(self, db, name: str, last_id: Any) -> Any:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        documents = await db[name].find(query, {"_id": 1, "tenant_id": 1, "id": 1}).sort("_id", 1).to_list(POLL_BATCH)
+        by_tenant: Dict[str, List[str]] = {}
+        for document in documents:
+            last_id = document["_id"]
+            document_id = document.get("id")
+            if self._seen_locally(document.get("tenant_id"), name, document_id, INSERT):
+                continue
+            by_tenant.setdefault(document.get("tenant_id"), []).append(document_id)
+        for tenant_id, ids in by_tenant.items():
+            self.publish(self.event(tenant_id, name, INSERT, [i for i in ids if i is not None]))
+        return last_id
+
+    async def _poll_tombstones(self, db, position: tuple) -> tuple:
+        """Announce other workers' deletes; ``position`` is (deleted_at, _id)."""
+        at, last_id = position
+        after = {"deleted_at": {"$gt": at}}
+        if last_id is not None:
+            after = {"$or": [after, {"deleted_at": at, "_id": {"$gt": last_id}}]}
+        # tombstones newer than the settle cutoff may still be joined by
+        # earlier-stamped ones from slower workers; they are read next time
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=SETTLE_SECONDS)
+        query = {"$and": [after, {"deleted_at": {"$lte": cutoff}}, {"collection": {"$in": list(WATCHED_COLLECTIONS)}}]}
+        tombstones = await (
+            db[TOMBSTONE_COLLECTION].find(query).sort([("deleted_at", 1), ("_id", 1)]).to_list(POLL_BATCH)
+        )
+        deleted: Dict[tuple, List[str]] = {}
+        for tombstone in tombstones:
+            position = (tombstone["deleted_at"], tombstone["_id"])
+            operation = RESET if tombstone["id"] == ALL_DOCUMENTS else DELETE
+            if self._seen_locally(tombstone["tenant_id"], tombstone["collection"], tombstone["id"], operation):
+                continue
+            if operation == RESET:
+                self.publish(self._from_tombstone(tombstone))
+            else:
+                deleted.setdefault((tombstone["tenant_id"], tombstone["collection"]), []).append(tombstone["id"])
+        for (tenant_id, collection), ids in deleted.items():
+            self.publish(self.event(tenant_id, collection, DELETE, ids))
+        return position
+
+
+def sse_message(event: ChangeEvent, data: bytes) -> bytes:
+    """One Server-Sent Events frame; ``data`` is the JSON payload."""
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event.seq, event.operation.encode(), data)
@@ -0,0 +1,639 @@
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+EVIDENCE_COLLECTION = "inspection_evidence"
+BLOBS_COLLECTION = "evidence_blobs"
+UPLOADS_COLLECTION = "evidence_uploads"
+GRIDFS_BUCKET = "evidence"
+
+EVIDENCE_STORAGE = os.environ.get("EVIDENCE_STORAGE", "disk")  # disk | gridfs
+EVIDENCE_DIR = Path(os.environ.get("EVIDENCE_DIR", Path(__file__).parent / "evidence_data"))
+# Partial uploads; must be shared by every worker that may receive a chunk
+STAGING_DIR = Path(os.environ.get("EVIDENCE_STAGING_DIR", EVIDENCE_DIR / "tmp"))
+EVIDENCE_WORKERS = int(os.environ.get("EVIDENCE_WORKERS", str(min(2, os.cpu_count() or 1))))
+EVIDENCE_NICENESS = int(os.environ.get("EVIDENCE_NICENESS", "10"))
+# Disk reads/writes of uploads run on their own threads so a burst of photos
+# does not queue behind exports and report downloads on the default executor
+EVIDENCE_IO_THREADS = int(os.environ.get("EVIDENCE_IO_THREADS", "4"))
+MAX_EVIDENCE_SIZE = int(os.environ.get("EVIDENCE_MAX_SIZE_MB", "50")) * 1024 * 1024
+MAX_CHUNK_SIZE = int(os.environ.get("EVIDENCE_MAX_CHUNK_MB", "8")) * 1024 * 1024
+UPLOAD_TTL_HOURS = int(os.environ.get("EVIDENCE_UPLOAD_TTL_HOURS", "24"))
+# Uploads stuck in processing this long (their worker died) are marked failed
+PROCESSING_TIMEOUT = int(os.environ.get("EVIDENCE_PROCESSING_TIMEOUT", "600"))
+THUMBNAIL_SIZE = (320, 320)
+BLOCK_SIZE = 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+
+UPLOADING, PROCESSING, COMPLETE, FAILED = "uploading", "processing", "complete", "failed"
+
+SHA256_PATTERN = r"^[0-9a-f]{64}$"
+# Image details copied from the analysis onto each evidence record
+METADATA_FIELDS = ("width", "height", "taken_at", "camera", "gps", "warning")
+
+
+class UploadError(Exception):
+    status_code = 400
+
+
+class UploadOffsetMismatch(UploadError):
+    status_code = 409
+
+    def __init__(self, offset: int):
+        super().__init__(f"Offset divergente; continue a partir de {offset}")
+        self.offset = offset
+
+
+class UploadTooLarge(UploadError):
+    status_code = 413
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single ``bytes=`` range, or None for the whole file.
+
+    Multiple ranges are answered with the whole file, which RFC 9110 allows.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+# -- worker process ----------------------------------------------------------
+
+def _init_worker() -> None:
+    try:
+        os.nice(EVIDENCE_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"%PDF", "application/pdf"),
+]
+
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    for signature, media_type in _SIGNATURES:
+        if head.startswith(signature):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        return "image/heic" if head[8:12] in (b"heic", b"heix", b"mif1") else "video/mp4"
+    return None
+
+
+def _degrees(value, ref) -> Optional[float]:
+    try:
+        degrees, minutes, seconds = (float(part) for part in value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    decimal = degrees + minutes / 60 + seconds / 3600
+    return round(-decimal if ref in ("S", "W") else decimal, 7)
+
+
+def _image_metadata(path: str, thumbnail_path: str) -> Dict[str, Any]:
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:  # pragma: no cover - Pillow is in requirements.txt
+        return {}
+
+    with Image.open(path) as image:
+        exif = image.getexif()
+        details = exif.get_ifd(0x8769)  # Exif IFD
+        gps_ifd = exif.get_ifd(0x8825)  # GPS IFD
+        metadata: Dict[str, Any] = {"width": image.width, "height": image.height}
+        taken_at = details.get(0x9003) or exif.get(0x0132)  # DateTimeOriginal, DateTime
+        if taken_at:
+            metadata["taken_at"] = str(taken_at).strip("\x00 ")
+        camera = " ".join(str(exif[tag]).strip("\x00 ") for tag in (0x010F, 0x0110) if exif.get(tag))
+        if camera:
+            metadata["camera"] = camera
+        if gps_ifd:
+            lat, lon = _degrees(gps_ifd.get(2), gps_ifd.get(1)), _degrees(gps_ifd.get(4), gps_ifd.get(3))
+            if lat is not None and lon is not None:
+                metadata["gps"] = {"lat": lat, "lon": lon}
+                if gps_ifd.get(6) is not None:
+                    metadata["gps"]["alt"] = round(float(gps_ifd[6]), 1)
+        thumbnail = ImageOps.exif_transpose(image)
+        thumbnail.thumbnail(THUMBNAIL_SIZE)
+        thumbnail.convert("RGB").save(thumbnail_path, "JPEG", quality=80, optimize=True)
+        metadata["thumbnail"] = True
+    return metadata
+
+
+def analyze_file(path: str, thumbnail_path: str) -> Dict[str, Any]:
+    """Entry point in the evidence process: digest, sniffed type, EXIF/GPS and thumbnail."""
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    with open(path, "rb") as handle:
+        while True:
+            block = handle.read(BLOCK_SIZE)
+            if not block:
+                break
+            if not head:
+                head = block[:16]
+            digest.update(block)
+            size += len(block)
+    result: Dict[str, Any] = {"sha256": digest.hexdigest(), "size": size, "media_type": sniff_media_type(head)}
+    if result["media_type"] in ("image/jpeg", "image/png", "image/gif", "image/webp"):
+        try:
+            result.update(_image_metadata(path, thumbnail_path))
+        except Exception as e:  # a corrupt image is still kept as evidence
+            result["warning"] = f"Imagem ilegível: {e}"[:200]
+    return result
+
+
+# -- storage -----------------------------------------------------------------
+
+class DiskStorage:
+    """Blobs under EVIDENCE_DIR/<tenant>/<sha256[:2]>/, addressed by digest."""
+
+    name = "disk"
+
+    def __init__(self, root: Path = EVIDENCE_DIR):
+        self.root = Path(root)
+
+    async def save(self, tenant_id: str, key: str, path: str, media_type: str, io) -> Dict[str, Any]:
+        target = self.root / tenant_id / key[:2] / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        size = os.path.getsize(path)
+        os.replace(path, target)
+        return {"storage": self.name, "path": str(target), "size": size}
+
+    async def open(self, artifact: Dict[str, Any], io, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        with open(artifact["path"], "rb") as handle:
+            handle.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+                chunk = await loop.run_in_executor(io, handle.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, artifact: Dict[str, Any]) -> None:
+        try:
+            os.remove(artifact["path"])
+        except FileNotFoundError:
+            pass
+
+
+class GridFSStorage:
+    """Blobs in the ``evidence`` GridFS bucket, for workers on several hosts."""
+
+    name = "gridfs"
+
+    def __init__(self, db):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=GRIDFS_BUCKET)
+
+    async def save(self, tenant_id: str, key: str, path: str, media_type: str, io) -> Dict[str, Any]:
+        try:
+            upload = self.bucket.open_upload_stream(key, metadata={"tenant_id": tenant_id, "media_type": media_type})
+            loop = asyncio.get_running_loop()
+            with open(path, "rb") as handle:
+                while True:
+                    chunk = await loop.run_in_executor(io, handle.read, CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await upload.write(chunk)
+            await upload.close()
+            return {"storage": self.name, "file_id": upload._id, "size": upload.length}
+        finally:
+            os.remove(path)
+
+    async def open(self, artifact: Dict[str, Any], io, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        stream = await self.bucket.open_download_stream(artifact["file_id"])
+        stream.seek(start)
+        remaining = (end if end is not None else stream.length - 1) - start + 1
+        while remaining > 0:
+            chunk = await stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    async def delete(self, artifact: Dict[str, Any]) -> None:
+        from gridfs.errors import NoFile
+
+        try:
+            await self.bucket.delete(artifact["file_id"])
+        except NoFile:
+            pass
+
+
+def make_storage(db):
+    return GridFSStorage(db) if EVIDENCE_STORAGE == "gridfs" else DiskStorage()
+
+
+# -- uploads -----------------------------------------------------------------
+
+def public_upload(upload: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in upload.items() if k != "_id"}
+
+
+def public_evidence(evidence: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in evidence.items() if k != "_id"}
+
+
+class EvidenceService:
+    """Inspection evidence: resumable uploads, content-addressed blobs, gallery.
+
+    Chunks are appended to a staging file on the I/O threads as they arrive,
+    so no request holds a whole file in memory. When the last byte lands the
+    upload is handed to a process pool for hashing, EXIF/GPS extraction and
+    thumbnailing; the API process only moves the result into storage.
+    Identical content within a tenant is stored once (``evidence_blobs``,
+    reference counted) however many evidence records point at it.
+    """
+
+    def __init__(self, db, storage, workers: int = EVIDENCE_WORKERS, staging_dir: Path = STAGING_DIR):
+        self.db = db
+        self.storage = storage
+        self.workers = workers
+        self.staging_dir = Path(staging_dir)
+        self.io: Optional[ThreadPoolExecutor] = None
+        self._pool: Optional["ProcessPoolExecutor"] = None
+        self._tasks = set()
+        self._janitor: Optional[asyncio.Task] = None
+        # replaced in tests
+        self.analyze = analyze_file
+
+    def start(self) -> None:
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        if self.io is None:
+            self.io = ThreadPoolExecutor(max_workers=EVIDENCE_IO_THREADS, thread_name_prefix="evidence-io")
+        if self._janitor is None:
+            self._janitor = asyncio.create_task(self._clean_up())
+
+    def _executor(self) -> "ProcessPoolExecutor":
+        # created with the first upload, so servers that never receive one skip it
+        if self._pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn: a forked child would inherit the parent's Motor threads and sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+            )
+        return self._pool
+
+    async def stop(self) -> None:
+        if self._janitor is not None:
+            self._janitor.cancel()
+            try:
+                await self._janitor
+            except asyncio.CancelledError:
+                pass
+            self._janitor = None
+        for task in list(self._tasks):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self.io is not None:
+            self.io.shutdown(wait=False)
+            self.io = None
+
+    def staging_path(self, upload_id: str) -> Path:
+        return self.staging_dir / f"{upload_id}.part"
+
+    async def create_upload(self, tenant_id: str, inspection_id: str, filename: str, media_type: Optional[str],
+                            size: int, item_index: Optional[int] = None, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Open an upload session; a known ``sha256`` completes it without any bytes sent."""
+        if size > MAX_EVIDENCE_SIZE:
+            raise UploadTooLarge(f"Arquivo acima do limite de {MAX_EVIDENCE_SIZE // (1024 * 1024)} MB")
+        now = datetime.now(timezone.utc)
+        upload = {
+            "id": str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "inspection_id": inspection_id,
+            "item_index": item_index,
+            "filename": filename,
+            "media_type": media_type,
+            "size": size,
+            "sha256": sha256,
+            "offset": 0,
+            "status": UPLOADING,
+            "created_at": now,
+            "expires_at": now + timedelta(hours=UPLOAD_TTL_HOURS),
+        }
+        if sha256:
+            blob = await self.db[BLOBS_COLLECTION].find_one_and_update(
+                {"tenant_id": tenant_id, "sha256": sha256, "size": size}, {"$inc": {"refs": 1}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if blob is not None:
+                evidence = await self._attach(upload, blob, duplicate=True)
+                upload.update(offset=size, status=COMPLETE, evidence_id=evidence["id"], duplicate=True)
+                await self.db[UPLOADS_COLLECTION].insert_one(dict(upload))
+                return upload
+        await asyncio.get_running_loop().run_in_executor(self.io, self.staging_path(upload["id"]).touch)
+        await self.db[UPLOADS_COLLECTION].insert_one(dict(upload))
+        return upload
+
+    async def get_upload(self, tenant_id: str, upload_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db[UPLOADS_COLLECTION].find_one({"tenant_id": tenant_id, "id": upload_id}, {"_id": 0})
+
+    async def _append(self, upload: Dict[str, Any], offset: int, chunks: AsyncIterable[bytes], limit: int) -> int:
+        """Write ``chunks`` into the staging file from ``offset``; returns the new end."""
+        loop = asyncio.get_running_loop()
+        position = offset
+        buffer = bytearray()
+        handle = await loop.run_in_executor(self.io, open, self.staging_path(upload["id"]), "r+b")
+        try:
+            await loop.run_in_executor(self.io, handle.seek, offset)
+            async for data in chunks:
+                if position + len(buffer) + len(data) > limit:
+                    raise UploadTooLarge(f"Envio excede o tamanho declarado ou o bloco máximo de {MAX_CHUNK_SIZE // (1024 * 1024)} MB")
+                buffer += data
+                if len(buffer) >= BLOCK_SIZE:
+                    await loop.run_in_executor(self.io, handle.write, bytes(buffer))
+                    position += len(buffer)
+                    buffer.clear()
+            if buffer:
+                await loop.run_in_executor(self.io, handle.write, bytes(buffer))
+                position += len(buffer)
+        finally:
+            await loop.run_in_executor(self.io, handle.close)
+        return position
+
+    async def _advance(self, upload: Dict[str, Any], offset: int, position: int) -> Optional[Dict[str, Any]]:
+        changes: Dict[str, Any] = {"offset": position}
+        if position == upload["size"]:
+            changes["status"] = PROCESSING
+            changes["processing_at"] = datetime.now(timezone.utc)
+        return await self.db[UPLOADS_COLLECTION].find_one_and_update(
+            {"tenant_id": upload["tenant_id"], "id": upload["id"], "offset": offset, "status": UPLOADING},
+            {"$set": changes}, return_document=ReturnDocument.AFTER,
+        )
+
+    async def write_chunk(self, upload: Dict[str, Any], offset: int, chunks: AsyncIterable[bytes]) -> Dict[str, Any]:
+        """Append one request body at ``offset``; the final chunk starts processing."""
+        if upload["status"] != UPLOADING:
+            raise UploadError(f"Upload não aceita dados (status {upload['status']})")
+        if offset != upload["offset"]:
+            raise UploadOffsetMismatch(upload["offset"])
+        position = await self._append(upload, offset, chunks, min(upload["size"], offset + MAX_CHUNK_SIZE))
+        updated = await self._advance(upload, offset, position)
+        if updated is None:
+            # another request for the same offset won
+            current = await self.get_upload(upload["tenant_id"], upload["id"])
+            raise UploadOffsetMismatch(current["offset"] if current else offset)
+        if updated["status"] == PROCESSING:
+            task = asyncio.create_task(self._process(updated))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return updated
+
+    async def upload_file(self, tenant_id: str, inspection_id: str, filename: str, media_type: Optional[str],
+                          source, size: int, item_index: Optional[int] = None) -> Dict[str, Any]:
+        """Single-request upload of an already received (spooled) file; waits for processing."""
+        upload = await self.create_upload(tenant_id, inspection_id, filename, media_type, size, item_index)
+        loop = asyncio.get_running_loop()
+
+        async def blocks():
+            while True:
+                block = await loop.run_in_executor(self.io, source.read, BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
+
+        try:
+            position = await self._append(upload, 0, blocks(), size)
+        except BaseException:
+            await self.abort(upload)
+            raise
+        upload = await self._advance(upload, 0, position)
+        if upload is None or upload["status"] != PROCESSING:
+            raise UploadError("Arquivo incompleto")
+        return await self._process(upload, owned=False)
+
+    async def abort(self, upload: Dict[str, Any]) -> None:
+        await self.db[UPLOADS_COLLECTION].delete_one({"tenant_id": upload["tenant_id"], "id": upload["id"]})
+        self._remove_staging(upload["id"])
+
+    def _remove_staging(self, upload_id: str) -> None:
+        for path in (self.staging_path(upload_id), self.staging_path(upload_id).with_suffix(".thumb")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def _process(self, upload: Dict[str, Any], owned: bool = True) -> Dict[str, Any]:
+        uploads = self.db[UPLOADS_COLLECTION]
+        key = {"tenant_id": upload["tenant_id"], "id": upload["id"]}
+        path = self.staging_path(upload["id"])
+        thumbnail_path = path.with_suffix(".thumb")
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor(), self.analyze, str(path), str(thumbnail_path))
+            if result["size"] != upload["size"]:
+                raise UploadError(f"Recebidos {result['size']} de {upload['size']} bytes")
+            if upload.get("sha256") and upload["sha256"] != result["sha256"]:
+                raise UploadError("SHA-256 não confere com o conteúdo enviado")
+            blob, duplicate = await self._store_blob(upload["tenant_id"], result, upload.get("media_type"), path, thumbnail_path)
+            evidence = await self._attach(upload, blob, duplicate, result)
+            await uploads.update_one(key, {"$set": {
+                "status": COMPLETE, "evidence_id": evidence["id"], "duplicate": duplicate, "sha256": blob["sha256"],
+                "finished_at": datetime.now(timezone.utc),
+            }})
+            return evidence
+        except asyncio.CancelledError:
+            await uploads.update_one(key, {"$set": {"status": FAILED, "error": "Servidor reiniciado"}})
+            raise
+        except Exception as e:
+            logger.error("Falha ao processar evidência %s: %s", upload["id"], e)
+            await uploads.update_one(key, {"$set": {
+                "status": FAILED, "finished_at": datetime.now(timezone.utc), "error": str(e)[:500],
+            }})
+            if not owned:
+                raise
+            return {}
+        finally:
+            self._remove_staging(upload["id"])
+
+    async def _store_blob(self, tenant_id: str, result: Dict[str, Any], declared_type: Optional[str],
+                          path: Path, thumbnail_path: Path) -> Tuple[Dict[str, Any], bool]:
+        blobs = self.db[BLOBS_COLLECTION]
+        sha256 = result["sha256"]
+        existing = await blobs.find_one_and_update(
+            {"tenant_id": tenant_id, "sha256": sha256}, {"$inc": {"refs": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if existing is not None:
+            return existing, True
+        media_type = result.get("media_type") or declared_type or "application/octet-stream"
+        blob = {
+            "tenant_id": tenant_id,
+            "sha256": sha256,
+            "size": result["size"],
+            "media_type": media_type,
+            "artifact": await self.storage.save(tenant_id, sha256, str(path), media_type, self.io),
+            "thumbnail": None,
+            # lets a later upload of the same content skip processing
+            "metadata": {field: result[field] for field in METADATA_FIELDS if field in result},
+            "refs": 1,
+            "created_at": datetime.now(timezone.utc),
+        }
+        if result.get("thumbnail") and thumbnail_path.exists():
+            blob["thumbnail"] = await self.storage.save(tenant_id, f"{sha256}.thumb.jpg", str(thumbnail_path), "image/jpeg", self.io)
+        try:
+            await blobs.insert_one(dict(blob))
+        except DuplicateKeyError:
+            # another worker stored the same content first; disk paths are
+            # shared by digest, so only GridFS copies are ours to remove
+            if self.storage.name != "disk":
+                await self.storage.delete(blob["artifact"])
+                if blob["thumbnail"]:
+                    await self.storage.delete(blob["thumbnail"])
+            existing = await blobs.find_one_and_update(
+                {"tenant_id": tenant_id, "sha256": sha256}, {"$inc": {"refs": 1}},
+                return_document=ReturnDocument.AFTER,
+            )
+            return existing, True
+        return blob, False
+
+    async def _attach(self, upload: Dict[str, Any], blob: Dict[str, Any], duplicate: bool,
+                      result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Evidence record for ``upload`` pointing at ``blob``, whose reference is already counted.
+
+        The reference is counted before the record exists so the blob cannot
+        be deleted in between; it is given back when the record is not written.
+        """
+        result = result or blob.get("metadata", {})
+        evidence = {
+            "id": str(uuid.uuid4()),
+            "tenant_id": upload["tenant_id"],
+            "inspection_id": upload["inspection_id"],
+            "item_index": upload.get("item_index"),
+            "filename": upload["filename"],
+            "media_type": blob["media_type"],
+            "size": blob["size"],
+            "sha256": blob["sha256"],
+            "has_thumbnail": bool(blob.get("thumbnail")),
+            "duplicate": duplicate,
+            **{field: result[field] for field in METADATA_FIELDS if field in result},
+            "created_at": datetime.now(timezone.utc),
+        }
+        try:
+            await self.db[EVIDENCE_COLLECTION].insert_one(dict(evidence))
+        except BaseException:
+            await self._release(upload["tenant_id"], blob["sha256"])
+            raise
+        return evidence
+
+    async def gallery(self, tenant_id: str, inspection_id: str, item_index: Optional[int] = None) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"tenant_id": tenant_id, "inspection_id": inspection_id}
+        if item_index is not None:
+            query["item_index"] = item_index
+        return await self.db[EVIDENCE_COLLECTION].find(query, {"_id": 0}).sort("created_at", 1).to_list(None)
+
+    async def get(self, tenant_id: str, evidence_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db[EVIDENCE_COLLECTION].find_one({"tenant_id": tenant_id, "id": evidence_id}, {"_id": 0})
+
+    async def blob(self, evidence: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self.db[BLOBS_COLLECTION].find_one(
+            {"tenant_id": evidence["tenant_id"], "sha256": evidence["sha256"]}, {"_id": 0}
+        )
+
+    def open(self, artifact: Dict[str, Any], start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        return self.storage.open(artifact, self.io, start, end)
+
+    async def delete(self, evidence: Dict[str, Any]) -> None:
+        result = await self.db[EVIDENCE_COLLECTION].delete_one({"tenant_id": evidence["tenant_id"], "id": evidence["id"]})
+        if result.deleted_count:
+            await self._release(evidence["tenant_id"], evidence["sha256"])
+
+    async def remove_inspections(self, tenant_id: str, inspection_ids: List[str]) -> int:
+        """Drop the evidence of deleted inspections."""
+        removed = await self.db[EVIDENCE_COLLECTION].find(
+            {"tenant_id": tenant_id, "inspection_id": {"$in": inspection_ids}}, {"_id": 0, "tenant_id": 1, "id": 1, "sha256": 1}
+        ).to_list(None)
+        for evidence in removed:
+            await self.delete(evidence)
+        return len(removed)
+
+    async def _release(self, tenant_id: str, sha256: str) -> None:
+        blobs = self.db[BLOBS_COLLECTION]
+        blob = await blobs.find_one_and_update(
+            {"tenant_id": tenant_id, "sha256": sha256}, {"$inc": {"refs": -1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if blob is None or blob["refs"] > 0:
+            return
+        result = await blobs.delete_one({"tenant_id": tenant_id, "sha256": sha256, "refs": {"$lte": 0}})
+        if result.deleted_count:
+            await self.storage.delete(blob["artifact"])
+            if blob.get("thumbnail"):
+                await self.storage.delete(blob["thumbnail"])
+
+    async def clean_up_once(self) -> Tuple[int, int]:
+        """Drop expired upload sessions and their staging files; fail stuck ones."""
+        uploads = self.db[UPLOADS_COLLECTION]
+        now = datetime.now(timezone.utc)
+        expired = 0
+        async for upload in uploads.find({"expires_at": {"$lt": now}, "status": {"$ne": PROCESSING}}, {"_id": 0, "tenant_id": 1, "id": 1}):
+            await self.abort(upload)
+            expired += 1
+        stale = await uploads.update_many(
+            {"status": PROCESSING, "processing_at": {"$lt": now - timedelta(seconds=PROCESSING_TIMEOUT)}},
+            {"$set": {"status": FAILED, "finished_at": now, "error": "Tempo limite excedido"}},
+        )
+        return expired, stale.modified_count
+
+    async def _clean_up(self, interval: float = 600.0) -> None:
+        while True:
+            try:
+                expired, stale = await self.clean_up_once()
+                if expired or stale:
+                    logger.info("Evidências: %d upload(s) expirado(s), %d interrompido(s)", expired, stale)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Falha na limpeza de uploads de evidências: %s", e)
+            await asyncio.sleep(interval)
+
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List
+
+from pagination import SORT_KEYS
+
+EXPORT_BATCH_SIZE = 500
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=_default)
+    return value
+
+
+async def _batches(cursor, batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def stream_ndjson(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    async for batch in _batches(cursor, batch_size):
+        yield "".join(
+            json.dumps(document, ensure_ascii=False, default=_default) + "\n" for document in batch
+        ).encode()
+
+
+async def stream_csv(cursor, fields: List[str], batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens accented Portuguese text correctly
+    buffer.write("\ufeff")
+    writer.writerow(fields)
+    async for batch in _batches(cursor, batch_size):
+        for document in batch:
+            writer.writerow([_csv_value(document.get(field)) for field in fields])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_export(collection, query: Dict[str, Any], fields: List[str], fmt: ExportFormat,
+                  batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Stream every matching document straight from the cursor.
+
+    Only one batch is held in memory at a time; Mongo is asked for the same
+    batch size so the driver does not prefetch further ahead.
+    """
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    cursor = (
+        collection.find(query, projection)
+        .sort(SORT_KEYS)
+        .batch_size(batch_size)
+    )
+    if fmt == ExportFormat.CSV:
+        return stream_csv(cursor, fields, batch_size)
+    return stream_ndjson(cursor, batch_size)
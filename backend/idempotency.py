@@ -0,0 +1,87 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+# Keys are forgotten after this (TTL index on created_at)
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+MAX_KEY_LENGTH = 200
+# A request still pending after this long is taken to have died with its
+# worker, and a retry takes its key over
+IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get("IDEMPOTENCY_LEASE_SECONDS", "60"))
+
+PENDING, DONE = "pending", "done"
+
+
+class IdempotencyConflict(Exception):
+    """The key is in use by a request still running, or by a different request."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def fingerprint(method: str, path: str, body: bytes) -> str:
+    return hashlib.sha256(b"\n".join([method.encode(), path.encode(), body])).hexdigest()
+
+
+async def begin(db, tenant_id: str, key: str, request_hash: str) -> Optional[Dict[str, Any]]:
+    """Claim ``key`` for a request; returns the stored response if it already ran.
+
+    The claim is an insert on the unique (tenant_id, key) index, so two
+    concurrent retries cannot both run the write. A claim left pending past
+    its lease (the worker died mid-request) is taken over by the next retry,
+    again by one of them only.
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyConflict(f"{IDEMPOTENCY_HEADER} maior que {MAX_KEY_LENGTH} caracteres", 400)
+    collection = db[IDEMPOTENCY_COLLECTION]
+    now = datetime.now(timezone.utc)
+    try:
+        await collection.insert_one({
+            "tenant_id": tenant_id,
+            "key": key,
+            "request_hash": request_hash,
+            "state": PENDING,
+            "created_at": now,
+            "claimed_at": now,
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+    existing = await collection.find_one({"tenant_id": tenant_id, "key": key}, {"_id": 0})
+    if existing is None:
+        # expired between the insert and the read; try once more
+        return await begin(db, tenant_id, key, request_hash)
+    if existing["request_hash"] != request_hash:
+        raise IdempotencyConflict(f"{IDEMPOTENCY_HEADER} já usada em outra requisição", 422)
+    if existing["state"] != DONE:
+        # claims from before leases have no claimed_at and count as expired
+        taken = await collection.find_one_and_update(
+            {"tenant_id": tenant_id, "key": key, "state": PENDING,
+             "claimed_at": {"$not": {"$gt": now - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)}}},
+            {"$set": {"claimed_at": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if taken is None:
+            raise IdempotencyConflict("Requisição com esta chave ainda em processamento", 409)
+        return None
+    return existing
+
+
+async def complete(db, tenant_id: str, key: str, status_code: int, body: bytes) -> None:
+    await db[IDEMPOTENCY_COLLECTION].update_one(
+        {"tenant_id": tenant_id, "key": key},
+        {"$set": {"state": DONE, "status_code": status_code, "body": body}},
+    )
+
+
+async def abandon(db, tenant_id: str, key: str) -> None:
+    """Release the key after a failed request so the client may retry it."""
+    await db[IDEMPOTENCY_COLLECTION].delete_one({"tenant_id": tenant_id, "key": key, "state": PENDING})
@@ -0,0 +1,307 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+from compliance import HISTORY_COLLECTION as SCORE_HISTORY_COLLECTION, SCORES_COLLECTION
+from evidence import BLOBS_COLLECTION as EVIDENCE_BLOBS_COLLECTION, EVIDENCE_COLLECTION, UPLOADS_COLLECTION as EVIDENCE_UPLOADS_COLLECTION
+from idempotency import IDEMPOTENCY_COLLECTION, IDEMPOTENCY_TTL_HOURS
+from portfolio import PORTFOLIOS_COLLECTION
+from reports import JOBS_COLLECTION as REPORT_JOBS_COLLECTION, SLOTS_COLLECTION as REPORT_SLOTS_COLLECTION
+from sync import TOMBSTONE_COLLECTION, TOMBSTONE_TTL_DAYS
+from tenancy import TENANTS_COLLECTION, USAGE_COLLECTION
+from versions import VERSIONS_COLLECTION
+from waste_analytics import DIMENSIONS as WASTE_DIMENSIONS, MTR_COLLECTION, MTR_FIELD, ROLLUP_COLLECTION as WASTE_ROLLUP_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec(NamedTuple):
+    keys: Tuple[Tuple[str, Union[int, str]], ...]  # direction, or "text"/"2dsphere"/"hashed"
+    unique: bool = False
+    expire_after: Optional[int] = None  # TTL in seconds
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def model(self) -> IndexModel:
+        options = {"expireAfterSeconds": self.expire_after} if self.expire_after is not None else {}
+        return IndexModel(list(self.keys), name=self.name, unique=self.unique, **options)
+
+
+def _idx(*fields: str, unique: bool = False, expire_after: Optional[int] = None) -> IndexSpec:
+    return IndexSpec(tuple((field, ASCENDING) for field in fields), unique, expire_after)
+
+
+# Every tenant-scoped collection is looked up by (tenant_id, id), paged by
+# (tenant_id, created_at, id) and delta-synced by (tenant_id, updated_at, id)
+_COMMON = [_idx("tenant_id", "id", unique=True), _idx("tenant_id", "created_at", "id"), _idx("tenant_id", "updated_at", "id")]
+
+INDEX_SPECS: Dict[str, List[IndexSpec]] = {
+    "licenses": _COMMON + [
+        _idx("tenant_id", "status", "type"),
+        _idx("tenant_id", "type"),
+        _idx("tenant_id", "expiry_at"),
+        # cross-tenant expiry scan of the deadline scheduler
+        _idx("status", "expiry_at"),
+        _idx("tenant_id", "search_keys"),
+    ],
+    "projects": _COMMON + [_idx("tenant_id", "status"), _idx("tenant_id", "search_keys")],
+    "inspections": _COMMON + [_idx("tenant_id", "status"), _idx("tenant_id", "scheduled_at"), _idx("tenant_id", "search_keys")],
+    "water_monitoring": _COMMON + [
+        _idx("tenant_id", "collection_date"),
+        _idx("tenant_id", "location", "collection_date"),
+    ],
+    "waste_management": _COMMON + [_idx("tenant_id", "collection_date"), _idx("tenant_id", "mtr_number"), _idx("tenant_id", MTR_FIELD)],
+    "commitments": _COMMON + [_idx("tenant_id", "status"), _idx("tenant_id", "due_at")],
+    "water_quality_settings": [_idx("tenant_id", unique=True)],
+    IDEMPOTENCY_COLLECTION: [
+        _idx("tenant_id", "key", unique=True),
+        _idx("created_at", expire_after=IDEMPOTENCY_TTL_HOURS * 3600),
+    ],
+    TOMBSTONE_COLLECTION: [
+        _idx("tenant_id", "collection", "id", unique=True),
+        _idx("tenant_id", "collection", "deleted_at", "id"),
+        _idx("deleted_at", expire_after=TOMBSTONE_TTL_DAYS * 86400),
+    ],
+    "upcoming_deadlines": [_idx("tenant_id", "source", "source_id", unique=True), _idx("tenant_id", "due_at")],
+    "water_monitoring_rollups": [_idx("tenant_id", "location", "parameter", "resolution", "bucket", unique=True)],
+    WASTE_ROLLUP_COLLECTION: [_idx("tenant_id", "month", *WASTE_DIMENSIONS, unique=True)],
+    MTR_COLLECTION: [_idx("tenant_id", MTR_FIELD, unique=True), _idx("tenant_id", "count")],
+    EVIDENCE_COLLECTION: [
+        _idx("tenant_id", "id", unique=True),
+        _idx("tenant_id", "inspection_id", "created_at"),
+        _idx("tenant_id", "sha256"),
+    ],
+    EVIDENCE_BLOBS_COLLECTION: [_idx("tenant_id", "sha256", unique=True)],
+    EVIDENCE_UPLOADS_COLLECTION: [_idx("tenant_id", "id", unique=True), _idx("expires_at"), _idx("status", "processing_at")],
+    SCORES_COLLECTION: [_idx("tenant_id", unique=True)],
+    SCORE_HISTORY_COLLECTION: [_idx("tenant_id", "day", unique=True)],
+    PORTFOLIOS_COLLECTION: [_idx("owner_id", "portfolio_id", unique=True)],
+    VERSIONS_COLLECTION: [_idx("tenant_id", "collection", unique=True)],
+    TENANTS_COLLECTION: [_idx("tenant_id", unique=True)],
+    REPORT_JOBS_COLLECTION: [
+        _idx("tenant_id", "id", unique=True),
+        _idx("tenant_id", "status"),
+        _idx("tenant_id", "created_at"),
+        _idx("expires_at"),
+        _idx("status", "created_at"),
+    ],
+    REPORT_SLOTS_COLLECTION: [_idx("tenant_id", "slot", unique=True), _idx("created_at")],
+    USAGE_COLLECTION: [_idx("tenant_id", "day", unique=True)],
+}
+
+# Indexes replaced by a declared one whose constraint they would contradict;
+# dropped on reconciliation whatever ``drop_undeclared`` says
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    # unique across tenants, while client-chosen ids are only unique per tenant
+    "upcoming_deadlines": ["source_1_source_id_1"],
+    # portfolio ids are per owner
+    PORTFOLIOS_COLLECTION: ["portfolio_id_1"],
+}
+
+# Representative (collection, filter, sort) shapes issued by the API endpoints,
+# checked with explain() so a missing index shows up as a COLLSCAN
+_T = "__explain__"
+_PAGE_SORT = {"created_at": 1, "id": 1}
+_PORTFOLIO = {"$in": [_T, _T + "2"]}
+_PORTFOLIO_SORT = {"tenant_id": 1, **_PAGE_SORT}
+ENDPOINT_QUERIES: List[Tuple[str, str, Dict[str, Any], Optional[Dict[str, int]]]] = [
+    ("get_license", "licenses", {"id": "x", "tenant_id": _T}, None),
+    ("get_licenses", "licenses", {"tenant_id": _T}, _PAGE_SORT),
+    ("get_licenses?status", "licenses", {"tenant_id": _T, "status": "Ativa"}, _PAGE_SORT),
+    ("get_licenses?status&type", "licenses", {"tenant_id": _T, "status": "Ativa", "type": "LO"}, _PAGE_SORT),
+    ("get_licenses?type", "licenses", {"tenant_id": _T, "type": "LO"}, _PAGE_SORT),
+    ("get_projects", "projects", {"tenant_id": _T}, _PAGE_SORT),
+    ("get_projects?status", "projects", {"tenant_id": _T, "status": "Em Andamento"}, _PAGE_SORT),
+    ("get_inspections", "inspections", {"tenant_id": _T}, _PAGE_SORT),
+    ("get_water_monitoring", "water_monitoring", {"tenant_id": _T}, _PAGE_SORT),
+    ("water_series?raw", "water_monitoring", {"tenant_id": _T, "location": "x", "collection_date": {"$gte": "2024"}}, {"collection_date": 1}),
+    ("water_series", "water_monitoring_rollups",
+     {"tenant_id": _T, "location": "x", "parameter": "ph_level", "resolution": "day", "bucket": {"$gte": 0}}, {"bucket": 1}),
+    ("get_waste_management", "waste_management", {"tenant_id": _T}, _PAGE_SORT),
+    ("waste_analytics", WASTE_ROLLUP_COLLECTION, {"tenant_id": _T, "month": {"$gte": "2024-01", "$lte": "2024-12"}, "count": {"$gt": 0}}, None),
+    ("mtr_duplicates", MTR_COLLECTION, {"tenant_id": _T, "count": {"$gt": 1}}, {MTR_FIELD: 1}),
+    ("mtr_duplicate_records", "waste_management", {"tenant_id": _T, MTR_FIELD: {"$in": ["MTR-1"]}}, None),
+    ("mtr_missing", "waste_management", {"tenant_id": _T, MTR_FIELD: None}, {"collection_date": 1}),
+    ("get_commitments", "commitments", {"tenant_id": _T}, _PAGE_SORT),
+    ("dashboard", "licenses", {"tenant_id": _T}, None),
+    ("search", "licenses", {"tenant_id": _T, "search_keys": {"$all": ["licenc", "oper"]}}, None),
+    ("sync", "licenses", {"tenant_id": _T, "updated_at": {"$gt": 0}}, {"updated_at": 1, "id": 1}),
+    ("sync?deleted", TOMBSTONE_COLLECTION, {"tenant_id": _T, "collection": "licenses", "deleted_at": {"$gt": 0}}, {"deleted_at": 1, "id": 1}),
+    ("deadlines", "upcoming_deadlines", {"tenant_id": _T, "due_at": {"$gte": 0}}, {"due_at": 1}),
+    ("deadline_scheduler", "licenses", {"status": "Ativa", "expiry_at": {"$lt": 0}}, None),
+    ("evidence_gallery", EVIDENCE_COLLECTION, {"tenant_id": _T, "inspection_id": "x"}, {"created_at": 1}),
+    ("evidence_blob", EVIDENCE_BLOBS_COLLECTION, {"tenant_id": _T, "sha256": "0" * 64}, None),
+    ("compliance_score", SCORES_COLLECTION, {"tenant_id": _T}, None),
+    ("compliance_history", SCORE_HISTORY_COLLECTION, {"tenant_id": _T, "day": {"$gte": "2024-01-01"}}, {"day": 1}),
+    ("portfolio", PORTFOLIOS_COLLECTION, {"owner_id": _T, "portfolio_id": "x"}, None),
+    ("portfolio_summary", SCORES_COLLECTION, {"tenant_id": _PORTFOLIO}, None),
+    ("portfolio_licenses", "licenses", {"tenant_id": _PORTFOLIO}, _PORTFOLIO_SORT),
+    ("portfolio_licenses?status", "licenses", {"tenant_id": _PORTFOLIO, "status": "Ativa"}, _PORTFOLIO_SORT),
+    ("portfolio_commitments", "commitments", {"tenant_id": _PORTFOLIO}, _PORTFOLIO_SORT),
+    ("portfolio_suspended", TENANTS_COLLECTION, {"tenant_id": _PORTFOLIO, "status": "suspended"}, None),
+    ("list_etag", VERSIONS_COLLECTION, {"tenant_id": _T, "collection": "licenses"}, None),
+    ("tenant_context", TENANTS_COLLECTION, {"tenant_id": _T}, None),
+    ("tenant_usage", USAGE_COLLECTION, {"tenant_id": _T, "day": {"$gte": "2024-01-01"}}, {"day": 1}),
+]
+
+
+# Server codes meaning another process already left the index as wanted:
+# IndexAlreadyExists, IndexOptionsConflict, IndexKeySpecsConflict (a racing
+# worker created it) and IndexNotFound (a racing worker dropped it)
+_SETTLED_CODES = {68, 85, 86}
+_DROPPED_CODES = {27}
+
+
+def _settled(error: OperationFailure, codes) -> bool:
+    return error.code in codes or "already exists" in str(error)
+
+
+def _direction(value: Any) -> Union[int, str]:
+    # ascending/descending come back as 1/-1 (or 1.0); special indexes by type name
+    return value if isinstance(value, str) else int(value)
+
+
+def _existing_specs(info: Dict[str, Dict[str, Any]]) -> Dict[str, IndexSpec]:
+    return {
+        name: IndexSpec(
+            tuple((field, _direction(direction)) for field, direction in details["key"]),
+            bool(details.get("unique", False)),
+            int(details["expireAfterSeconds"]) if "expireAfterSeconds" in details else None,
+        )
+        for name, details in info.items()
+        if name != "_id_"
+    }
+
+
+async def ensure_indexes(db, drop_undeclared: bool = False) -> Dict[str, Dict[str, List[str]]]:
+    """Create missing indexes, rebuild changed ones and report drift.
+
+    An index counts as changed when an index of the same name exists with
+    different keys, uniqueness or TTL. Indexes that exist but are not declared in
+    ``INDEX_SPECS`` are reported as ``extra`` and only dropped on request,
+    except those listed in ``RETIRED_INDEXES``. Each collection and index is
+    handled on its own: a failure is logged and reported under ``failed``
+    without stopping the rest, and an index another worker created or dropped
+    meanwhile counts as done.
+    """
+    report: Dict[str, Dict[str, List[str]]] = {}
+    for collection_name, specs in INDEX_SPECS.items():
+        entry = {"created": [], "changed": [], "extra": [], "failed": []}
+        report[collection_name] = entry
+        collection = db[collection_name]
+        try:
+            existing = _existing_specs(await collection.index_information())
+        except PyMongoError as e:
+            logger.error("Falha ao listar índices de %s: %s", collection_name, e)
+            entry["failed"].append(f"*: {e}")
+            continue
+
+        async def drop(name: str) -> bool:
+            try:
+                await collection.drop_index(name)
+            except OperationFailure as e:
+                if not _settled(e, _DROPPED_CODES):
+                    logger.error("Falha ao remover o índice %s.%s: %s", collection_name, name, e)
+                    entry["failed"].append(f"{name}: {e}")
+                    return False
+            except PyMongoError as e:
+                logger.error("Falha ao remover o índice %s.%s: %s", collection_name, name, e)
+                entry["failed"].append(f"{name}: {e}")
+                return False
+            return True
+
+        for spec in specs:
+            current = existing.get(spec.name)
+            if current == spec:
+                continue
+            if current is not None:
+                logger.warning("Índice %s.%s divergente: %s, esperado %s", collection_name, spec.name, current, spec)
+                if not await drop(spec.name):
+                    continue
+            try:
+                await collection.create_indexes([spec.model()])
+            except OperationFailure as e:
+                if not _settled(e, _SETTLED_CODES):
+                    logger.error("Falha ao criar o índice %s.%s: %s", collection_name, spec.name, e)
+                    entry["failed"].append(f"{spec.name}: {e}")
+                    continue
+            except PyMongoError as e:
+                logger.error("Falha ao criar o índice %s.%s: %s", collection_name, spec.name, e)
+                entry["failed"].append(f"{spec.name}: {e}")
+                continue
+            entry["changed" if current is not None else "created"].append(spec.name)
+
+        declared = {spec.name for spec in specs}
+        for name in RETIRED_INDEXES.get(collection_name, []):
+            if name in existing and await drop(name):
+                entry["changed"].append(name)
+        for name in existing:
+            if name not in declared and name not in RETIRED_INDEXES.get(collection_name, []):
+                entry["extra"].append(name)
+                if drop_undeclared:
+                    await drop(name)
+        if entry["extra"]:
+            logger.warning("Índices não declarados em %s: %s", collection_name, ", ".join(entry["extra"]))
+    return report
+
+
+def _plan_stages(plan: Dict[str, Any]):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def find_collscans(db) -> List[Dict[str, Any]]:
+    """Explain every endpoint query shape and return those planned as COLLSCAN."""
+    offenders = []
+    for endpoint, collection_name, query, sort in ENDPOINT_QUERIES:
+        command: Dict[str, Any] = {"find": collection_name, "filter": query}
+        if sort:
+            command["sort"] = sort
+        explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        winning = explain["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in set(_plan_stages(winning)):
+            offenders.append({"endpoint": endpoint, "collection": collection_name, "filter": query})
+    return offenders
+
+
+async def _main(args) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        report = await ensure_indexes(db, drop_undeclared=args.drop_undeclared)
+        for collection_name, entry in report.items():
+            changes = ", ".join(f"{k}={v}" for k, v in entry.items() if v)
+            print(f"{collection_name}: {changes or 'ok'}")
+        failed = any(entry["failed"] for entry in report.values())
+        if args.check:
+            offenders = await find_collscans(db)
+            for offender in offenders:
+                print(f"COLLSCAN: {offender['endpoint']} on {offender['collection']} {offender['filter']}")
+            return 1 if offenders or failed else 0
+        return 1 if failed else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile MongoDB indexes for GaiaSystem collections")
+    parser.add_argument("--check", action="store_true", help="fail if any endpoint query plans a COLLSCAN")
+    parser.add_argument("--drop-undeclared", action="store_true", help="drop indexes not declared in INDEX_SPECS")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
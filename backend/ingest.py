@@ -0,0 +1,82 @@
+import json
+from typing import Any, Dict, List, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+INSERT_CHUNK_SIZE = 1000
+MAX_BATCH_ROWS = 20000
+# Set by the server on every write, never taken from the client
+PROTECTED_FIELDS = {"id", "tenant_id", "created_at", "updated_at", "version"}
+
+
+class BatchParseError(ValueError):
+    pass
+
+
+def parse_rows(body: bytes, content_type: str) -> List[Any]:
+    """Accept either a JSON array or newline-delimited JSON."""
+    text = body.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        rows = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise BatchParseError(f"Linha {line_number}: JSON inválido ({e.msg})")
+    else:
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise BatchParseError(f"JSON inválido ({e.msg})")
+        if not isinstance(rows, list):
+            raise BatchParseError("O corpo deve ser um array JSON ou NDJSON")
+    if len(rows) > MAX_BATCH_ROWS:
+        raise BatchParseError(f"Máximo de {MAX_BATCH_ROWS} registros por requisição")
+    return rows
+
+
+def validate_rows(rows: List[Any], model: Type[BaseModel], overrides: Dict[str, Any]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Validate every row once against ``model``; returns (index, document) pairs and per-row errors.
+
+    PROTECTED_FIELDS are dropped from each row first, so the model's defaults
+    and ``overrides`` fill them in.
+    """
+    documents = []
+    errors = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({"index": index, "errors": ["registro deve ser um objeto JSON"]})
+            continue
+        try:
+            documents.append((index, model.model_validate({
+                **{k: v for k, v in row.items() if k not in PROTECTED_FIELDS}, **overrides,
+            }).model_dump()))
+        except ValidationError as e:
+            errors.append({
+                "index": index,
+                "errors": [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()],
+            })
+    return documents, errors
+
+
+async def insert_chunked(collection, documents: List[Tuple[int, Dict[str, Any]]],
+                         chunk_size: int = INSERT_CHUNK_SIZE) -> Tuple[int, List[Dict[str, Any]]]:
+    """Unordered ``insert_many`` per chunk so one bad row never blocks the rest."""
+    inserted = 0
+    errors = []
+    for start in range(0, len(documents), chunk_size):
+        chunk = documents[start:start + chunk_size]
+        try:
+            result = await collection.insert_many([doc for _, doc in chunk], ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0)
+            for write_error in e.details.get("writeErrors", []):
+                errors.append({
+                    "index": chunk[write_error["index"]][0],
+                    "errors": [write_error.get("errmsg", "erro de escrita")],
+                })
+    return inserted, errors
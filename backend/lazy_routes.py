@@ -0,0 +1,67 @@
+import importlib
+import logging
+import re
+from typing import Dict, Iterable, List, Pattern
+
+logger = logging.getLogger(__name__)
+
+
+def compile_prefix(prefix: str) -> Pattern:
+    """Regex for a path prefix written like a route (``/api/inspections/{inspection_id}/evidence``)."""
+    parts = re.split(r"\{[^}]+\}", prefix)
+    return re.compile("^" + "[^/]+".join(re.escape(part) for part in parts) + "(?:/|$)")
+
+
+class LazyRouters:
+    """Feature routers imported on the first request under their paths.
+
+    ``modules`` maps a module exposing ``router`` (an APIRouter with complete
+    paths, see server.make_api_router) to the path prefixes it serves. Loaded
+    routes go in front of the app's own, as dedicated routes must win over
+    generic ones (``/water-monitoring/limits`` over
+    ``/water-monitoring/{item_id}``). Importing on the event loop blocks it
+    once per module and worker, for a few milliseconds.
+    """
+
+    def __init__(self, app, modules: Dict[str, Iterable[str]]):
+        self.app = app
+        self.modules = {name: [compile_prefix(prefix) for prefix in prefixes] for name, prefixes in modules.items()}
+        self.loaded = set()
+
+    def load(self, name: str) -> None:
+        if name in self.loaded:
+            return
+        router = importlib.import_module(name).router
+        self.app.router.routes[0:0] = router.routes
+        self.loaded.add(name)
+        # the schema is built once; rebuild it with the new routes
+        self.app.openapi_schema = None
+        logger.debug("Rotas carregadas: %s", name)
+
+    def load_all(self) -> None:
+        for name in self.modules:
+            self.load(name)
+
+    def pending_for(self, path: str) -> List[str]:
+        return [
+            name for name, patterns in self.modules.items()
+            if name not in self.loaded and any(pattern.match(path) for pattern in patterns)
+        ]
+
+
+class LazyRoutesMiddleware:
+    """Loads the routers a request needs before routing; the schema endpoint loads them all."""
+
+    def __init__(self, app, routers: LazyRouters, schema_path: str = "/openapi.json"):
+        self.app = app
+        self.routers = routers
+        self.schema_path = schema_path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and len(self.routers.loaded) < len(self.routers.modules):
+            if scope["path"] == self.schema_path:
+                self.routers.load_all()
+            else:
+                for name in self.routers.pending_for(scope["path"]):
+                    self.routers.load(name)
+        await self.app(scope, receive, send)
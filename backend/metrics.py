@@ -0,0 +1,323 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help_text, labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {value:g}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names, self.buckets = name, help_text, labels, buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # one slot per bucket, then +Inf, sum and count
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 3)
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        names = self.label_names + ("le",)
+        for labels, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                yield f"{self.name}_bucket{_labels(names, labels + (le,))} {cumulative:g}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {series[-2]:g}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]:g}"
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help_text, labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {value:g}"
+
+
+http_requests = Counter("gaia_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_duration = Histogram("gaia_http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_request_size = Histogram("gaia_http_request_size_bytes", "HTTP request body size", ("route",), SIZE_BUCKETS)
+http_response_size = Histogram("gaia_http_response_size_bytes", "HTTP response body size", ("route",), SIZE_BUCKETS)
+mongo_duration = Histogram("gaia_mongo_command_duration_seconds", "MongoDB command latency", ("collection", "command"))
+mongo_documents = Counter("gaia_mongo_documents_returned_total", "Documents returned by MongoDB", ("collection", "command"))
+mongo_failures = Counter("gaia_mongo_command_failures_total", "Failed MongoDB commands", ("collection", "command"))
+mongo_slow = Counter("gaia_mongo_slow_commands_total", "MongoDB commands slower than SLOW_QUERY_MS", ("collection", "command"))
+mongo_pool_connections = Gauge("gaia_mongo_pool_connections", "Open pooled connections", ("address",))
+mongo_pool_checked_out = Gauge("gaia_mongo_pool_checked_out", "Connections in use", ("address",))
+mongo_pool_wait = Histogram("gaia_mongo_pool_checkout_wait_seconds", "Time waiting for a pooled connection", ("address",))
+mongo_pool_failures = Counter("gaia_mongo_pool_checkout_failures_total", "Failed connection checkouts (timeout = pool exhausted)", ("address", "reason"))
+tenant_usage = Counter("gaia_tenant_usage_total", "Per-tenant requests, rejections and time spent", ("tenant", "resource"))
+
+REGISTRY = [
+    http_requests, http_duration, http_request_size, http_response_size,
+    mongo_duration, mongo_documents, mongo_failures, mongo_slow,
+    mongo_pool_connections, mongo_pool_checked_out, mongo_pool_wait, mongo_pool_failures,
+    tenant_usage,
+]
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def filter_shape(value: Any) -> Any:
+    """Replace literal values by their type so slow-query logs group by shape, not by tenant data."""
+    if isinstance(value, dict):
+        return {k: filter_shape(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [filter_shape(v) for v in value[:3]]
+    return type(value).__name__
+
+
+# Commands whose first field names the collection
+_COLLECTION_COMMANDS = {"find", "aggregate", "count", "distinct", "insert", "update", "delete", "findAndModify", "createIndexes"}
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Per-collection command latency, documents returned and slow-query log."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[int, int], Tuple[str, Optional[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        command = event.command
+        if event.command_name in _COLLECTION_COMMANDS:
+            collection = str(command.get(event.command_name))
+        else:
+            collection = str(command.get("collection", "-"))
+        query = command.get("filter") or command.get("q") or command.get("pipeline")
+        with self._lock:
+            self._pending[(event.request_id, event.operation_id)] = (collection, query)
+
+    def _finish(self, event) -> Tuple[str, Optional[Dict[str, Any]]]:
+        with self._lock:
+            return self._pending.pop((event.request_id, event.operation_id), ("-", None))
+
+    def succeeded(self, event):
+        collection, query = self._finish(event)
+        seconds = event.duration_micros / 1e6
+        mongo_duration.observe(seconds, collection, event.command_name)
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        if cursor:
+            returned = len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+            mongo_documents.inc(collection, event.command_name, amount=returned)
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            mongo_slow.inc(collection, event.command_name)
+            logger.warning("Consulta lenta %.1f ms: %s.%s %s", seconds * 1000, collection,
+                           event.command_name, filter_shape(query))
+
+    def failed(self, event):
+        collection, query = self._finish(event)
+        mongo_failures.inc(collection, event.command_name)
+        logger.warning("Falha no comando %s.%s %s: %s", collection, event.command_name,
+                       filter_shape(query), event.failure)
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Pool occupancy, checkout wait and checkout failures.
+
+    A checkout starts and finishes on the same driver thread, so the wait is
+    timed with a thread-local start.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        logger.warning("Pool de conexões limpo para %s", _address(event))
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        mongo_pool_connections.inc(_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongo_pool_connections.dec(_address(event))
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        mongo_pool_failures.inc(_address(event), str(event.reason))
+        self._local.started = None
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            mongo_pool_wait.observe(time.perf_counter() - started, _address(event))
+            self._local.started = None
+        mongo_pool_checked_out.inc(_address(event))
+
+    def connection_checked_in(self, event):
+        mongo_pool_checked_out.dec(_address(event))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware so streamed bodies (exports) are measured too."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        state = {"status": 500}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            route = scope.get("route")
+            # Route templates keep label cardinality bounded (no ids in labels)
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, path, str(state["status"]))
+            http_duration.observe(time.perf_counter() - started, method, path)
+            http_request_size.observe(sizes["request"], path)
+            http_response_size.observe(sizes["response"], path)
+
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_HEADER = "x-profile"
+
+
+class ProfilingMiddleware:
+    """Profile a single request when PROFILING_ENABLED=true and it sends ``X-Profile: 1``.
+
+    Uses pyinstrument's sampling profiler when installed, cProfile otherwise,
+    and logs the report. Other requests pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        if headers.get(PROFILE_HEADER.encode()) not in (b"1", b"true"):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            Profiler = None
+
+        if Profiler is not None:
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                profiler.stop()
+                logger.info("Perfil de %s %s:\n%s", scope["method"], scope["path"], profiler.output_text())
+            return
+
+        import cProfile
+        import io
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(30)
+            logger.info("Perfil de %s %s:\n%s", scope["method"], scope["path"], report.getvalue())
@@ -0,0 +1,129 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Lists were unpaged (capped at 1000 rows) before cursors existed, and the
+# frontend still loads them whole: a request without limit gets the same rows
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+
+# Stable keyset order: created_at breaks most ties, id settles the rest
+SORT_KEYS = [("created_at", 1), ("id", 1)]
+# Pages spanning several tenants (portfolio views) walk one tenant after the
+# other, which is the order of the (tenant_id, created_at, id) indexes
+TENANT_SORT_KEYS = [("tenant_id", 1)] + SORT_KEYS
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode(values: List[Any]) -> str:
+    payload = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> List[Any]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def _created_at(document: Dict[str, Any]) -> Any:
+    created_at = document["created_at"]
+    if isinstance(created_at, datetime):
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        created_at = created_at.isoformat()
+    return created_at
+
+
+def encode_cursor(document: Dict[str, Any]) -> str:
+    return _encode([_created_at(document), document["id"]])
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, doc_id = _decode(cursor)
+        return datetime.fromisoformat(created_at), str(doc_id)
+    except Exception:
+        raise InvalidCursor("Cursor de paginação inválido")
+
+
+def encode_tenant_cursor(document: Dict[str, Any]) -> str:
+    return _encode([document["tenant_id"], _created_at(document), document["id"]])
+
+
+def decode_tenant_cursor(cursor: str) -> Tuple[str, datetime, str]:
+    try:
+        tenant_id, created_at, doc_id = _decode(cursor)
+        return str(tenant_id), datetime.fromisoformat(created_at), str(doc_id)
+    except Exception:
+        raise InvalidCursor("Cursor de paginação inválido")
+
+
+def keyset_filter(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    if not cursor:
+        return query
+    created_at, doc_id = decode_cursor(cursor)
+    after = {
+        "$or": [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "id": {"$gt": doc_id}},
+        ]
+    }
+    return {"$and": [query, after]}
+
+
+def tenant_keyset_filter(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    if not cursor:
+        return query
+    tenant_id, created_at, doc_id = decode_tenant_cursor(cursor)
+    after = {
+        "$or": [
+            {"tenant_id": {"$gt": tenant_id}},
+            {"tenant_id": tenant_id, "created_at": {"$gt": created_at}},
+            {"tenant_id": tenant_id, "created_at": created_at, "id": {"$gt": doc_id}},
+        ]
+    }
+    return {"$and": [query, after]}
+
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None,
+    across_tenants: bool = False,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return one page of documents plus the cursor for the next one.
+
+    Reads ``limit + 1`` rows so the presence of a further page is known
+    without a second round-trip. ``across_tenants`` pages through several
+    tenants in TENANT_SORT_KEYS order; the projection must keep tenant_id.
+    """
+    if across_tenants:
+        query, sort, encode = tenant_keyset_filter(query, cursor), TENANT_SORT_KEYS, encode_tenant_cursor
+    else:
+        query, sort, encode = keyset_filter(query, cursor), SORT_KEYS, encode_cursor
+    documents = await (
+        collection.find(query, projection)
+        .sort(sort)
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode(documents[-1])
+    return documents, next_cursor
+
+
+def page_headers(next_cursor: Optional[str], total: Optional[int] = None) -> Dict[str, str]:
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    return headers
@@ -0,0 +1,85 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from tenancy import SUSPENDED, TENANTS_COLLECTION, valid_tenant_id
+
+PORTFOLIOS_COLLECTION = "portfolios"
+
+# Largest set of tenants one portfolio (or one tenant_ids list) may name
+MAX_PORTFOLIO_TENANTS = int(os.environ.get("PORTFOLIO_MAX_TENANTS", "1000"))
+
+
+class PortfolioError(ValueError):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_tenant_ids(values: Iterable[str]) -> List[str]:
+    """Sorted, de-duplicated tenant ids; raises PortfolioError on a bad or oversized set."""
+    tenant_ids = sorted({value.strip() for value in values if value and value.strip()})
+    if not tenant_ids:
+        raise PortfolioError("Nenhum tenant informado")
+    if len(tenant_ids) > MAX_PORTFOLIO_TENANTS:
+        raise PortfolioError(f"Um portfólio aceita no máximo {MAX_PORTFOLIO_TENANTS} tenants")
+    invalid = [tenant_id for tenant_id in tenant_ids if not valid_tenant_id(tenant_id)]
+    if invalid:
+        raise PortfolioError(f"tenant_id inválido: {', '.join(invalid[:5])}")
+    return tenant_ids
+
+
+# Portfolios belong to the tenant that saved them (the consultancy's own
+# tenant); ids are unique per owner and other tenants never see them
+async def save_portfolio(db, owner_id: str, portfolio_id: str, name: str, tenant_ids: Iterable[str]) -> Dict[str, Any]:
+    if not valid_tenant_id(portfolio_id):
+        raise PortfolioError("portfolio_id inválido")
+    document = {"owner_id": owner_id, "portfolio_id": portfolio_id, "name": name, "tenant_ids": parse_tenant_ids(tenant_ids)}
+    await db[PORTFOLIOS_COLLECTION].replace_one({"owner_id": owner_id, "portfolio_id": portfolio_id}, document, upsert=True)
+    return document
+
+
+async def get_portfolio(db, owner_id: str, portfolio_id: str) -> Dict[str, Any]:
+    document = await db[PORTFOLIOS_COLLECTION].find_one({"owner_id": owner_id, "portfolio_id": portfolio_id}, {"_id": 0})
+    if document is None:
+        raise PortfolioError("Portfólio não encontrado", 404)
+    return document
+
+
+async def delete_portfolio(db, owner_id: str, portfolio_id: str) -> None:
+    result = await db[PORTFOLIOS_COLLECTION].delete_one({"owner_id": owner_id, "portfolio_id": portfolio_id})
+    if result.deleted_count == 0:
+        raise PortfolioError("Portfólio não encontrado", 404)
+
+
+async def resolve_tenants(db, owner_id: str, tenant_ids: Optional[str], portfolio_id: Optional[str]) -> List[str]:
+    """Tenants a portfolio request covers, from a comma-separated list or a saved portfolio.
+
+    Suspended tenants are left out, as their own endpoints would refuse them;
+    one ``$in`` query on ``tenants`` finds them.
+    """
+    if (tenant_ids is None) == (portfolio_id is None):
+        raise PortfolioError("Informe tenant_ids ou portfolio_id")
+    if portfolio_id is not None:
+        members = (await get_portfolio(db, owner_id, portfolio_id))["tenant_ids"]
+    else:
+        members = parse_tenant_ids(tenant_ids.split(","))
+    suspended = set(await db[TENANTS_COLLECTION].distinct("tenant_id", {"tenant_id": {"$in": members}, "status": SUSPENDED}))
+    return [tenant_id for tenant_id in members if tenant_id not in suspended]
+
+
+def tenants_after(tenant_ids: List[str], cursor: Optional[str], limit: int) -> Tuple[List[str], Optional[str]]:
+    """One page of a sorted tenant list: ``(page, next_cursor)``; the cursor is the last tenant id."""
+    remaining = [tenant_id for tenant_id in tenant_ids if cursor is None or tenant_id > cursor]
+    page = remaining[:limit]
+    return page, (page[-1] if len(remaining) > limit else None)
+
+
+def group_by_tenant(documents: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """``[{"tenant_id", "items"}]`` from documents already sorted by tenant."""
+    groups: List[Dict[str, Any]] = []
+    for document in documents:
+        tenant_id = document.pop("tenant_id")
+        if not groups or groups[-1]["tenant_id"] != tenant_id:
+            groups.append({"tenant_id": tenant_id, "items": []})
+        groups[-1]["items"].append(document)
+    return groups
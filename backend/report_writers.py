@@ -0,0 +1,336 @@
+"""Streaming XLSX and PDF writers for reports.
+
+Both write rows to disk as they arrive, so a report never holds more than
+one page (PDF) or one row (XLSX) in memory. They only use the standard
+library: reports run in worker processes that should start fast and the
+output needs nothing beyond tables.
+"""
+
+import re
+import zipfile
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+# XML 1.0 forbids most control characters, even escaped
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, float):
+        return f"{value:g}"
+    if isinstance(value, (list, tuple)):
+        return ", ".join(cell_text(v) for v in value)
+    return str(value)
+
+
+class ReportWriter(ABC):
+    """Sections of rows under a title, plus a summary shown first."""
+
+    @abstractmethod
+    def section(self, name: str, headers: Sequence[str]) -> None:
+        ...
+
+    @abstractmethod
+    def row(self, values: Sequence[Any]) -> None:
+        ...
+
+    @abstractmethod
+    def summary(self, rows: Sequence[Tuple[str, Any]]) -> None:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+
+# -- XLSX -------------------------------------------------------------------
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+# style 0: normal, 1: bold (headers)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+    '<sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+_SHEET_NAME_INVALID = re.compile(r"[\[\]:*?/\\]")
+
+
+def _column(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_cell(ref: str, value: Any, style: int = 0) -> str:
+    style_attr = f' s="{style}"' if style else ""
+    if isinstance(value, bool) or value is None or not isinstance(value, (int, float)):
+        text = escape(_INVALID_XML.sub("", cell_text(value)))
+        return f'<c r="{ref}" t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+    return f'<c r="{ref}"{style_attr}><v>{value!r}</v></c>'
+
+
+class XLSXWriter(ReportWriter):
+    """One worksheet per section, the summary as the first sheet.
+
+    Sheets are written straight into the zip as rows arrive; the workbook
+    part listing them (and their order) is written on close.
+    """
+
+    MAX_ROWS = 1048575  # Excel's limit, minus the header
+
+    def __init__(self, path: str, title: str):
+        self.title = title
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheets: List[Tuple[int, str]] = []  # (part number, name)
+        self._summary_part: Optional[int] = None
+        self._stream = None
+        self._row = 0
+
+    def _open_sheet(self, name: str) -> int:
+        self._close_sheet()
+        part = len(self._sheets) + 1
+        name = _SHEET_NAME_INVALID.sub(" ", name)[:31] or f"Planilha{part}"
+        self._sheets.append((part, name))
+        self._stream = self._zip.open(f"xl/worksheets/sheet{part}.xml", "w", force_zip64=True)
+        self._stream.write(_SHEET_HEAD.encode())
+        self._row = 0
+        return part
+
+    def _write_row(self, values: Sequence[Any], style: int = 0) -> None:
+        self._row += 1
+        cells = "".join(_xlsx_cell(f"{_column(i)}{self._row}", v, style) for i, v in enumerate(values))
+        self._stream.write(f'<row r="{self._row}">{cells}</row>'.encode())
+
+    def _close_sheet(self) -> None:
+        if self._stream is not None:
+            self._stream.write(_SHEET_TAIL.encode())
+            self._stream.close()
+            self._stream = None
+
+    def section(self, name: str, headers: Sequence[str]) -> None:
+        self._open_sheet(name)
+        self._write_row(headers, style=1)
+
+    def row(self, values: Sequence[Any]) -> None:
+        if self._row <= self.MAX_ROWS:
+            self._write_row(values)
+
+    def summary(self, rows: Sequence[Tuple[str, Any]]) -> None:
+        self._summary_part = self._open_sheet("Resumo")
+        self._write_row([self.title], style=1)
+        for label, value in rows:
+            self._write_row([label, value])
+        self._close_sheet()
+
+    def close(self) -> None:
+        self._close_sheet()
+        order = sorted(self._sheets, key=lambda sheet: sheet[0] != self._summary_part)
+        sheets = "".join(
+            f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{part}"/>'
+            for i, (part, name) in enumerate(order, start=1)
+        )
+        self._zip.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{sheets}</sheets></workbook>'
+        ))
+        relationships = "".join(
+            f'<Relationship Id="rId{part}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{part}.xml"/>'
+            for part, _ in self._sheets
+        )
+        styles_id = len(self._sheets) + 1
+        self._zip.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{relationships}<Relationship Id="rId{styles_id}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+            '</Relationships>'
+        ))
+        self._zip.writestr("xl/styles.xml", _STYLES)
+        self._zip.writestr("_rels/.rels", _ROOT_RELS)
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{part}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for part, _ in self._sheets
+        )
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES.format(sheets=overrides))
+        self._zip.close()
+
+
+# -- PDF --------------------------------------------------------------------
+
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595  # A4 landscape, points
+MARGIN = 36
+FONT_SIZE = 8
+LINE_HEIGHT = 11
+# Helvetica's average glyph is about half an em wide
+CHAR_WIDTH = FONT_SIZE * 0.5
+
+
+def _pdf_text(text: str) -> str:
+    # WinAnsiEncoding covers Portuguese; anything else becomes "?"
+    encoded = text.encode("cp1252", errors="replace").decode("latin-1")
+    return encoded.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").replace("\r", " ").replace("\n", " ")
+
+
+class PDFWriter(ReportWriter):
+    """Plain tables in Helvetica on A4 landscape pages.
+
+    Each page is written as soon as it fills; the page tree, placed at
+    reserved object numbers, is written on close with the summary page first.
+    """
+
+    _CATALOG, _PAGES, _FONT, _BOLD = 1, 2, 3, 4
+
+    def __init__(self, path: str, title: str):
+        self.title = title
+        self._file = open(path, "wb")
+        self._offsets: Dict[int, int] = {}
+        self._next_object = 5
+        self._pages: List[int] = []
+        self._summary_pages: List[int] = []
+        self._lines: List[Tuple[str, bool]] = []
+        self._headers: List[str] = []
+        self._widths: List[int] = []
+        self._section = ""
+        self._page_number = 0
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, body: bytes, number: Optional[int] = None) -> int:
+        if number is None:
+            number = self._next_object
+            self._next_object += 1
+        self._offsets[number] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        return number
+
+    @property
+    def _lines_per_page(self) -> int:
+        return int((PAGE_HEIGHT - 2 * MARGIN - 2 * LINE_HEIGHT) // LINE_HEIGHT)
+
+    def _flush_page(self, target: List[int]) -> None:
+        if not self._lines:
+            return
+        self._page_number += 1
+        commands = [f"BT /F2 10 Tf {MARGIN} {PAGE_HEIGHT - MARGIN} Td ({_pdf_text(self.title)}) Tj ET"]
+        y = PAGE_HEIGHT - MARGIN - 2 * LINE_HEIGHT
+        for text, bold in self._lines:
+            font = "/F2" if bold else "/F1"
+            commands.append(f"BT {font} {FONT_SIZE} Tf {MARGIN} {y} Td ({_pdf_text(text)}) Tj ET")
+            y -= LINE_HEIGHT
+        commands.append(f"BT /F1 {FONT_SIZE} Tf {PAGE_WIDTH - MARGIN - 40} {MARGIN / 2} Td (p. {self._page_number}) Tj ET")
+        stream = "\n".join(commands).encode("latin-1")
+        content = self._object(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page = self._object(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> >>"
+            % (self._PAGES, PAGE_WIDTH, PAGE_HEIGHT, content, self._FONT, self._BOLD)
+        )
+        target.append(page)
+        self._lines = []
+
+    def _add_line(self, text: str, bold: bool = False, target: Optional[List[int]] = None) -> None:
+        if len(self._lines) >= self._lines_per_page:
+            self._flush_page(self._pages if target is None else target)
+            if target is None and self._headers:
+                # repeat the section and column headers on every page
+                self._lines.append((f"{self._section} (cont.)", True))
+                self._lines.append((self._format(self._headers), True))
+        self._lines.append((text, bold))
+
+    def _format(self, values: Sequence[Any]) -> str:
+        cells = []
+        for value, width in zip(values, self._widths):
+            text = cell_text(value)
+            if len(text) > width:
+                text = text[: max(1, width - 1)] + "…"
+            cells.append(text.ljust(width))
+        return "  ".join(cells)
+
+    def section(self, name: str, headers: Sequence[str]) -> None:
+        self._flush_page(self._pages)
+        usable = int((PAGE_WIDTH - 2 * MARGIN) / CHAR_WIDTH) - 2 * (len(headers) - 1)
+        # equal share per column, but never narrower than the header
+        share = max(4, usable // max(1, len(headers)))
+        self._widths = [max(share, min(len(h), usable // 2)) for h in headers]
+        self._section = name
+        self._headers = list(headers)
+        self._lines.append((name, True))
+        self._lines.append((self._format(headers), True))
+
+    def row(self, values: Sequence[Any]) -> None:
+        self._add_line(self._format(values))
+
+    def summary(self, rows: Sequence[Tuple[str, Any]]) -> None:
+        self._flush_page(self._pages)
+        self._headers = []
+        self._lines.append(("Resumo", True))
+        for label, value in rows:
+            self._add_line(f"{label}: {cell_text(value)}", target=self._summary_pages)
+        self._flush_page(self._summary_pages)
+
+    def close(self) -> None:
+        self._flush_page(self._pages)
+        if not self._pages and not self._summary_pages:
+            self._lines.append(("Sem dados", False))
+            self._flush_page(self._pages)
+        kids = self._summary_pages + self._pages
+        self._object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>", self._FONT)
+        self._object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>", self._BOLD)
+        self._object(
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids)),
+            self._PAGES,
+        )
+        self._object(b"<< /Type /Catalog /Pages %d 0 R >>" % self._PAGES, self._CATALOG)
+        xref_at = self._file.tell()
+        count = self._next_object
+        self._file.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for number in range(1, count):
+            self._file.write(b"%010d 00000 n \n" % self._offsets[number])
+        self._file.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, self._CATALOG, xref_at))
+        self._file.close()
+
+
+WRITERS = {"xlsx": XLSXWriter, "pdf": PDFWriter}
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
@@ -0,0 +1,438 @@
+import asyncio
+import logging
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "report_jobs"
+# One document per queued/running job of a tenant, numbered below
+# MAX_ACTIVE_JOBS_PER_TENANT and unique per tenant, so the cap holds across
+# concurrent submits
+SLOTS_COLLECTION = "report_slots"
+GRIDFS_BUCKET = "reports"
+
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Report processes run at lower CPU priority than the API workers
+REPORT_NICENESS = int(os.environ.get("REPORT_NICENESS", "10"))
+REPORT_STORAGE = os.environ.get("REPORT_STORAGE", "disk")  # disk | gridfs
+REPORTS_DIR = Path(os.environ.get("REPORTS_DIR", Path(__file__).parent / "reports_data"))
+REPORT_TTL_HOURS = int(os.environ.get("REPORT_TTL_HOURS", "72"))
+# Jobs running longer than this (e.g. their worker died) are marked failed
+REPORT_JOB_TIMEOUT = int(os.environ.get("REPORT_JOB_TIMEOUT", "1800"))
+MAX_ACTIVE_JOBS_PER_TENANT = int(os.environ.get("REPORT_MAX_ACTIVE_JOBS", "3"))
+REPORT_BATCH_SIZE = 1000
+CHUNK_SIZE = 256 * 1024
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class ReportFormat(str, Enum):
+    XLSX = "xlsx"
+    PDF = "pdf"
+
+
+class ReportKind(str, Enum):
+    MODULES = "modules"
+    COMPLIANCE = "compliance"
+
+
+# module -> (collection, title, [(field, header)], field counted in the summary)
+REPORT_SECTIONS: Dict[str, Tuple[str, str, List[Tuple[str, str]], Optional[str]]] = {
+    "licenses": ("licenses", "Licenças", [
+        ("number", "Número"), ("type", "Tipo"), ("title", "Título"), ("company", "Empresa"), ("cnpj", "CNPJ"),
+        ("status", "Status"), ("issue_date", "Emissão"), ("expiry_date", "Validade"), ("issuing_body", "Órgão"),
+    ], "status"),
+    "projects": ("projects", "Projetos", [
+        ("name", "Nome"), ("status", "Status"), ("start_date", "Início"), ("end_date", "Término"),
+        ("budget", "Orçamento"), ("manager", "Gestor"), ("location", "Local"),
+    ], "status"),
+    "inspections": ("inspections", "Vistorias", [
+        ("title", "Título"), ("location", "Local"), ("scheduled_date", "Data"), ("inspector", "Inspetor"),
+        ("status", "Status"), ("conformity_percentage", "Conformidade (%)"),
+    ], "status"),
+    "water-monitoring": ("water_monitoring", "Monitoramento Hídrico", [
+        ("location", "Ponto"), ("collection_date", "Coleta"), ("ph_level", "pH"), ("turbidity", "Turbidez"),
+        ("dissolved_oxygen", "OD"), ("temperature", "Temperatura"), ("conductivity", "Condutividade"),
+        ("status", "Status"), ("exceedances", "Parâmetros fora do limite"),
+    ], "status"),
+    "waste": ("waste_management", "Resíduos (MTR)", [
+        ("mtr_number", "MTR"), ("collection_date", "Data"), ("waste_type", "Resíduo"), ("classification", "Classe"),
+        ("quantity", "Quantidade"), ("unit", "Unidade"), ("destination", "Destino"),
+        ("transport_company", "Transportador"), ("status", "Status"),
+    ], "status"),
+    "commitments": ("commitments", "Compromissos", [
+        ("title", "Título"), ("due_date", "Prazo"), ("responsible", "Responsável"), ("status", "Status"),
+        ("priority", "Prioridade"), ("progress", "Progresso (%)"),
+    ], "status"),
+}
+# The multi-module compliance report
+COMPLIANCE_MODULES = ["licenses", "inspections", "waste"]
+
+
+class ReportLimitExceeded(Exception):
+    pass
+
+
+def report_modules(kind: ReportKind, modules: Optional[List[str]]) -> List[str]:
+    if kind == ReportKind.COMPLIANCE:
+        return COMPLIANCE_MODULES
+    modules = list(dict.fromkeys(modules or []))
+    unknown = [m for m in modules if m not in REPORT_SECTIONS]
+    if not modules or unknown:
+        raise ValueError(f"Módulos inválidos: {', '.join(unknown) or 'nenhum informado'}")
+    return modules
+
+
+# -- worker process ----------------------------------------------------------
+
+def _init_worker() -> None:
+    try:
+        os.nice(REPORT_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+def write_report(spec: Dict[str, Any], sections, path: str) -> Dict[str, Any]:
+    """Write ``sections`` — (module, rows iterator) pairs — as the report file."""
+    from report_writers import WRITERS
+
+    writer = WRITERS[spec["format"]](path, spec["title"])
+    summary: List[Tuple[str, Any]] = [("Tenant", spec["tenant_id"]), ("Gerado em", spec["created_at"])]
+    total = 0
+    try:
+        for module, rows in sections:
+            _, title, columns, count_field = REPORT_SECTIONS[module]
+            writer.section(title, [header for _, header in columns])
+            counts: Dict[str, int] = {}
+            section_total = 0
+            for document in rows:
+                writer.row([document.get(field) for field, _ in columns])
+                section_total += 1
+                if count_field:
+                    key = str(document.get(count_field) or "-")
+                    counts[key] = counts.get(key, 0) + 1
+            summary.append((f"{title}: total", section_total))
+            summary.extend((f"{title}: {key}", value) for key, value in sorted(counts.items()))
+            total += section_total
+        writer.summary(summary)
+    finally:
+        writer.close()
+    return {"rows": total, "size": os.path.getsize(path)}
+
+
+def build_report(spec: Dict[str, Any], path: str) -> Dict[str, Any]:
+    """Entry point in the report process: stream every section from Mongo.
+
+    Uses its own synchronous client (nothing is shared with the API
+    process) reading from secondaries when there are any, one batch at a time.
+    """
+    from pymongo import MongoClient
+    from database import client_options, read_preference
+
+    options = {**client_options(), "maxPoolSize": 2, "minPoolSize": 0, "appname": "gaia-reports"}
+    client = MongoClient(spec["mongo_url"], **options)
+    try:
+        db = client.get_database(spec["db_name"], read_preference=read_preference())
+
+        def sections():
+            for module in spec["modules"]:
+                collection_name, _, columns, _ = REPORT_SECTIONS[module]
+                projection = {"_id": 0, **{field: 1 for field, _ in columns}}
+                cursor = (
+                    db[collection_name].find({"tenant_id": spec["tenant_id"]}, projection)
+                    .sort([("created_at", 1), ("id", 1)])
+                    .batch_size(REPORT_BATCH_SIZE)
+                )
+                yield module, cursor
+
+        return write_report(spec, sections(), path)
+    finally:
+        client.close()
+
+
+# -- storage -----------------------------------------------------------------
+
+class DiskStorage:
+    """Artifacts under REPORTS_DIR/<tenant>/; every worker on the host sees them."""
+
+    name = "disk"
+
+    def __init__(self, root: Path = REPORTS_DIR):
+        self.root = Path(root)
+
+    def temp_path(self, job_id: str, fmt: str) -> str:
+        (self.root / "tmp").mkdir(parents=True, exist_ok=True)
+        return str(self.root / "tmp" / f"{job_id}.{fmt}")
+
+    async def save(self, job: Dict[str, Any], temp_path: str) -> Dict[str, Any]:
+        target = self.root / job["tenant_id"] / f"{job['id']}.{job['format']}"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, target)
+        return {"storage": self.name, "path": str(target)}
+
+    async def open(self, artifact: Dict[str, Any]) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        with open(artifact["path"], "rb") as handle:
+            while True:
+                chunk = await loop.run_in_executor(None, handle.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def delete(self, artifact: Dict[str, Any]) -> None:
+        try:
+            os.remove(artifact["path"])
+        except FileNotFoundError:
+            pass
+
+
+class GridFSStorage:
+    """Artifacts in the ``reports`` GridFS bucket, for workers on several hosts."""
+
+    name = "gridfs"
+
+    def __init__(self, db):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=GRIDFS_BUCKET)
+
+    def temp_path(self, job_id: str, fmt: str) -> str:
+        handle, path = tempfile.mkstemp(prefix=f"report-{job_id}-", suffix=f".{fmt}")
+        os.close(handle)
+        return path
+
+    async def save(self, job: Dict[str, Any], temp_path: str) -> Dict[str, Any]:
+        try:
+            upload = self.bucket.open_upload_stream(
+                job["filename"], metadata={"tenant_id": job["tenant_id"], "job_id": job["id"]}
+            )
+            loop = asyncio.get_running_loop()
+            with open(temp_path, "rb") as handle:
+                while True:
+                    chunk = await loop.run_in_executor(None, handle.read, CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await upload.write(chunk)
+            await upload.close()
+            return {"storage": self.name, "file_id": upload._id}
+        finally:
+            os.remove(temp_path)
+
+    async def open(self, artifact: Dict[str, Any]) -> AsyncIterator[bytes]:
+        stream = await self.bucket.open_download_stream(artifact["file_id"])
+        while True:
+            chunk = await stream.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+    async def delete(self, artifact: Dict[str, Any]) -> None:
+        from gridfs.errors import NoFile
+
+        try:
+            await self.bucket.delete(artifact["file_id"])
+        except NoFile:
+            pass
+
+
+def make_storage(db):
+    return GridFSStorage(db) if REPORT_STORAGE == "gridfs" else DiskStorage()
+
+
+# -- jobs --------------------------------------------------------------------
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in job.items() if k not in ("_id", "artifact", "spec")}
+
+
+class ReportService:
+    """Report jobs: queued in ``report_jobs``, generated on a process pool.
+
+    The API process only inserts the job, awaits the pool future and moves
+    the finished file into storage, so generation never competes with
+    request handling for the event loop. Status is polled from the job
+    document, which any worker can serve.
+    """
+
+    def __init__(self, db, storage, mongo_url: str, db_name: str, workers: int = REPORT_WORKERS):
+        self.db = db
+        self.storage = storage
+        self.mongo_url = mongo_url
+        self.db_name = db_name
+        self.workers = workers
+        self._pool: Optional["ProcessPoolExecutor"] = None
+        self._tasks = set()
+        self._janitor: Optional[asyncio.Task] = None
+        # replaced in tests
+        self.generate = build_report
+
+    def start(self) -> None:
+        if self._janitor is None:
+            self._janitor = asyncio.create_task(self._clean_up())
+
+    def _executor(self) -> "ProcessPoolExecutor":
+        # created with the first job, so servers that never build a report skip it
+        if self._pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn: a forked child would inherit the parent's Motor threads and sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+            )
+        return self._pool
+
+    async def stop(self) -> None:
+        if self._janitor is not None:
+            self._janitor.cancel()
+            try:
+                await self._janitor
+            except asyncio.CancelledError:
+                pass
+            self._janitor = None
+        for task in list(self._tasks):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def submit(self, tenant_id: str, kind: ReportKind, modules: Optional[List[str]],
+                     fmt: ReportFormat, title: Optional[str] = None) -> Dict[str, Any]:
+        from report_writers import MEDIA_TYPES
+
+        modules = report_modules(kind, modules)
+        now = datetime.now(timezone.utc)
+        job_id = str(uuid.uuid4())
+        if not await self._take_slot(tenant_id, job_id, now):
+            raise ReportLimitExceeded(f"Limite de {MAX_ACTIVE_JOBS_PER_TENANT} relatórios em andamento atingido")
+        title = title or ("Relatório de Conformidade" if kind == ReportKind.COMPLIANCE else "Relatório")
+        job = {
+            "id": job_id,
+            "tenant_id": tenant_id,
+            "kind": kind.value,
+            "modules": modules,
+            "format": fmt.value,
+            "title": title,
+            "filename": f"{kind.value}-{now:%Y%m%d-%H%M%S}.{fmt.value}",
+            "media_type": MEDIA_TYPES[fmt.value],
+            "status": QUEUED,
+            "created_at": now,
+            "expires_at": now + timedelta(hours=REPORT_TTL_HOURS),
+        }
+        try:
+            await self.db[JOBS_COLLECTION].insert_one(dict(job))
+        except BaseException:
+            await self._release_slot(tenant_id, job_id)
+            raise
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return public_job(job)
+
+    async def _take_slot(self, tenant_id: str, job_id: str, now: datetime) -> bool:
+        """Insert the job's slot on the unique (tenant_id, slot) index; False when all are taken."""
+        for slot in range(MAX_ACTIVE_JOBS_PER_TENANT):
+            try:
+                await self.db[SLOTS_COLLECTION].insert_one(
+                    {"tenant_id": tenant_id, "slot": slot, "job_id": job_id, "created_at": now}
+                )
+                return True
+            except DuplicateKeyError:
+                continue
+        return False
+
+    async def _release_slot(self, tenant_id: str, job_id: str) -> None:
+        await self.db[SLOTS_COLLECTION].delete_one({"tenant_id": tenant_id, "job_id": job_id})
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        jobs = self.db[JOBS_COLLECTION]
+        spec = {
+            "tenant_id": job["tenant_id"],
+            "modules": job["modules"],
+            "format": job["format"],
+            "title": job["title"],
+            "created_at": job["created_at"].strftime("%Y-%m-%d %H:%M UTC"),
+            "mongo_url": self.mongo_url,
+            "db_name": self.db_name,
+        }
+        temp_path = self.storage.temp_path(job["id"], job["format"])
+        try:
+            await jobs.update_one({"id": job["id"]}, {"$set": {"status": RUNNING, "started_at": datetime.now(timezone.utc)}})
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor(), self.generate, spec, temp_path)
+            # deleted while it ran: nothing would ever remove the artifact
+            if await jobs.find_one({"id": job["id"]}, {"_id": 1}) is None:
+                return
+            artifact = await self.storage.save(job, temp_path)
+            stored = await jobs.update_one({"id": job["id"]}, {"$set": {
+                "status": DONE,
+                "finished_at": datetime.now(timezone.utc),
+                "rows": result["rows"],
+                "size": result["size"],
+                "artifact": artifact,
+            }})
+            if not stored.matched_count:
+                await self.storage.delete(artifact)
+        except asyncio.CancelledError:
+            await jobs.update_one({"id": job["id"]}, {"$set": {"status": FAILED, "error": "Servidor reiniciado"}})
+            raise
+        except Exception as e:
+            logger.error("Falha ao gerar relatório %s: %s", job["id"], e)
+            await jobs.update_one({"id": job["id"]}, {"$set": {
+                "status": FAILED, "finished_at": datetime.now(timezone.utc), "error": str(e)[:500],
+            }})
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            await self._release_slot(job["tenant_id"], job["id"])
+
+    async def get(self, tenant_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db[JOBS_COLLECTION].find_one({"tenant_id": tenant_id, "id": job_id}, {"_id": 0})
+
+    async def recent(self, tenant_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        return await self.db[JOBS_COLLECTION].find({"tenant_id": tenant_id}, {"_id": 0, "artifact": 0}).sort(
+            "created_at", -1
+        ).to_list(limit)
+
+    async def delete(self, job: Dict[str, Any]) -> None:
+        if job.get("artifact"):
+            await self.storage.delete(job["artifact"])
+        await self.db[JOBS_COLLECTION].delete_one({"id": job["id"]})
+        await self._release_slot(job["tenant_id"], job["id"])
+
+    async def clean_up_once(self) -> Tuple[int, int]:
+        """Delete expired reports; fail jobs whose worker went away and free their slots."""
+        now = datetime.now(timezone.utc)
+        expired = 0
+        async for job in self.db[JOBS_COLLECTION].find({"expires_at": {"$lt": now}}, {"_id": 0}):
+            await self.delete(job)
+            expired += 1
+        stale = await self.db[JOBS_COLLECTION].update_many(
+            {"status": {"$in": [QUEUED, RUNNING]}, "created_at": {"$lt": now - timedelta(seconds=REPORT_JOB_TIMEOUT)}},
+            {"$set": {"status": FAILED, "finished_at": now, "error": "Tempo limite excedido"}},
+        )
+        await self.db[SLOTS_COLLECTION].delete_many({"created_at": {"$lt": now - timedelta(seconds=REPORT_JOB_TIMEOUT)}})
+        return expired, stale.modified_count
+
+    async def _clean_up(self, interval: float = 600.0) -> None:
+        while True:
+            try:
+                expired, stale = await self.clean_up_once()
+                if expired or stale:
+                    logger.info("Relatórios: %d expirado(s) removido(s), %d interrompido(s)", expired, stale)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Falha na limpeza de relatórios: %s", e)
+            await asyncio.sleep(interval)
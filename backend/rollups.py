@@ -0,0 +1,215 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+ROLLUP_COLLECTION = "water_monitoring_rollups"
+
+PARAMETERS = ["ph_level", "turbidity", "dissolved_oxygen", "temperature", "conductivity"]
+
+RESOLUTIONS = ("hour", "day")
+QUERY_RESOLUTIONS = ("raw",) + RESOLUTIONS
+
+DEFAULT_MAX_POINTS = 2000
+MAX_RAW_POINTS = 10000
+
+# Percentiles come from a log-bucketed histogram (DDSketch style): every value
+# lands in the bin ceil(log_gamma |v|), which keeps ~1% relative error and,
+# unlike exact percentiles, can be updated with $inc and merged across buckets.
+GAMMA = 1.02
+_LOG_GAMMA = math.log(GAMMA)
+_ZERO = 1e-9
+
+
+def bin_key(value: float) -> str:
+    if abs(value) < _ZERO:
+        return "z"
+    index = math.ceil(math.log(abs(value)) / _LOG_GAMMA)
+    return f"{'p' if value > 0 else 'n'}{index}"
+
+
+def bin_value(key: str) -> float:
+    if key == "z":
+        return 0.0
+    sign = 1 if key[0] == "p" else -1
+    return sign * 2 * GAMMA ** int(key[1:]) / (GAMMA + 1)
+
+
+def percentile(hist: Dict[str, int], q: float) -> Optional[float]:
+    total = sum(hist.values())
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for value, count in sorted((bin_value(k), c) for k, c in hist.items()):
+        seen += count
+        if seen > rank:
+            return round(value, 4)
+    return None
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None) if value.tzinfo is None else value.astimezone(timezone.utc).replace(tzinfo=None)
+    try:
+        return parse_timestamp(datetime.fromisoformat(str(value).replace("Z", "+00:00")))
+    except ValueError:
+        return None
+
+
+def bucket_start(moment: datetime, resolution: str) -> datetime:
+    if resolution == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _accumulate(readings: Iterable[Dict[str, Any]]) -> Dict[Tuple, Dict[str, Any]]:
+    groups: Dict[Tuple, Dict[str, Any]] = {}
+    for reading in readings:
+        moment = parse_timestamp(reading.get("collection_date"))
+        if moment is None:
+            continue
+        for parameter in PARAMETERS:
+            value = reading.get(parameter)
+            if value is None:
+                continue
+            for resolution in RESOLUTIONS:
+                key = (reading["tenant_id"], reading["location"], parameter, resolution, bucket_start(moment, resolution))
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = {"count": 0, "sum": 0.0, "min": value, "max": value, "hist": defaultdict(int)}
+                group["count"] += 1
+                group["sum"] += value
+                group["min"] = min(group["min"], value)
+                group["max"] = max(group["max"], value)
+                group["hist"][bin_key(value)] += 1
+    return groups
+
+
+async def update_rollups(db, readings: List[Dict[str, Any]]) -> int:
+    """Fold newly inserted readings into the hourly and daily rollups.
+
+    Readings are pre-aggregated per bucket in memory so a batch of thousands of
+    readings becomes one upsert per (location, parameter, resolution, bucket).
+    """
+    operations = []
+    for (tenant_id, location, parameter, resolution, bucket), group in _accumulate(readings).items():
+        increments = {"count": group["count"], "sum": group["sum"]}
+        increments.update({f"hist.{k}": c for k, c in group["hist"].items()})
+        operations.append(UpdateOne(
+            {"tenant_id": tenant_id, "location": location, "parameter": parameter,
+             "resolution": resolution, "bucket": bucket},
+            {"$inc": increments, "$min": {"min": group["min"]}, "$max": {"max": group["max"]}},
+            upsert=True,
+        ))
+    if operations:
+        await db[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def remove_from_rollups(db, readings: List[Dict[str, Any]]) -> int:
+    """Take updated or deleted readings back out of the rollups.
+
+    Counts, sums and histograms are exact; min/max cannot be narrowed
+    incrementally and may stay loose until the next rebuild.
+    """
+    operations = []
+    for (tenant_id, location, parameter, resolution, bucket), group in _accumulate(readings).items():
+        decrements = {"count": -group["count"], "sum": -group["sum"]}
+        decrements.update({f"hist.{k}": -c for k, c in group["hist"].items()})
+        operations.append(UpdateOne(
+            {"tenant_id": tenant_id, "location": location, "parameter": parameter,
+             "resolution": resolution, "bucket": bucket},
+            {"$inc": decrements},
+        ))
+    if operations:
+        await db[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def rebuild_rollups(db, tenant_id: str, batch_size: int = 5000) -> int:
+    """Recompute a tenant's rollups from the raw readings, e.g. after a backfill."""
+    await db[ROLLUP_COLLECTION].delete_many({"tenant_id": tenant_id})
+    projection = {"_id": 0, "tenant_id": 1, "location": 1, "collection_date": 1, **{p: 1 for p in PARAMETERS}}
+    cursor = db.water_monitoring.find({"tenant_id": tenant_id}, projection).batch_size(batch_size)
+    batch, processed = [], 0
+    async for reading in cursor:
+        batch.append(reading)
+        if len(batch) >= batch_size:
+            await update_rollups(db, batch)
+            processed += len(batch)
+            batch = []
+    if batch:
+        await update_rollups(db, batch)
+        processed += len(batch)
+    return processed
+
+
+def choose_resolution(start: datetime, end: datetime) -> str:
+    span = end - start
+    if span <= timedelta(days=2):
+        return "raw"
+    if span <= timedelta(days=60):
+        return "hour"
+    return "day"
+
+
+def _point(bucket: datetime, count: int, total: float, low: float, high: float, hist: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        "t": bucket.isoformat(),
+        "count": count,
+        "min": low,
+        "max": high,
+        "mean": round(total / count, 4) if count else None,
+        "p50": percentile(hist, 0.5),
+        "p95": percentile(hist, 0.95),
+    }
+
+
+def _downsample(buckets: List[Dict[str, Any]], max_points: int) -> List[Dict[str, Any]]:
+    step = max(1, math.ceil(len(buckets) / max_points))
+    points = []
+    for start in range(0, len(buckets), step):
+        group = buckets[start:start + step]
+        hist: Dict[str, int] = defaultdict(int)
+        for bucket in group:
+            for k, c in bucket.get("hist", {}).items():
+                hist[k] += c
+        points.append(_point(
+            group[0]["bucket"],
+            sum(b["count"] for b in group),
+            sum(b["sum"] for b in group),
+            min(b["min"] for b in group),
+            max(b["max"] for b in group),
+            hist,
+        ))
+    return points
+
+
+async def query_series(db, tenant_id: str, location: str, parameter: str, start: datetime, end: datetime,
+                       resolution: Optional[str] = None, max_points: int = DEFAULT_MAX_POINTS) -> Dict[str, Any]:
+    resolution = resolution or choose_resolution(start, end)
+    if resolution == "raw":
+        # collection_date is an ISO string; compare date-only values by day
+        lower = start.date().isoformat() if start == bucket_start(start, "day") else start.isoformat()
+        cursor = db.water_monitoring.find(
+            {"tenant_id": tenant_id, "location": location,
+             "collection_date": {"$gte": lower, "$lt": end.isoformat()}},
+            {"_id": 0, "collection_date": 1, parameter: 1},
+        ).sort("collection_date", 1).limit(MAX_RAW_POINTS)
+        points = []
+        async for reading in cursor:
+            value = reading.get(parameter)
+            if value is not None:
+                points.append({"t": reading["collection_date"], "count": 1, "min": value, "max": value,
+                               "mean": value, "p50": value, "p95": value})
+        return {"resolution": "raw", "points": points}
+
+    buckets = await db[ROLLUP_COLLECTION].find(
+        {"tenant_id": tenant_id, "location": location, "parameter": parameter,
+         "resolution": resolution, "bucket": {"$gte": start, "$lt": end}},
+        {"_id": 0, "bucket": 1, "count": 1, "sum": 1, "min": 1, "max": 1, "hist": 1},
+    ).sort("bucket", 1).to_list(None)
+    return {"resolution": resolution, "points": _downsample(buckets, max_points)}
@@ -0,0 +1,29 @@
+from fastapi import HTTPException, Query
+
+import server
+from serialization import FastJSONResponse
+
+router = server.make_api_router()
+
+# Compliance and ESG scores from the compliance_scores materialized view;
+# history holds one point per tenant and day for trend charts
+@router.get("/compliance/score")
+async def get_compliance_score(tenant_id: str = Query(...)):
+    try:
+        return FastJSONResponse(await server.compliance_scores.get(tenant_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/compliance/history")
+async def get_compliance_history(tenant_id: str = Query(...), days: int = Query(90, ge=1, le=730)):
+    try:
+        return FastJSONResponse(await server.compliance_scores.history(tenant_id, days))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/compliance/refresh")
+async def refresh_compliance_score(tenant_id: str = Query(...)):
+    try:
+        return FastJSONResponse(await server.compliance_scores.refresh(tenant_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
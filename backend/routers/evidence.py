@@ -0,0 +1,140 @@
+import asyncio
+import os
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+from fastapi import Form, Header, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+import server
+from evidence import SHA256_PATTERN, RangeNotSatisfiable, UploadError, UploadOffsetMismatch, parse_range, public_evidence, public_upload
+from serialization import FastJSONResponse
+from versions import etag_matches
+
+router = server.make_api_router()
+
+# Inspection evidence: resumable uploads (PATCH chunks at Upload-Offset),
+# single-request multipart uploads, gallery and ranged downloads. Bytes go to
+# a staging file on I/O threads; hashing and thumbnails run on a process pool
+class EvidenceUploadRequest(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    content_type: Optional[str] = Field(None, max_length=100)
+    size: int = Field(..., ge=1)
+    item_index: Optional[int] = Field(None, ge=0)
+    sha256: Optional[str] = Field(None, pattern=SHA256_PATTERN)
+
+async def find_inspection(tenant_id: str, inspection_id: str):
+    if await server.db.inspections.find_one({"tenant_id": tenant_id, "id": inspection_id}, {"_id": 1}) is None:
+        raise HTTPException(status_code=404, detail="Vistoria não encontrada")
+
+def upload_error(e: UploadError) -> HTTPException:
+    headers = {"Upload-Offset": str(e.offset)} if isinstance(e, UploadOffsetMismatch) else None
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+def upload_response(upload: Dict[str, Any], status_code: int = 200) -> Response:
+    return FastJSONResponse(public_upload(upload), status_code=status_code,
+                            headers={"Upload-Offset": str(upload["offset"]), "Upload-Length": str(upload["size"])})
+
+@router.post("/inspections/{inspection_id}/evidence/uploads")
+async def create_evidence_upload(inspection_id: str, payload: EvidenceUploadRequest, tenant_id: str = Query(...)):
+    await find_inspection(tenant_id, inspection_id)
+    try:
+        upload = await server.evidence_service.create_upload(tenant_id, inspection_id, payload.filename, payload.content_type,
+                                                             payload.size, payload.item_index, payload.sha256)
+    except UploadError as e:
+        raise upload_error(e)
+    return upload_response(upload, status_code=201)
+
+@router.post("/inspections/{inspection_id}/evidence")
+async def upload_evidence(inspection_id: str, file: UploadFile, item_index: Optional[int] = Form(None, ge=0), tenant_id: str = Query(...)):
+    await find_inspection(tenant_id, inspection_id)
+    size = file.size if file.size is not None else await asyncio.get_running_loop().run_in_executor(
+        server.evidence_service.io, lambda: file.file.seek(0, os.SEEK_END))
+    await file.seek(0)
+    try:
+        evidence = await server.evidence_service.upload_file(tenant_id, inspection_id, file.filename or "evidencia", file.content_type,
+                                                             file.file, size, item_index)
+    except UploadError as e:
+        raise upload_error(e)
+    return FastJSONResponse(public_evidence(evidence), status_code=201)
+
+@router.get("/inspections/{inspection_id}/evidence")
+async def list_evidence(inspection_id: str, tenant_id: str = Query(...), item_index: Optional[int] = Query(None, ge=0)):
+    return FastJSONResponse([public_evidence(e) for e in await server.evidence_service.gallery(tenant_id, inspection_id, item_index)])
+
+async def find_upload(tenant_id: str, upload_id: str) -> Dict[str, Any]:
+    upload = await server.evidence_service.get_upload(tenant_id, upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload não encontrado")
+    return upload
+
+@router.get("/evidence/uploads/{upload_id}")
+async def get_evidence_upload(upload_id: str, tenant_id: str = Query(...)):
+    return upload_response(await find_upload(tenant_id, upload_id))
+
+@router.patch("/evidence/uploads/{upload_id}")
+async def append_evidence_upload(upload_id: str, request: Request, tenant_id: str = Query(...), upload_offset: int = Header(..., ge=0)):
+    upload = await find_upload(tenant_id, upload_id)
+    try:
+        upload = await server.evidence_service.write_chunk(upload, upload_offset, request.stream())
+    except UploadError as e:
+        raise upload_error(e)
+    return upload_response(upload)
+
+@router.delete("/evidence/uploads/{upload_id}")
+async def abort_evidence_upload(upload_id: str, tenant_id: str = Query(...)):
+    await server.evidence_service.abort(await find_upload(tenant_id, upload_id))
+    return {"deleted": upload_id}
+
+async def find_evidence(tenant_id: str, evidence_id: str) -> Dict[str, Any]:
+    evidence = await server.evidence_service.get(tenant_id, evidence_id)
+    if evidence is None:
+        raise HTTPException(status_code=404, detail="Evidência não encontrada")
+    return evidence
+
+@router.get("/evidence/{evidence_id}")
+async def get_evidence(evidence_id: str, tenant_id: str = Query(...)):
+    return FastJSONResponse(public_evidence(await find_evidence(tenant_id, evidence_id)))
+
+async def send_blob(request: Request, artifact: Dict[str, Any], etag: str, media_type: str, size: int,
+                    disposition: Optional[str] = None) -> Response:
+    # content-addressed: the digest is a strong validator and never changes
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "private, max-age=31536000, immutable"}
+    if disposition:
+        headers["Content-Disposition"] = disposition
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if_range = request.headers.get("if-range")
+    try:
+        byte_range = parse_range(request.headers.get("range"), size) if if_range in (None, etag) else None
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        return StreamingResponse(server.evidence_service.open(artifact), media_type=media_type,
+                                 headers={**headers, "Content-Length": str(size)})
+    start, end = byte_range
+    return StreamingResponse(server.evidence_service.open(artifact, start, end), status_code=206, media_type=media_type,
+                             headers={**headers, "Content-Length": str(end - start + 1), "Content-Range": f"bytes {start}-{end}/{size}"})
+
+@router.get("/evidence/{evidence_id}/content")
+async def download_evidence(evidence_id: str, request: Request, tenant_id: str = Query(...)):
+    evidence = await find_evidence(tenant_id, evidence_id)
+    blob = await server.evidence_service.blob(evidence)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Arquivo da evidência não encontrado")
+    return await send_blob(request, blob["artifact"], f'"{blob["sha256"]}"', blob["media_type"], blob["size"],
+                           f"inline; filename*=UTF-8''{quote(evidence['filename'])}")
+
+@router.get("/evidence/{evidence_id}/thumbnail")
+async def download_evidence_thumbnail(evidence_id: str, request: Request, tenant_id: str = Query(...)):
+    evidence = await find_evidence(tenant_id, evidence_id)
+    blob = await server.evidence_service.blob(evidence)
+    if blob is None or not blob.get("thumbnail"):
+        raise HTTPException(status_code=404, detail="Miniatura não disponível")
+    return await send_blob(request, blob["thumbnail"], f'"{blob["sha256"]}-thumb"', "image/jpeg", blob["thumbnail"]["size"])
+
+@router.delete("/evidence/{evidence_id}")
+async def delete_evidence(evidence_id: str, tenant_id: str = Query(...)):
+    await server.evidence_service.delete(await find_evidence(tenant_id, evidence_id))
+    return {"deleted": evidence_id}
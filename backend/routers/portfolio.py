@@ -0,0 +1,89 @@
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, Field
+
+import server
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, fetch_page, page_headers
+from portfolio import PortfolioError, delete_portfolio, get_portfolio, group_by_tenant, resolve_tenants, save_portfolio, tenants_after
+from serialization import FastJSONResponse, UnknownFields
+from server import MODULES, portfolio_cache, readers
+
+router = server.make_api_router()
+
+# Portfolio endpoints: consultancies read many client tenants at once, named
+# by tenant_ids=a,b,c or by a saved portfolio. Each page is one $in query
+# (compliance_scores for the summary, the module's collection otherwise),
+# grouped by tenant. ``tenant_id`` is the caller's own tenant: it owns the
+# saved portfolios, and its rate limit, concurrency slots and (bulk) query
+# budget cover the request (see BULK_ROUTES in server.py). Pages are cached
+# until a member tenant writes, so they are read from the primary.
+
+class PortfolioDefinition(BaseModel):
+    name: str = Field(..., max_length=200)
+    tenant_ids: List[str]
+
+async def portfolio_tenants(owner_id: str, tenant_ids: Optional[str], portfolio_id: Optional[str]) -> List[str]:
+    try:
+        return await resolve_tenants(server.db, owner_id, tenant_ids, portfolio_id)
+    except PortfolioError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@router.put("/portfolios/{portfolio_id}")
+async def put_portfolio(portfolio_id: str, payload: PortfolioDefinition, tenant_id: str = Query(...)):
+    try:
+        return await save_portfolio(server.db, tenant_id, portfolio_id, payload.name, payload.tenant_ids)
+    except PortfolioError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@router.get("/portfolios/{portfolio_id}")
+async def read_portfolio(portfolio_id: str, tenant_id: str = Query(...)):
+    try:
+        return await get_portfolio(server.db, tenant_id, portfolio_id)
+    except PortfolioError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@router.delete("/portfolios/{portfolio_id}")
+async def remove_portfolio(portfolio_id: str, tenant_id: str = Query(...)):
+    try:
+        await delete_portfolio(server.db, tenant_id, portfolio_id)
+    except PortfolioError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {"message": "Portfólio removido com sucesso"}
+
+@router.get("/portfolio/summary")
+async def get_portfolio_summary(tenant_id: str = Query(...), tenant_ids: Optional[str] = None, portfolio_id: Optional[str] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    members = await portfolio_tenants(tenant_id, tenant_ids, portfolio_id)
+    page, next_cursor = tenants_after(members, cursor, limit)
+    key = ("summary", frozenset(page))
+    rows = portfolio_cache.get(key)
+    if rows is None:
+        scores = await server.compliance_scores.portfolio(page)
+        # tenants not computed yet are queued and reported as pending
+        rows = [scores.get(tenant_id) or {"tenant_id": tenant_id, "pending": True} for tenant_id in page]
+        portfolio_cache.set(key, rows)
+    return FastJSONResponse(rows, headers=page_headers(next_cursor))
+
+@router.get("/portfolio/{module}")
+async def get_portfolio_module(module: str, tenant_id: str = Query(...), tenant_ids: Optional[str] = None, portfolio_id: Optional[str] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, status: Optional[str] = None):
+    if module not in MODULES:
+        raise HTTPException(status_code=404, detail="Módulo não encontrado")
+    collection_name = MODULES[module][0]
+    members = await portfolio_tenants(tenant_id, tenant_ids, portfolio_id)
+    key = (module, frozenset(members), limit, cursor, fields, status)
+    cached = portfolio_cache.get(key)
+    if cached is None:
+        reader = readers[collection_name]
+        query: Dict[str, Any] = {"tenant_id": {"$in": members}}
+        if status:
+            query["status"] = status
+        try:
+            selected = reader.select(fields)
+            documents, next_cursor = await fetch_page(server.db[collection_name], query, limit, cursor,
+                                                      {**reader.projection_for(selected), "tenant_id": 1}, across_tenants=True)
+        except (InvalidCursor, UnknownFields) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        cached = (group_by_tenant(reader.fill_all(documents, selected)), next_cursor)
+        portfolio_cache.set(key, cached)
+    groups, next_cursor = cached
+    return FastJSONResponse(groups, headers=page_headers(next_cursor))
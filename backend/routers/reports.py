@@ -0,0 +1,60 @@
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+import server
+from reports import DONE as REPORT_DONE, ReportFormat, ReportKind, ReportLimitExceeded, public_job
+from serialization import FastJSONResponse
+
+router = server.make_api_router()
+
+# Report jobs (PDF/Excel), generated on a process pool; poll the job, then download
+class ReportRequest(BaseModel):
+    kind: ReportKind = ReportKind.MODULES
+    modules: Optional[List[str]] = None
+    format: ReportFormat = ReportFormat.XLSX
+    title: Optional[str] = Field(None, max_length=200)
+
+@router.post("/reports", status_code=202)
+async def create_report(payload: ReportRequest, tenant_id: str = Query(...)):
+    try:
+        return await server.report_service.submit(tenant_id, payload.kind, payload.modules, payload.format, payload.title)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ReportLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+@router.get("/reports")
+async def list_reports(tenant_id: str = Query(...), limit: int = Query(50, ge=1, le=200)):
+    return FastJSONResponse(await server.report_service.recent(tenant_id, limit))
+
+async def find_report(tenant_id: str, job_id: str) -> Dict[str, Any]:
+    job = await server.report_service.get(tenant_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Relatório não encontrado")
+    return job
+
+@router.get("/reports/{job_id}")
+async def get_report(job_id: str, tenant_id: str = Query(...)):
+    return FastJSONResponse(public_job(await find_report(tenant_id, job_id)))
+
+@router.get("/reports/{job_id}/download")
+async def download_report(job_id: str, tenant_id: str = Query(...)):
+    job = await find_report(tenant_id, job_id)
+    if job["status"] != REPORT_DONE:
+        raise HTTPException(status_code=409, detail=f"Relatório ainda não disponível ({job['status']})")
+    return StreamingResponse(
+        server.report_service.storage.open(job["artifact"]),
+        media_type=job["media_type"],
+        headers={
+            "Content-Disposition": f'attachment; filename="{job["filename"]}"',
+            "Content-Length": str(job["size"]),
+        },
+    )
+
+@router.delete("/reports/{job_id}")
+async def delete_report(job_id: str, tenant_id: str = Query(...)):
+    await server.report_service.delete(await find_report(tenant_id, job_id))
+    return {"deleted": job_id}
@@ -0,0 +1,137 @@
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, Query
+
+import server
+from deadlines import DEADLINES_COLLECTION, SOURCES as DEADLINE_SOURCES, sync_deadlines
+from events import RESET
+from rollups import ROLLUP_COLLECTION
+from seed import generate_records
+from server import prepare_inserts, tenant_data_changed, update_aggregates
+from sync import mark_reset
+from waste_analytics import MTR_COLLECTION, ROLLUP_COLLECTION as WASTE_ROLLUP_COLLECTION
+from water_quality import evaluate_readings, load_settings
+
+router = server.make_api_router()
+
+# Seed data endpoint for development
+@router.post("/seed-data")
+async def seed_data(tenant_id: str = Query("demo-tenant"), records: int = Query(0, ge=0, le=100000)):
+    try:
+        # Clear existing data for tenant
+        await server.db.licenses.delete_many({"tenant_id": tenant_id})
+        await server.db.projects.delete_many({"tenant_id": tenant_id})
+        await server.db.inspections.delete_many({"tenant_id": tenant_id})
+        if records:
+            await server.db.water_monitoring.delete_many({"tenant_id": tenant_id})
+            await server.db.waste_management.delete_many({"tenant_id": tenant_id})
+            await server.db.commitments.delete_many({"tenant_id": tenant_id})
+            await server.db[ROLLUP_COLLECTION].delete_many({"tenant_id": tenant_id})
+            await server.db[WASTE_ROLLUP_COLLECTION].delete_many({"tenant_id": tenant_id})
+            await server.db[MTR_COLLECTION].delete_many({"tenant_id": tenant_id})
+        cleared_sources = list(DEADLINE_SOURCES) if records else ["licenses", "inspections"]
+        await server.db[DEADLINES_COLLECTION].delete_many({"tenant_id": tenant_id, "source": {"$in": cleared_sources}})
+        
+        # Sample Brazilian licenses
+        sample_licenses = [
+            {
+                "id": str(uuid.uuid4()),
+                "number": "LP001/2024-SP",
+                "type": "LP",
+                "title": "Licença Prévia - Complexo Industrial",
+                "company": "Indústria Brasileira S.A.",
+                "cnpj": "12.345.678/0001-90",
+                "status": "Ativa",
+                "issue_date": "2024-01-15",
+                "expiry_date": "2025-01-15",
+                "issuing_body": "CETESB",
+                "activity_type": "Indústria Química",
+                "description": "Licenciamento para instalação de complexo industrial químico",
+                "tenant_id": tenant_id,
+                "created_at": datetime.now(timezone.utc)
+            },
+            {
+                "id": str(uuid.uuid4()),
+                "number": "LO089/2023-RJ",
+                "type": "LO",
+                "title": "Licença de Operação - Refinaria",
+                "company": "Petróleo do Brasil Ltda",
+                "cnpj": "98.765.432/0001-10",
+                "status": "Ativa",
+                "issue_date": "2023-06-20",
+                "expiry_date": "2028-06-20",
+                "issuing_body": "INEA",
+                "activity_type": "Refino de Petróleo",
+                "description": "Operação de refinaria de petróleo",
+                "tenant_id": tenant_id,
+                "created_at": datetime.now(timezone.utc)
+            }
+        ]
+        
+        # Sample projects
+        sample_projects = [
+            {
+                "id": str(uuid.uuid4()),
+                "name": "Recuperação de Mata Ciliar - Rio Tietê",
+                "description": "Projeto de recuperação de 50 hectares de mata ciliar",
+                "status": "Em Andamento",
+                "start_date": "2024-03-01",
+                "end_date": "2024-12-31",
+                "budget": 2500000.00,
+                "manager": "Dr. Maria Silva",
+                "location": "São Paulo, SP",
+                "environmental_impact": "Recuperação de biodiversidade aquática",
+                "tenant_id": tenant_id,
+                "created_at": datetime.now(timezone.utc)
+            }
+        ]
+        
+        # Sample inspections
+        sample_inspections = [
+            {
+                "id": str(uuid.uuid4()),
+                "title": "Vistoria Trimestral - Tratamento de Efluentes",
+                "location": "Complexo Industrial - São Bernardo do Campo, SP",
+                "scheduled_date": "2024-07-20",
+                "inspector": "Eng. João Santos",
+                "status": "Concluída",
+                "conformity_percentage": 87.5,
+                "checklist_items": [
+                    {"item": "Funcionamento da ETE", "status": "Conforme", "evidence": ""},
+                    {"item": "Qualidade do efluente", "status": "Conforme", "evidence": ""},
+                    {"item": "Documentação atualizada", "status": "Não Conforme", "evidence": ""}
+                ],
+                "observations": "Necessário atualizar certidões de destinação de resíduos",
+                "tenant_id": tenant_id,
+                "created_at": datetime.now(timezone.utc)
+            }
+        ]
+        
+        # Insert sample data
+        prepare_inserts("licenses", sample_licenses)
+        prepare_inserts("projects", sample_projects)
+        prepare_inserts("inspections", sample_inspections)
+        await server.db.licenses.insert_many(sample_licenses)
+        await server.db.projects.insert_many(sample_projects)
+        await server.db.inspections.insert_many(sample_inspections)
+        await sync_deadlines(server.db, "licenses", sample_licenses)
+        await sync_deadlines(server.db, "inspections", sample_inspections)
+
+        # Synthetic volume on top of the samples (load tests, large demo tenants)
+        if records:
+            generated = generate_records(tenant_id, records)
+            evaluate_readings(generated["water_monitoring"], await load_settings(server.db, tenant_id))
+            for collection_name, documents in generated.items():
+                prepare_inserts(collection_name, documents)
+                await server.db[collection_name].insert_many(documents, ordered=False)
+                await sync_deadlines(server.db, collection_name, documents)
+                await update_aggregates(collection_name, documents)
+        seeded = list(generated) if records else ["licenses", "projects", "inspections"]
+        for collection_name in seeded:
+            await mark_reset(server.db, tenant_id, collection_name)
+            await tenant_data_changed(tenant_id, collection_name, RESET)
+        
+        return {"message": "Dados de exemplo criados com sucesso"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
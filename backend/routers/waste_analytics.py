@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import HTTPException, Query
+
+import server
+from server import tenant_data_changed, waste_cache
+from waste_analytics import DIMENSIONS as WASTE_DIMENSIONS, annual_inventory, monthly_totals, rebuild_waste_analytics, reconcile_mtrs
+
+router = server.make_api_router()
+
+# Waste analytics: monthly totals from the waste_rollups cube, kept in step on
+# every write; MTR duplicates and gaps come from indexes, never a scan.
+# Cached results are read from the primary: a lagging secondary read right
+# after the write's invalidation would be cached stale for the whole TTL
+MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+def parse_group_by(value: str) -> List[str]:
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in WASTE_DIMENSIONS]
+    if unknown or not fields:
+        raise HTTPException(status_code=400, detail=f"Agrupamento inválido; use um ou mais de {', '.join(WASTE_DIMENSIONS)}")
+    return list(dict.fromkeys(fields))
+
+@router.get("/waste/analytics")
+async def get_waste_analytics(
+    tenant_id: str = Query(...),
+    start: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    end: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    group_by: str = "classification",
+):
+    fields = parse_group_by(group_by)
+    today = datetime.now(timezone.utc)
+    end = end or today.strftime("%Y-%m")
+    start = start or f"{int(end[:4]) - 1}-{end[5:]}"
+    if start > end:
+        raise HTTPException(status_code=400, detail="start deve ser anterior a end")
+    key = (tenant_id, "analytics", start, end, tuple(fields))
+    try:
+        result = waste_cache.get(key)
+        if result is None:
+            result = await monthly_totals(server.db, tenant_id, start, end, fields)
+            waste_cache.set(key, result)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/waste/inventory")
+async def get_waste_inventory(tenant_id: str = Query(...), year: int = Query(..., ge=1900, le=2999)):
+    key = (tenant_id, "inventory", year)
+    try:
+        result = waste_cache.get(key)
+        if result is None:
+            result = await annual_inventory(server.db, tenant_id, year)
+            waste_cache.set(key, result)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/waste/mtr-reconciliation")
+async def get_mtr_reconciliation(tenant_id: str = Query(...), limit: int = Query(200, ge=1, le=1000)):
+    try:
+        return await reconcile_mtrs(server.db, tenant_id, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/waste/analytics/rebuild")
+async def rebuild_waste_totals(tenant_id: str = Query(...)):
+    try:
+        processed = await rebuild_waste_analytics(server.db, tenant_id)
+        await tenant_data_changed(tenant_id, "waste_management")
+        return {"message": "Totais de resíduos recalculados", "records": processed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,101 @@
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, Field, conlist, field_validator
+
+import server
+from rollups import DEFAULT_MAX_POINTS, PARAMETERS, QUERY_RESOLUTIONS, query_series, rebuild_rollups
+from server import tenant_data_changed
+from water_quality import PARAMETERS as LIMIT_PARAMETERS, SETTINGS_COLLECTION, load_settings, reevaluate_tenant, resolve_limits
+
+router = server.make_api_router()
+
+# CONAMA 357 water-quality limits per tenant; changing them re-evaluates history.
+# Overrides map a water class (a CONAMA one or the tenant's own) to
+# parameter -> [minimum, maximum], null meaning no limit on that side
+Bounds = conlist(Optional[float], min_length=2, max_length=2)
+
+class WaterQualitySettings(BaseModel):
+    default_class: str = "Classe 2"
+    location_classes: Dict[str, str] = Field(default_factory=dict)
+    overrides: Dict[str, Dict[str, Bounds]] = Field(default_factory=dict)
+
+    @field_validator("overrides")
+    @classmethod
+    def check_overrides(cls, overrides):
+        for water_class, params in overrides.items():
+            if not water_class.strip():
+                raise ValueError("Classe de água vazia")
+            unknown = set(params) - set(LIMIT_PARAMETERS)
+            if unknown:
+                raise ValueError(f"Parâmetro desconhecido em {water_class}: {', '.join(sorted(unknown))}; use um de {', '.join(LIMIT_PARAMETERS)}")
+            for parameter, (low, high) in params.items():
+                if low is not None and high is not None and low > high:
+                    raise ValueError(f"Limite mínimo maior que o máximo em {water_class}.{parameter}")
+        return overrides
+
+@router.get("/water-monitoring/limits")
+async def get_water_quality_limits(tenant_id: str = Query(...)):
+    try:
+        settings = await load_settings(server.db, tenant_id)
+        return {**WaterQualitySettings(**settings).dict(), "limits": resolve_limits(settings)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/water-monitoring/limits")
+async def update_water_quality_limits(settings: WaterQualitySettings, tenant_id: str = Query(...)):
+    known_classes = set(resolve_limits(settings.dict()))
+    unknown = {settings.default_class, *settings.location_classes.values()} - known_classes
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Classe de água desconhecida: {', '.join(sorted(unknown))}")
+    try:
+        await server.db[SETTINGS_COLLECTION].replace_one(
+            {"tenant_id": tenant_id}, {**settings.dict(), "tenant_id": tenant_id}, upsert=True
+        )
+        result = await reevaluate_tenant(server.db, tenant_id)
+        await tenant_data_changed(tenant_id, SETTINGS_COLLECTION)
+        if result["changed"]:
+            await tenant_data_changed(tenant_id, "water_monitoring")
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/water-monitoring/evaluate")
+async def evaluate_water_monitoring(tenant_id: str = Query(...)):
+    try:
+        result = await reevaluate_tenant(server.db, tenant_id)
+        if result["changed"]:
+            await tenant_data_changed(tenant_id, "water_monitoring")
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Chart series served from hourly/daily rollups; resolution follows the range
+@router.get("/water-monitoring/series")
+async def get_water_series(
+    tenant_id: str = Query(...),
+    location: str = Query(...),
+    parameter: str = Query(...),
+    start: datetime = Query(...),
+    end: datetime = Query(...),
+    resolution: Optional[str] = None,
+    max_points: int = Query(DEFAULT_MAX_POINTS, ge=1, le=10000),
+):
+    if parameter not in PARAMETERS:
+        raise HTTPException(status_code=400, detail=f"Parâmetro inválido; use um de {', '.join(PARAMETERS)}")
+    if resolution and resolution not in QUERY_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Resolução inválida; use um de {', '.join(QUERY_RESOLUTIONS)}")
+    try:
+        start, end = (value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value for value in (start, end))
+        return await query_series(server.read_db, tenant_id, location, parameter, start, end, resolution, max_points)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/water-monitoring/rollups/rebuild")
+async def rebuild_water_rollups(tenant_id: str = Query(...)):
+    try:
+        processed = await rebuild_rollups(server.db, tenant_id)
+        return {"message": "Agregados recalculados", "readings": processed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,335 @@
+import argparse
+import asyncio
+import os
+import re
+import sys
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from pymongo import UpdateOne
+
+SEARCH_FIELD = "search_keys"
+# Whole term -> highest field weight it appears under; ranks candidates in the
+# query, before the CANDIDATES_PER_COLLECTION cap
+SEARCH_WEIGHTS_FIELD = "search_weights"
+
+# Searchable text per collection: field -> ranking weight. Code fields (license
+# number, CNPJ) are also indexed in their compact alphanumeric form so
+# "LP001/2024-SP", "lp0012024" and "12345678000190" all find the same license.
+SEARCH_FIELDS: Dict[str, Dict[str, float]] = {
+    "licenses": {
+        "number": 4.0, "cnpj": 4.0, "title": 3.0, "company": 3.0,
+        "activity_type": 1.5, "issuing_body": 1.5, "description": 1.0,
+    },
+    "projects": {"name": 3.0, "manager": 1.5, "location": 1.5, "description": 1.0, "environmental_impact": 1.0},
+    "inspections": {"title": 3.0, "inspector": 1.5, "location": 1.5, "observations": 1.0},
+}
+CODE_FIELDS = {"number", "cnpj"}
+
+MIN_PREFIX = 3
+MIN_CODE_PREFIX = 4
+MAX_QUERY_TERMS = 8
+CANDIDATES_PER_COLLECTION = 200
+
+# Typo tolerance: word trigrams are stored among the search keys behind
+# FUZZY_PREFIX (never produced by a query term), and looked up only when no
+# document matches exactly. Hits are confirmed by edit distance and score
+# FUZZY_SCORE of a whole-term match.
+FUZZY_PREFIX = "~"
+MIN_FUZZY_TERM = 4
+FUZZY_SCORE = 0.4
+# An edit (a swap of adjacent letters included) breaks at most this many of a
+# term's trigrams; a word within the typo limit shares all the others
+TRIGRAMS_PER_EDIT = 4
+# Rank of a query term matched only as a prefix: below a whole-term match in
+# the lightest field, so prefix hits are ranked without passing whole ones
+PREFIX_RANK = 0.6
+
+STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "no", "na", "nos", "nas",
+    "um", "uma", "para", "por", "com", "sem", "ao", "aos", "que", "se", "ou",
+}
+
+# Light Portuguese stemmer (plural, then one derivational/gender suffix),
+# applied to accent-folded words. Index and query go through the same steps,
+# so consistency matters more than linguistic precision.
+_PLURALS = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"), ("is", "il"), ("ns", "m"), ("es", ""), ("s", ""))
+_SUFFIXES = (
+    "amentos", "imentos", "amento", "imento", "acoes", "acao", "ucao", "mente", "idades", "idade",
+    "ismo", "ista", "ivo", "iva", "ador", "adora", "eza", "ao", "a", "o", "e",
+)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents ("Licença Prévia" -> "licenca previa")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(word: str) -> str:
+    for suffix, replacement in _PLURALS:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[: -len(suffix)] + replacement
+            break
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def compact_code(value: str) -> str:
+    return "".join(_WORD.findall(fold(value)))
+
+
+def terms(text: str) -> List[str]:
+    return [stem(word) if not word.isdigit() else word for word in _WORD.findall(fold(text)) if word not in STOPWORDS]
+
+
+def _prefixes(term: str, minimum: int) -> Iterable[str]:
+    if len(term) <= minimum:
+        yield term
+        return
+    for end in range(minimum, len(term) + 1):
+        yield term[:end]
+
+
+def trigrams(term: str) -> Set[str]:
+    """Trigrams of a term, the first one anchored at its start ("^op", "ope", "per")."""
+    padded = "^" + term
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+def document_keys(collection_name: str, document: Dict[str, Any]) -> List[str]:
+    """Index keys of a document: word stems and their prefixes, compact codes and word trigrams."""
+    keys: Set[str] = set()
+    for field in SEARCH_FIELDS[collection_name]:
+        value = document.get(field)
+        if not value:
+            continue
+        value = str(value)
+        if field in CODE_FIELDS:
+            keys.update(_prefixes(compact_code(value), MIN_CODE_PREFIX))
+        for term in terms(value):
+            keys.update(_prefixes(term, MIN_PREFIX))
+            keys.update(FUZZY_PREFIX + gram for gram in trigrams(term))
+    return sorted(keys)
+
+
+def document_weights(collection_name: str, document: Dict[str, Any]) -> Dict[str, float]:
+    """Whole terms and compact codes of a document with the highest weight of a field holding them."""
+    weights: Dict[str, float] = {}
+    for field, weight in SEARCH_FIELDS[collection_name].items():
+        value = document.get(field)
+        if not value:
+            continue
+        value = str(value)
+        words = set(terms(value))
+        if field in CODE_FIELDS:
+            words.add(compact_code(value))
+        for word in words:
+            weights[word] = max(weights.get(word, 0.0), weight)
+    return weights
+
+
+def add_search_keys(collection_name: str, documents: Iterable[Dict[str, Any]]) -> None:
+    """Set the search keys and term weights in place before a write."""
+    if collection_name not in SEARCH_FIELDS:
+        return
+    for document in documents:
+        document[SEARCH_FIELD] = document_keys(collection_name, document)
+        document[SEARCH_WEIGHTS_FIELD] = document_weights(collection_name, document)
+
+
+def query_terms(q: str) -> List[str]:
+    found = terms(q)
+    code = compact_code(q)
+    # a query that reads as one code ("LP001/2024-SP", a CNPJ) also matches it whole
+    if len(found) > 1 and code and any(c.isdigit() for c in code) and len(code) >= MIN_CODE_PREFIX:
+        found.append(code)
+    return list(dict.fromkeys(t for t in found if len(t) >= 2))[:MAX_QUERY_TERMS]
+
+
+def fuzzy_keys(query: List[str]) -> List[str]:
+    return sorted({FUZZY_PREFIX + gram for term in query if len(term) >= MIN_FUZZY_TERM for gram in trigrams(term)})
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Edit distance counting a swap of adjacent letters as one edit, or ``limit + 1`` once it must exceed ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if before and i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def typo_limit(term: str) -> int:
+    return 1 if len(term) <= 5 else 2
+
+
+def min_shared_trigrams(query: List[str]) -> int:
+    """Fewest fuzzy keys a document near any query term shares with the query."""
+    return min(
+        (max(1, len(trigrams(term)) - TRIGRAMS_PER_EDIT * typo_limit(term)) for term in query if len(term) >= MIN_FUZZY_TERM),
+        default=1,
+    )
+
+
+def near(term: str, word: str) -> bool:
+    """``word``, or its prefix of the term's length, is within one typo (two for long terms)."""
+    if len(term) < MIN_FUZZY_TERM:
+        return False
+    limit = typo_limit(term)
+    return edit_distance(term, word, limit) <= limit or (
+        len(word) > len(term) and edit_distance(term, word[:len(term)], limit) <= limit
+    )
+
+
+def score(collection_name: str, document: Dict[str, Any], query: List[str], fuzzy: bool = False) -> float:
+    """Field-weighted match score; whole-term matches count more than prefixes, and those more than typos."""
+    total = 0.0
+    for field, weight in SEARCH_FIELDS[collection_name].items():
+        value = document.get(field)
+        if not value:
+            continue
+        words = set(terms(str(value)))
+        if field in CODE_FIELDS:
+            words.add(compact_code(str(value)))
+        for term in query:
+            if term in words:
+                total += weight
+            elif any(word.startswith(term) for word in words):
+                total += weight * 0.6
+            elif fuzzy and any(near(term, word) for word in words):
+                total += weight * FUZZY_SCORE
+    return round(total, 3)
+
+
+def _term_rank(query: List[str]) -> Dict[str, Any]:
+    # query terms are [a-z0-9] only, so they are safe as field paths; a term
+    # missing from the weights may still be a prefix among the search keys
+    return {"$add": [
+        {"$ifNull": [f"${SEARCH_WEIGHTS_FIELD}.{term}", {"$cond": [{"$in": [term, f"${SEARCH_FIELD}"]}, PREFIX_RANK, 0]}]}
+        for term in query
+    ]}
+
+
+def _trigram_rank(keys: List[str]) -> Dict[str, Any]:
+    return {"$size": {"$filter": {"input": f"${SEARCH_FIELD}", "cond": {"$in": ["$$this", keys]}}}}
+
+
+async def _search_collection(db, collection_name: str, tenant_id: str, terms_filter: Dict[str, Any],
+                             rank: Dict[str, Any], projection: Dict[str, int],
+                             min_rank: float = 0) -> Tuple[str, List[Dict[str, Any]]]:
+    """The CANDIDATES_PER_COLLECTION best-ranked matches ranking at least ``min_rank``; ranking happens in the query, before the cap."""
+    fields = {**projection, **{field: 1 for field in SEARCH_FIELDS[collection_name]}, "_rank": rank}
+    pipeline = [
+        {"$match": {"tenant_id": tenant_id, SEARCH_FIELD: terms_filter}},
+        {"$project": fields},
+    ]
+    if min_rank:
+        # drop what cannot be a hit before sorting, not after the cap
+        pipeline.append({"$match": {"_rank": {"$gte": min_rank}}})
+    pipeline += [{"$sort": {"_rank": -1}}, {"$limit": CANDIDATES_PER_COLLECTION}]
+    documents = await db[collection_name].aggregate(pipeline).to_list(CANDIDATES_PER_COLLECTION)
+    return collection_name, documents
+
+
+async def search(db, tenant_id: str, q: str, projections: Dict[str, Dict[str, int]],
+                 limit: int = 20) -> List[Tuple[str, float, Dict[str, Any]]]:
+    """Ranked ``(collection, score, document)`` hits across the given collections.
+
+    Documents must match every query term; when nothing does, any term is
+    enough and those partial matches score half. When still nothing matches,
+    documents sharing trigrams with the query are ranked by how many they
+    share (at least as many as a word within a typo must) and kept if a word
+    is within a typo of a query term. Every lookup
+    is an equality match on the multikey (tenant_id, search_keys) index,
+    never a regex scan.
+    """
+    query = query_terms(q)
+    if not query:
+        return []
+
+    async def candidates(terms_filter, rank, min_rank=0):
+        return await asyncio.gather(*(
+            _search_collection(db, name, tenant_id, terms_filter, rank, projection, min_rank)
+            for name, projection in projections.items()
+        ))
+
+    partial = fuzzy = False
+    for terms_filter in ({"$all": query}, {"$in": query}):
+        results = await candidates(terms_filter, _term_rank(query))
+        if any(documents for _, documents in results) or len(query) == 1:
+            break
+        partial = True
+    keys = fuzzy_keys(query)
+    if keys and not any(documents for _, documents in results):
+        results = await candidates({"$in": keys}, _trigram_rank(keys), min_shared_trigrams(query))
+        fuzzy = True
+    hits = []
+    for collection_name, documents in results:
+        for document in documents:
+            value = score(collection_name, document, query, fuzzy)
+            if fuzzy and not value:
+                continue
+            hits.append((collection_name, value / 2 if partial else value, document))
+    hits.sort(key=lambda hit: hit[1], reverse=True)
+    return hits[:limit]
+
+
+async def reindex(db, collection_name: str, only_missing: bool = True, batch_size: int = 1000) -> int:
+    """(Re)compute search keys and weights; by default only for documents written without them."""
+    query = {"$or": [{SEARCH_FIELD: {"$exists": False}}, {SEARCH_WEIGHTS_FIELD: {"$exists": False}}]} if only_missing else {}
+    fields = {"_id": 1, **{field: 1 for field in SEARCH_FIELDS[collection_name]}}
+    processed = 0
+    batch: List[UpdateOne] = []
+    async for document in db[collection_name].find(query, fields).batch_size(batch_size):
+        batch.append(UpdateOne({"_id": document["_id"]}, {"$set": {
+            SEARCH_FIELD: document_keys(collection_name, document),
+            SEARCH_WEIGHTS_FIELD: document_weights(collection_name, document),
+        }}))
+        if len(batch) >= batch_size:
+            await db[collection_name].bulk_write(batch, ordered=False)
+            processed += len(batch)
+            batch = []
+    if batch:
+        await db[collection_name].bulk_write(batch, ordered=False)
+        processed += len(batch)
+    return processed
+
+
+async def reindex_all(db, only_missing: bool = True) -> Dict[str, int]:
+    return {name: await reindex(db, name, only_missing) for name in SEARCH_FIELDS}
+
+
+async def _main(args) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        for collection_name, count in (await reindex_all(db, only_missing=not args.all)).items():
+            print(f"{collection_name}: {count} documento(s)")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute search keys for GaiaSystem collections")
+    parser.add_argument("--all", action="store_true", help="recompute every document (after changing SEARCH_FIELDS or the stemmer)")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,140 @@
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+# Building blocks for synthetic tenants of arbitrary size (seed-data?records=N
+# and the load-test harness). Values stay within the enums and formats the
+# API itself writes.
+COMPANIES = [
+    ("Indústria Brasileira S.A.", "12.345.678/0001-90"),
+    ("Petróleo do Brasil Ltda", "98.765.432/0001-10"),
+    ("Mineração Vale Verde S.A.", "33.592.510/0001-54"),
+    ("Celulose Atlântica Ltda", "61.088.894/0001-08"),
+    ("Agroindústria Cerrado S.A.", "07.526.557/0001-00"),
+]
+STATES = [("SP", "CETESB"), ("RJ", "INEA"), ("MG", "FEAM"), ("PR", "IAT"), ("BA", "INEMA")]
+ACTIVITIES = ["Indústria Química", "Refino de Petróleo", "Mineração", "Papel e Celulose", "Agroindústria"]
+LICENSE_TYPES = ["LP", "LI", "LO", "LA", "AAF"]
+LICENSE_STATUSES = ["Ativa", "Ativa", "Ativa", "Vencida", "Suspensa", "Pendente", "Cancelada"]
+PROJECT_STATUSES = ["Planejamento", "Em Andamento", "Em Andamento", "Concluído", "Suspenso", "Cancelado"]
+INSPECTION_STATUSES = ["Agendada", "Em Andamento", "Concluída", "Concluída", "Cancelada"]
+WASTE = [
+    ("Óleo lubrificante usado", "Classe I"),
+    ("Lâmpadas fluorescentes", "Classe I"),
+    ("Resíduo orgânico", "Classe IIA"),
+    ("Lodo de ETE", "Classe IIA"),
+    ("Sucata metálica", "Classe IIB"),
+    ("Entulho de obra", "Classe IIB"),
+]
+WASTE_UNITS = ["kg", "t", "m³"]
+WASTE_DESTINATIONS = ["Aterro Classe I", "Aterro Sanitário", "Coprocessamento", "Reciclagem", "Compostagem"]
+TRANSPORTERS = ["EcoTrans Ltda", "Verde Logística S.A.", "TransResíduos ME"]
+WASTE_STATUSES = ["Coletado", "Processado", "Aguardando"]
+COMMITMENT_STATUSES = ["Pendente", "Em andamento", "Concluído", "Atrasado"]
+PRIORITIES = ["Alta", "Média", "Baixa"]
+STATIONS = ["Ponto 01 - Montante", "Ponto 02 - Jusante", "Ponto 03 - Efluente ETE", "Poço de Monitoramento PM-01"]
+
+
+def _day(rng: random.Random, start: datetime, span_days: int) -> str:
+    return (start + timedelta(days=rng.randrange(span_days))).date().isoformat()
+
+
+def generate_records(tenant_id: str, records: int, seed: Any = None) -> Dict[str, List[Dict[str, Any]]]:
+    """``records`` synthetic documents per module collection for one tenant."""
+    rng = random.Random(seed if seed is not None else tenant_id)
+    now = datetime.now(timezone.utc)
+    origin = now - timedelta(days=5 * 365)
+    data: Dict[str, List[Dict[str, Any]]] = {
+        "licenses": [], "projects": [], "inspections": [],
+        "water_monitoring": [], "waste_management": [], "commitments": [],
+    }
+
+    def base(i: int) -> Dict[str, Any]:
+        # Distinct created_at per row keeps keyset pages evenly sized
+        return {"id": str(uuid.uuid4()), "tenant_id": tenant_id, "created_at": now - timedelta(seconds=records - i)}
+
+    for i in range(records):
+        company, cnpj = rng.choice(COMPANIES)
+        state, body = rng.choice(STATES)
+        license_type = rng.choice(LICENSE_TYPES)
+        issue = origin + timedelta(days=rng.randrange(4 * 365))
+        data["licenses"].append({
+            **base(i),
+            "number": f"{license_type}{i:05d}/{issue.year}-{state}",
+            "type": license_type,
+            "title": f"Licença {license_type} - {rng.choice(ACTIVITIES)}",
+            "company": company,
+            "cnpj": cnpj,
+            "status": rng.choice(LICENSE_STATUSES),
+            "issue_date": issue.date().isoformat(),
+            "expiry_date": (issue + timedelta(days=365 * rng.randint(1, 6))).date().isoformat(),
+            "issuing_body": body,
+            "activity_type": rng.choice(ACTIVITIES),
+            "description": "Licenciamento ambiental gerado para testes de carga",
+        })
+        data["projects"].append({
+            **base(i),
+            "name": f"Projeto Ambiental {i:05d}",
+            "description": "Projeto de recuperação ambiental gerado para testes de carga",
+            "status": rng.choice(PROJECT_STATUSES),
+            "start_date": _day(rng, origin, 4 * 365),
+            "end_date": _day(rng, now, 2 * 365),
+            "budget": round(rng.uniform(5e4, 5e6), 2),
+            "manager": f"Eng. Responsável {rng.randint(1, 40)}",
+            "location": f"Município {rng.randint(1, 200)}, {state}",
+            "environmental_impact": "Recuperação de biodiversidade",
+        })
+        checklist = [
+            {"item": f"Item de verificação {n + 1}", "status": rng.choice(["Conforme", "Conforme", "Não Conforme"]), "evidence": ""}
+            for n in range(rng.randint(5, 40))
+        ]
+        data["inspections"].append({
+            **base(i),
+            "title": f"Vistoria {i:05d}",
+            "location": f"Unidade {rng.randint(1, 50)} - {state}",
+            "scheduled_date": _day(rng, origin, 5 * 365 + 180),
+            "inspector": f"Eng. Fiscal {rng.randint(1, 30)}",
+            "status": rng.choice(INSPECTION_STATUSES),
+            "conformity_percentage": round(100 * sum(c["status"] == "Conforme" for c in checklist) / len(checklist), 1),
+            "checklist_items": checklist,
+            "observations": "Observações de campo geradas para testes de carga",
+        })
+        collected = origin + timedelta(minutes=15 * i)
+        data["water_monitoring"].append({
+            **base(i),
+            "location": rng.choice(STATIONS),
+            "collection_date": collected.replace(tzinfo=None).isoformat(timespec="minutes"),
+            "ph_level": round(rng.gauss(7.2, 0.7), 2),
+            "turbidity": round(abs(rng.gauss(35, 25)), 1),
+            "dissolved_oxygen": round(rng.gauss(6.5, 1.2), 2),
+            "temperature": round(rng.gauss(23, 3), 1),
+            "conductivity": round(abs(rng.gauss(180, 60)), 1),
+            "status": "Normal",
+            "exceedances": [],
+            "observations": None,
+        })
+        waste_type, classification = rng.choice(WASTE)
+        data["waste_management"].append({
+            **base(i),
+            "waste_type": waste_type,
+            "classification": classification,
+            "quantity": round(rng.uniform(0.1, 500), 2),
+            "unit": rng.choice(WASTE_UNITS),
+            "collection_date": _day(rng, origin, 5 * 365),
+            "destination": rng.choice(WASTE_DESTINATIONS),
+            "transport_company": rng.choice(TRANSPORTERS),
+            "mtr_number": f"MTR-{state}-{i:07d}",
+            "status": rng.choice(WASTE_STATUSES),
+        })
+        data["commitments"].append({
+            **base(i),
+            "title": f"Condicionante {i:05d}",
+            "description": "Condicionante de licença gerada para testes de carga",
+            "due_date": _day(rng, origin, 6 * 365),
+            "responsible": f"Analista {rng.randint(1, 25)}",
+            "status": rng.choice(COMMITMENT_STATUSES),
+            "priority": rng.choice(PRIORITIES),
+            "progress": rng.randint(0, 100),
+        })
+    return data
@@ -0,0 +1,96 @@
+import copy
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class UnknownFields(ValueError):
+    pass
+
+
+ALL_FIELDS = "*"
+# Needed for keyset cursors and row identity, so always returned
+ALWAYS_INCLUDED = ("id", "created_at")
+
+
+class TrustedReader:
+    """Read path for documents this API wrote and validated itself.
+
+    Instead of building a model per row and letting ``response_model`` validate
+    it again, Mongo projects exactly the requested fields and the raw documents
+    are encoded directly. Optional fields missing from older documents get the
+    model's default so the JSON shape matches the model.
+
+    List endpoints default to ``summary_fields`` (the model without its bulky
+    fields); ``fields=a,b`` selects a sparse fieldset and ``fields=*`` the
+    whole model.
+    """
+
+    def __init__(self, model: Type[BaseModel], summary_exclude: Iterable[str] = ()):
+        self.model = model
+        self.fields = tuple(model.model_fields)
+        excluded = set(summary_exclude)
+        self.summary_fields = tuple(name for name in self.fields if name not in excluded)
+        self.projection = self.projection_for(self.fields)
+        self.defaults: Dict[str, Any] = {}
+        for name, field in model.model_fields.items():
+            # Generated values (id, created_at) are never back-filled
+            if field.default_factory in (list, dict):
+                self.defaults[name] = field.default_factory
+            elif not field.is_required() and field.default_factory is None:
+                self.defaults[name] = field.default
+
+    def select(self, fields: Optional[str] = None, summary: bool = True) -> Tuple[str, ...]:
+        if not fields:
+            return self.summary_fields if summary else self.fields
+        if fields.strip() == ALL_FIELDS:
+            return self.fields
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested - set(self.fields)
+        if unknown:
+            raise UnknownFields(f"Campos desconhecidos: {', '.join(sorted(unknown))}")
+        return tuple(name for name in self.fields if name in requested or name in ALWAYS_INCLUDED)
+
+    @staticmethod
+    def projection_for(selected: Iterable[str]) -> Dict[str, int]:
+        return {"_id": 0, **{name: 1 for name in selected}}
+
+    def fill(self, document: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        for name, default in (self.defaults if defaults is None else defaults).items():
+            if name not in document:
+                document[name] = default() if callable(default) else copy.copy(default)
+        return document
+
+    def fill_all(self, documents: Iterable[Dict[str, Any]], selected: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        defaults = self.defaults
+        if selected is not None:
+            selected = set(selected)
+            defaults = {name: value for name, value in self.defaults.items() if name in selected}
+        return [self.fill(document, defaults) for document in documents]
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Multi-worker entry point for the GaiaSystem API.
+
+Runs uvicorn with N worker processes. Each worker imports ``server`` and opens
+its own MongoDB client in the app lifespan, after the process starts, so no
+pool or socket is shared across fork. The Mongo pool is per worker: either set
+MONGO_MAX_POOL_SIZE directly or MONGO_CONNECTION_BUDGET, which is divided by
+the worker count (exported as WEB_CONCURRENCY).
+
+Usage (from backend/):
+  python serve.py --workers 4 --port 8001
+  WEB_CONCURRENCY=8 MONGO_CONNECTION_BUDGET=400 python serve.py
+
+Equivalent gunicorn command:
+  WEB_CONCURRENCY=4 gunicorn server:app -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8001
+
+Throughput per worker count: benchmarks/worker_scaling.py.
+"""
+
+import argparse
+import os
+
+import uvicorn
+
+
+def default_workers() -> int:
+    if os.environ.get("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    # the API is I/O bound but JSON encoding and CONAMA evaluation are not
+    return min(8, os.cpu_count() or 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the GaiaSystem API with several workers")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5, help="seconds to keep idle HTTP connections")
+    args = parser.parse_args()
+
+    # read by database.py in every worker to split MONGO_CONNECTION_BUDGET
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    uvicorn.run(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        # uvloop/httptools when installed
+        loop="auto",
+        http="auto",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,228 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+from fastapi import FastAPI, APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response
 from dotenv import load_dotenv
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import json
 import logging
+import math
+import time
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ValidationError
+import pymongo
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from typing import TYPE_CHECKING, List, Optional, Dict, Any
 import uuid
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from enum import Enum
 
+from cache import TTLCache
+from compression import CompressionMiddleware
+from database import create_client, secondary_reads
+from deadlines import DeadlineScheduler, add_datetimes, remove_deadlines, sync_deadlines, upcoming
+from events import DELETE, INSERT, UPDATE, ChangeEvent, EventBus, sse_message
+from export import MEDIA_TYPES, ExportFormat, stream_export
+from idempotency import REPLAYED_HEADER, IdempotencyConflict, abandon as abandon_idempotency, begin as begin_idempotency, complete as complete_idempotency, fingerprint
+from lazy_routes import LazyRouters, LazyRoutesMiddleware
+from ingest import PROTECTED_FIELDS, BatchParseError, insert_chunked, parse_rows, validate_rows
+from metrics import MetricsMiddleware, ProfilingMiddleware, render_metrics
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, fetch_page, page_headers
+from rollups import remove_from_rollups, update_rollups
+from search import SEARCH_FIELDS, add_search_keys, reindex_all, search
+from serialization import FastJSONResponse, TrustedReader, UnknownFields, dumps
+from sync import DEFAULT_SYNC_LIMIT, MAX_MUTATIONS, MAX_SYNC_LIMIT, backfill as backfill_sync_fields, pull, stamp_new, start_versions, touch, write_tombstones
+from tenancy import ACTIVE, TenantDirectory, TenantLimiter, TenantRejected, current_tenant, usage, usage_report, valid_tenant_id
+from versions import bump_version, current_version, etag_matches, list_etag
+from waste_analytics import add_mtr_keys, backfill_waste_analytics, update_waste_analytics
+from water_quality import evaluate_readings, load_settings
+
+if TYPE_CHECKING:
+    # the background services are imported by the lifespan that starts them
+    from compliance import ComplianceScores
+    from evidence import EvidenceService
+    from reports import ReportService
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection, opened by the lifespan in each worker process (see
+# database.py for pool settings). ``read_db`` serves search/report/series
+# reads and may hit secondaries; everything else, including the list pages
+# behind ETags (see list_page) and anything cached until the next write,
+# reads from the primary via ``db``.
+client: Optional[AsyncIOMotorClient] = None
+db = None
+read_db = None
+
+def use_client(new_client: AsyncIOMotorClient):
+    global client, db, read_db
+    client = new_client
+    db = client[os.environ['DB_NAME']]
+    read_db = secondary_reads(client, os.environ['DB_NAME'])
+
+# Waste totals and inventories per tenant, dropped when its waste records change
+waste_cache = TTLCache(
+    maxsize=int(os.environ.get('WASTE_CACHE_SIZE', '1024')),
+    ttl=float(os.environ.get('WASTE_CACHE_TTL', '300')),
+)
+
+# Portfolio pages keyed by the frozenset of tenants they cover, dropped when
+# any of those tenants writes or has its scores refreshed
+portfolio_cache = TTLCache(
+    maxsize=int(os.environ.get('PORTFOLIO_CACHE_SIZE', '256')),
+    ttl=float(os.environ.get('PORTFOLIO_CACHE_TTL', '30')),
+)
+
+def invalidate_portfolio_cache(tenant_id: str):
+    portfolio_cache.invalidate_where(lambda key: tenant_id in key[1])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # A client injected beforehand (tests, benchmarks) is kept
+    owns_client = client is None
+    if owns_client:
+        use_client(create_client())
+    if os.environ.get('LAZY_ROUTERS', 'true').lower() != 'true':
+        lazy_routers.load_all()
+    await reconcile_indexes()
+    backfill_derived_fields()
+    start_deadline_scheduler()
+    await start_event_bus()
+    usage.start(db)
+    start_report_service()
+    start_evidence_service()
+    start_compliance_scores()
+    try:
+        yield
+    finally:
+        await compliance_scores.stop()
+        await evidence_service.stop()
+        await report_service.stop()
+        await usage.stop(db)
+        await event_bus.stop()
+        if deadline_scheduler is not None:
+            await deadline_scheduler.stop()
+        if owns_client:
+            client.close()
 
 # Create the main app without a prefix
-app = FastAPI(title="GaiaSystem API", version="2.2")
+app = FastAPI(title="GaiaSystem API", version="2.2", lifespan=lifespan)
+
+# Tenant isolation: every /api request naming a tenant passes its rate limit
+# and concurrency cap, and its Mongo operations share one maxTimeMS budget
+tenant_directory = TenantDirectory()
+tenant_limiter = TenantLimiter()
+
+# Routes that write or scan in bulk: more tokens, a larger query budget
+BULK_ROUTES = {"/api/seed-data", "/api/sync", "/api/water-monitoring/evaluate", "/api/water-monitoring/rollups/rebuild",
+               "/api/waste/analytics/rebuild", "/api/portfolio/summary", "/api/portfolio/{module}"}
+# Writes that re-derive a tenant's history; reads of the same path stay cheap
+BULK_WRITE_ROUTES = {"/api/water-monitoring/limits"}
+BULK_COST = 10
+# Routes whose body streams in after the tenant context is entered; a Mongo
+# deadline counted from the first byte would expire on slow connections
+UPLOAD_ROUTES = {"/api/evidence/uploads/{upload_id}", "/api/inspections/{inspection_id}/evidence"}
+BULK_QUERY_BUDGET_MS = int(os.environ.get('TENANT_BULK_QUERY_BUDGET_MS', '60000'))
+
+async def request_tenant_id(request: Request) -> Optional[str]:
+    tenant_id = request.query_params.get("tenant_id")
+    if request.method in ("POST", "PUT", "PATCH") and request.headers.get("content-type", "").startswith("application/json"):
+        # creates carry the tenant in the body; FastAPI has already read and cached it
+        raw = await request.body()
+        if tenant_id is not None and b'"tenant_id"' not in raw:
+            return tenant_id
+        try:
+            body = json.loads(raw or b"null")
+        except ValueError:
+            return tenant_id
+        if isinstance(body, dict) and isinstance(body.get("tenant_id"), str):
+            # limits and budget are charged to one tenant; a handler using
+            # the other one must not slip past them
+            if tenant_id is not None and body["tenant_id"] != tenant_id:
+                raise HTTPException(status_code=400, detail="tenant_id da URL e do corpo não conferem")
+            tenant_id = body["tenant_id"]
+    return tenant_id
+
+def is_bulk_route(request: Request) -> bool:
+    path = getattr(request.scope.get("route"), "path", "")
+    return (path in BULK_ROUTES or path.endswith("/batch") or path.endswith("/export")
+            or (request.method != "GET" and path in BULK_WRITE_ROUTES))
+
+def is_upload_route(request: Request) -> bool:
+    return request.method in ("POST", "PATCH") and getattr(request.scope.get("route"), "path", "") in UPLOAD_ROUTES
+
+def request_cost(request: Request) -> float:
+    if is_bulk_route(request):
+        return BULK_COST
+    # a 1000-row page costs five 200-row pages' worth of tokens; lists
+    # without a limit cost what they did before pagination
+    try:
+        limit = int(request.query_params["limit"])
+    except (KeyError, ValueError):
+        return 1.0
+    return max(1.0, limit / 200)
+
+def budget_exceeded(tenant_id: str) -> HTTPException:
+    usage.add(tenant_id, budget_exceeded=1)
+    return HTTPException(status_code=503, detail="Consulta excedeu o tempo limite do tenant", headers={"Retry-After": "1"})
+
+async def tenant_context(request: Request):
+    tenant_id = await request_tenant_id(request)
+    if tenant_id is None:
+        yield None
+        return
+    if not valid_tenant_id(tenant_id):
+        raise HTTPException(status_code=400, detail="tenant_id inválido")
+    tenant = await tenant_directory.resolve(db, tenant_id)
+    if tenant.status != ACTIVE:
+        raise HTTPException(status_code=403, detail="Tenant suspenso")
+    try:
+        tenant_limiter.check_rate(tenant, request_cost(request))
+    except TenantRejected as e:
+        usage.add(tenant_id, throttled=1)
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    try:
+        slots = await tenant_limiter.acquire(tenant)
+    except TenantRejected as e:
+        usage.add(tenant_id, rejected=1)
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
 
-# Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+    budget_ms = BULK_QUERY_BUDGET_MS if is_bulk_route(request) else tenant.limits.query_budget_ms
+    if is_upload_route(request):
+        budget_ms = None
+    token = current_tenant.set(tenant_id)
+    started = time.perf_counter()
+    try:
+        # Streamed bodies (exports, SSE) are sent after this exits, outside
+        # the budget and without holding a slot
+        with pymongo.timeout(budget_ms / 1000 if budget_ms else None):
+            yield tenant
+    except PyMongoError as e:
+        if e.timeout:
+            raise budget_exceeded(tenant_id) from e
+        raise
+    except HTTPException as e:
+        # handlers turn unexpected errors into 500s; recover budget timeouts
+        cause = e.__cause__ or e.__context__
+        if e.status_code == 500 and isinstance(cause, PyMongoError) and cause.timeout:
+            raise budget_exceeded(tenant_id) from cause
+        raise
+    finally:
+        slots.release()
+        current_tenant.reset(token)
+        usage.add(tenant_id, requests=1, request_seconds=time.perf_counter() - started)
+
+# Routers carry the /api prefix and the tenant context themselves and their
+# routes are mounted as they are: include_router would build every route a
+# second time, which is most of the import cost of this module
+def make_api_router() -> APIRouter:
+    return APIRouter(prefix="/api", dependencies=[Depends(tenant_context)], dependency_overrides_provider=app)
+
+api_router = make_api_router()
 
 # Enums
 class LicenseType(str, Enum):
@@ -77,6 +276,8 @@ class License(BaseModel):
     description: Optional[str] = None
     tenant_id: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
+    version: int = 1
 
 class Project(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -91,6 +292,8 @@ class Project(BaseModel):
     environmental_impact: str
     tenant_id: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
+    version: int = 1
 
 class Inspection(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -104,6 +307,8 @@ class Inspection(BaseModel):
     observations: Optional[str] = None
     tenant_id: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
+    version: int = 1
 
 class WaterMonitoring(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -114,10 +319,13 @@ class WaterMonitoring(BaseModel):
     dissolved_oxygen: float
     temperature: float
     conductivity: float
-    status: str
+    status: str = "Normal"  # computed server-side against the tenant's CONAMA limits
+    exceedances: List[str] = Field(default_factory=list)
     observations: Optional[str] = None
     tenant_id: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
+    version: int = 1
 
 class Commitment(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -130,6 +338,8 @@ class Commitment(BaseModel):
     progress: int = 0
     tenant_id: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
+    version: int = 1
 
 class WasteManagement(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -144,6 +354,8 @@ class WasteManagement(BaseModel):
     status: str
     tenant_id: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
+    version: int = 1
 
 # Create models for requests
 class LicenseCreate(BaseModel):
@@ -172,6 +384,375 @@ class ProjectCreate(BaseModel):
     environmental_impact: str
     tenant_id: str
 
+class WaterMonitoringCreate(BaseModel):
+    location: str
+    collection_date: str
+    ph_level: float
+    turbidity: float
+    dissolved_oxygen: float
+    temperature: float
+    conductivity: float
+    observations: Optional[str] = None
+    tenant_id: str
+
+class InspectionCreate(BaseModel):
+    title: str
+    location: str
+    scheduled_date: str
+    inspector: str
+    status: InspectionStatus
+    conformity_percentage: Optional[float] = 0
+    checklist_items: List[Dict] = Field(default_factory=list)
+    observations: Optional[str] = None
+    tenant_id: str
+
+class WasteManagementCreate(BaseModel):
+    waste_type: str
+    classification: str
+    quantity: float
+    unit: str
+    collection_date: str
+    destination: str
+    transport_company: str
+    mtr_number: str
+    status: str
+    tenant_id: str
+
+class CommitmentCreate(BaseModel):
+    title: str
+    description: str
+    due_date: str
+    responsible: str
+    status: str
+    priority: str
+    progress: int = 0
+    tenant_id: str
+
+# Module registry: URL segment -> (collection name, model)
+MODULES = {
+    "licenses": ("licenses", License),
+    "projects": ("projects", Project),
+    "inspections": ("inspections", Inspection),
+    "water-monitoring": ("water_monitoring", WaterMonitoring),
+    "waste": ("waste_management", WasteManagement),
+    "commitments": ("commitments", Commitment),
+}
+
+# Change events for caches, derived views and the /api/events stream; fed by
+# a change stream when available (see events.EventBus)
+event_bus = EventBus(poll_interval=float(os.environ.get('EVENT_POLL_INTERVAL', '2')))
+
+def invalidate_tenant_caches(event: ChangeEvent):
+    if event.tenant_id is None:
+        waste_cache.clear()
+        portfolio_cache.clear()
+        return
+    invalidate_portfolio_cache(event.tenant_id)
+    if event.collection == "waste_management":
+        waste_cache.invalidate_tenant(event.tenant_id)
+
+event_bus.add_listener(invalidate_tenant_caches)
+
+def mark_scores_dirty(event: ChangeEvent):
+    if compliance_scores is not None:
+        compliance_scores.listener(event)
+
+event_bus.add_listener(mark_scores_dirty)
+
+# Awaited after every write so per-tenant derived data is recomputed and
+# list ETags change before the response goes out
+async def tenant_data_changed(tenant_id: str, collection_name: str, operation: str = UPDATE, ids: List[str] = ()):
+    await bump_version(db, tenant_id, collection_name)
+    event_bus.publish_local(tenant_id, collection_name, operation, ids)
+
+# Trusted read path: stored documents were validated on write, so list and
+# detail endpoints project the model fields and encode them without
+# rebuilding models (response_model stays for the OpenAPI schema only)
+# Bulky fields left out of list responses unless asked for with fields=
+SUMMARY_EXCLUDES = {
+    "licenses": ["description"],
+    "inspections": ["checklist_items", "observations"],
+    "water_monitoring": ["observations"],
+    "commitments": ["description"],
+}
+readers = {
+    collection_name: TrustedReader(model, SUMMARY_EXCLUDES.get(collection_name, ()))
+    for collection_name, model in MODULES.values()
+}
+
+# Document writes shared by the module endpoints and sync. Each keeps the
+# derived fields in step (sync stamps, parsed due dates, search keys,
+# deadlines, water rollups, waste totals) and announces the change.
+COLLECTION_MODELS = dict(MODULES.values())
+
+def prepare_inserts(collection_name: str, documents: List[Dict[str, Any]]):
+    stamp_new(documents)
+    add_datetimes(collection_name, documents)
+    add_search_keys(collection_name, documents)
+    add_mtr_keys(collection_name, documents)
+
+async def update_aggregates(collection_name: str, added: List[Dict[str, Any]] = (), removed: List[Dict[str, Any]] = ()):
+    """Fold written documents into the collection's aggregates; ``removed`` are the previous versions."""
+    if collection_name == "water_monitoring":
+        if removed:
+            await remove_from_rollups(db, removed)
+        if added:
+            await update_rollups(db, added)
+    elif collection_name == "waste_management":
+        await update_waste_analytics(db, added, removed)
+
+async def create_document(collection_name: str, tenant_id: str, data: Dict[str, Any], doc_id: Optional[str] = None) -> Dict[str, Any]:
+    values = {k: v for k, v in data.items() if k not in PROTECTED_FIELDS}
+    document = COLLECTION_MODELS[collection_name](**values, tenant_id=tenant_id, **({"id": doc_id} if doc_id else {})).dict()
+    if collection_name == "water_monitoring":
+        evaluate_readings([document], await load_settings(db, tenant_id))
+    prepare_inserts(collection_name, [document])
+    await db[collection_name].insert_one(document)
+    document.pop("_id", None)
+    await sync_deadlines(db, collection_name, [document])
+    await update_aggregates(collection_name, [document])
+    await tenant_data_changed(tenant_id, collection_name, INSERT, [document["id"]])
+    return document
+
+async def update_document(collection_name: str, tenant_id: str, doc_id: str, changes: Dict[str, Any], base_version: Optional[int] = None):
+    """Apply ``changes`` with optimistic concurrency.
+
+    Returns ``("applied", document)``, ``("conflict", current)`` when
+    ``base_version`` is stale or another write won the race, or
+    ``("not_found", None)``. Invalid values raise pydantic's ValidationError.
+    """
+    collection = db[collection_name]
+    key = {"tenant_id": tenant_id, "id": doc_id}
+    current = await collection.find_one(key, {"_id": 0})
+    if current is None:
+        return "not_found", None
+    version = current.get("version", 1)
+    if base_version is not None and version != base_version:
+        return "conflict", current
+    model = COLLECTION_MODELS[collection_name]
+    merged = model(**{**current, **{k: v for k, v in changes.items() if k not in PROTECTED_FIELDS}}).dict()
+    if collection_name == "water_monitoring":
+        evaluate_readings([merged], await load_settings(db, tenant_id))
+    add_datetimes(collection_name, [merged])
+    add_search_keys(collection_name, [merged])
+    add_mtr_keys(collection_name, [merged])
+    values = {k: v for k, v in merged.items() if k not in PROTECTED_FIELDS}
+    if "version" not in current:
+        await start_versions(collection, tenant_id, [doc_id])
+    result = await collection.update_one(
+        {**key, "version": version}, touch({"$set": values})
+    )
+    if not result.matched_count:
+        return "conflict", await collection.find_one(key, {"_id": 0})
+    document = await collection.find_one(key, {"_id": 0})
+    await sync_deadlines(db, collection_name, [document])
+    await update_aggregates(collection_name, [document], [current])
+    await tenant_data_changed(tenant_id, collection_name, UPDATE, [doc_id])
+    return "applied", document
+
+async def delete_document(collection_name: str, tenant_id: str, doc_id: str, base_version: Optional[int] = None):
+    """Delete and leave a sync tombstone; same return convention as update_document."""
+    collection = db[collection_name]
+    key = {"tenant_id": tenant_id, "id": doc_id}
+    query = key
+    if base_version is not None:
+        # documents from before versioning count as version 1
+        query = {**key, "version": {"$in": [1, None]} if base_version == 1 else base_version}
+    current = await collection.find_one_and_delete(query, {"_id": 0})
+    if current is None:
+        current = await collection.find_one(key, {"_id": 0})
+        return ("conflict", current) if current else ("not_found", None)
+    await write_tombstones(db, tenant_id, collection_name, [doc_id])
+    await remove_deadlines(db, tenant_id, collection_name, [doc_id])
+    await update_aggregates(collection_name, removed=[current])
+    if collection_name == "inspections":
+        await evidence_service.remove_inspections(tenant_id, [doc_id])
+    await tenant_data_changed(tenant_id, collection_name, DELETE, [doc_id])
+    return "applied", None
+
+class BatchOperationType(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+class BatchOperation(BaseModel):
+    op: BatchOperationType
+    # required for update/delete; optional client id on create. Ids are unique
+    # per tenant only, so everything keyed by them also carries tenant_id
+    id: Optional[str] = Field(None, min_length=1, max_length=200)
+    base_version: Optional[int] = None
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+MAX_BATCH_OPERATIONS = 5000
+
+def _validation_messages(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in error.errors()]
+
+async def apply_batch(collection_name: str, tenant_id: str, operations: List[BatchOperation]) -> List[Dict[str, Any]]:
+    """Validate every operation, then run the valid ones as one unordered bulk_write.
+
+    Currents for updates/deletes are read with a single $in query; writes are
+    guarded by version like update_document, and operations whose guard did
+    not match are reported as conflicts.
+    """
+    model = COLLECTION_MODELS[collection_name]
+    collection = db[collection_name]
+    results: List[Dict[str, Any]] = [{"index": i, "op": op.op.value, "id": op.id} for i, op in enumerate(operations)]
+    targets = {op.id for op in operations if op.op != BatchOperationType.CREATE and op.id}
+    current = {}
+    if targets:
+        async for document in collection.find({"tenant_id": tenant_id, "id": {"$in": list(targets)}}, {"_id": 0}):
+            current[document["id"]] = document
+        unversioned = [doc_id for doc_id, document in current.items() if "version" not in document]
+        if unversioned:
+            await start_versions(collection, tenant_id, unversioned)
+
+    writes, planned, seen = [], [], set()
+    created, updated = [], []
+    for index, op in enumerate(operations):
+        result = results[index]
+        if op.id is not None and op.id in seen:
+            result.update(status="invalid", errors=["id repetido no lote"])
+            continue
+        if op.id is not None:
+            seen.add(op.id)
+        try:
+            if op.op == BatchOperationType.CREATE:
+                values = {k: v for k, v in op.data.items() if k not in PROTECTED_FIELDS}
+                document = model(**values, tenant_id=tenant_id, **({"id": op.id} if op.id else {})).dict()
+                result["id"] = document["id"]
+                created.append(document)
+                writes.append(InsertOne(document))
+                planned.append((index, document))
+                continue
+            if op.id is None:
+                result.update(status="invalid", errors=["id obrigatório"])
+                continue
+            existing = current.get(op.id)
+            if existing is None:
+                result["status"] = "not_found"
+                continue
+            version = existing.get("version", 1)
+            if op.base_version is not None and version != op.base_version:
+                result.update(status="conflict", version=version)
+                continue
+            guard = {"tenant_id": tenant_id, "id": op.id, "version": version}
+            if op.op == BatchOperationType.DELETE:
+                writes.append(DeleteOne(guard))
+                planned.append((index, None))
+                continue
+            merged = model(**{**existing, **{k: v for k, v in op.data.items() if k not in PROTECTED_FIELDS}}).dict()
+            merged["version"] = version + 1
+            updated.append(merged)
+            writes.append(UpdateOne(guard, touch({"$set": {k: v for k, v in merged.items() if k not in PROTECTED_FIELDS}})))
+            planned.append((index, merged))
+        except ValidationError as e:
+            result.update(status="invalid", errors=_validation_messages(e))
+
+    prepare_inserts(collection_name, created)
+    add_datetimes(collection_name, updated)
+    add_search_keys(collection_name, updated)
+    add_mtr_keys(collection_name, updated)
+    failed: Dict[int, Dict[str, Any]] = {}
+    guarded = len(writes) - len(created)
+    if writes:
+        try:
+            outcome = await collection.bulk_write(writes, ordered=False)
+            matched = outcome.matched_count + outcome.deleted_count
+        except BulkWriteError as e:
+            failed = {error["index"]: error for error in e.details.get("writeErrors", [])}
+            matched = e.details.get("nMatched", 0) + e.details.get("nRemoved", 0)
+
+    # Some guarded write matched nothing (a concurrent write won): look up
+    # the current versions to tell which
+    versions: Optional[Dict[str, int]] = None
+    if guarded and matched < guarded:
+        ids = [results[index]["id"] for position, (index, _) in enumerate(planned) if not isinstance(writes[position], InsertOne)]
+        versions = {}
+        async for document in collection.find({"tenant_id": tenant_id, "id": {"$in": ids}}, {"_id": 0, "id": 1, "version": 1}):
+            versions[document["id"]] = document.get("version", 1)
+
+    applied = {INSERT: [], UPDATE: [], DELETE: []}
+    for position, (index, document) in enumerate(planned):
+        result = results[index]
+        if position in failed:
+            error = failed[position]
+            result.update(status="conflict" if error.get("code") == 11000 else "error", error=error.get("errmsg"))
+        elif isinstance(writes[position], InsertOne):
+            result.update(status="applied", version=1)
+            applied[INSERT].append(document)
+        elif document is None:
+            if versions is not None and result["id"] in versions:
+                result.update(status="conflict", version=versions[result["id"]])
+            else:
+                result["status"] = "applied"
+                applied[DELETE].append(result["id"])
+        elif versions is not None and versions.get(result["id"]) != document["version"]:
+            result.update(status="conflict", version=versions.get(result["id"]))
+        else:
+            result.update(status="applied", version=document["version"])
+            applied[UPDATE].append(document)
+
+    await sync_deadlines(db, collection_name, applied[INSERT] + applied[UPDATE])
+    if applied[DELETE]:
+        await write_tombstones(db, tenant_id, collection_name, applied[DELETE])
+        await remove_deadlines(db, tenant_id, collection_name, applied[DELETE])
+        if collection_name == "inspections":
+            await evidence_service.remove_inspections(tenant_id, applied[DELETE])
+    replaced = [current[document["id"]] for document in applied[UPDATE]] + [current[doc_id] for doc_id in applied[DELETE]]
+    await update_aggregates(collection_name, applied[INSERT] + applied[UPDATE], replaced)
+    for operation, documents in applied.items():
+        if documents:
+            ids = documents if operation == DELETE else [document["id"] for document in documents]
+            await tenant_data_changed(tenant_id, collection_name, operation, ids)
+    return results
+
+async def run_idempotent(request: Request, tenant_id: str, key: Optional[str], handler) -> Response:
+    """Run a write once per Idempotency-Key; retries get the stored response."""
+    if not key:
+        return FastJSONResponse(await handler())
+    request_hash = fingerprint(request.method, str(request.url.path) + "?" + request.url.query, await request.body())
+    try:
+        stored = await begin_idempotency(db, tenant_id, key, request_hash)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    if stored is not None:
+        return Response(stored["body"], status_code=stored["status_code"], media_type="application/json",
+                        headers={REPLAYED_HEADER: "true"})
+    try:
+        response = FastJSONResponse(await handler())
+    except BaseException:
+        await abandon_idempotency(db, tenant_id, key)
+        raise
+    await complete_idempotency(db, tenant_id, key, response.status_code, response.body)
+    return response
+
+# Pagination helpers. List pages carry an ETag built from the tenant's
+# collection version, so a poll with a current If-None-Match is answered
+# with a 304 after one point read, without the page query or the count.
+# The version is read before the page and both from the primary: the page
+# is then at least as new as its tag (a page from a lagging secondary could
+# be pinned under a newer tag until the next write).
+LIST_CACHE_CONTROL = "private, no-cache"
+
+async def list_page(request: Request, collection_name: str, query: Dict[str, Any], limit: int, cursor: Optional[str], include_total: bool, fields: Optional[str] = None):
+    version = await current_version(db, query["tenant_id"], collection_name)
+    validators = {"ETag": list_etag(version, collection_name, request.query_params.multi_items()), "Cache-Control": LIST_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), validators["ETag"]):
+        return Response(status_code=304, headers=validators)
+    collection = db[collection_name]
+    reader = readers[collection_name]
+    try:
+        selected = reader.select(fields)
+        documents, next_cursor = await fetch_page(collection, query, limit, cursor, reader.projection_for(selected))
+    except (InvalidCursor, UnknownFields) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total = await collection.count_documents(query) if include_total else None
+    return FastJSONResponse(reader.fill_all(documents, selected), headers={**page_headers(next_cursor, total), **validators})
+
 # Auth and Dashboard endpoints
 @api_router.get("/")
 async def root():
@@ -180,34 +761,44 @@ async def root():
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats(tenant_id: str = Query(...)):
     try:
-        licenses_count = await db.licenses.count_documents({"tenant_id": tenant_id})
-        projects_count = await db.projects.count_documents({"tenant_id": tenant_id})
-        inspections_count = await db.inspections.count_documents({"tenant_id": tenant_id})
-        active_licenses = await db.licenses.count_documents({"tenant_id": tenant_id, "status": "Ativa"})
-        
-        return {
-            "licenses_total": licenses_count,
-            "projects_total": projects_count,
-            "inspections_total": inspections_count,
-            "licenses_active": active_licenses,
-            "compliance_score": 85.7,
-            "esg_score": 92.3
-        }
+        # the compliance_scores view holds the whole summary, recomputed in
+        # the background after writes and once a day, and on this read when
+        # the tenant changed since
+        stats = await compliance_scores.get(tenant_id)
+        from compliance import SCORE_FIELDS
+        return FastJSONResponse({field: stats.get(field) for field in (*SCORE_FIELDS, "computed_at")})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Export endpoints (registered before the /{id} routes so "export" is not taken as an id)
+@api_router.get("/{module}/export")
+async def export_module(module: str, tenant_id: str = Query(...), format: ExportFormat = ExportFormat.NDJSON, fields: Optional[str] = None):
+    if module not in MODULES:
+        raise HTTPException(status_code=404, detail="Módulo não encontrado")
+    collection_name, _ = MODULES[module]
+    try:
+        selected = readers[collection_name].select(fields, summary=False)
+    except UnknownFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        stream_export(read_db[collection_name], {"tenant_id": tenant_id}, list(selected), format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{module}-{tenant_id}.{format.value}"'},
+    )
+
 # License endpoints
 @api_router.post("/licenses", response_model=License)
-async def create_license(license_data: LicenseCreate):
+async def create_license(license_data: LicenseCreate, request: Request, idempotency_key: Optional[str] = Header(None)):
     try:
-        license_obj = License(**license_data.dict())
-        await db.licenses.insert_one(license_obj.dict())
-        return license_obj
+        return await run_idempotent(request, license_data.tenant_id, idempotency_key,
+                                    lambda: create_document("licenses", license_data.tenant_id, license_data.dict()))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/licenses", response_model=List[License])
-async def get_licenses(tenant_id: str = Query(...), status: Optional[str] = None, type: Optional[str] = None):
+async def get_licenses(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, include_total: bool = False, fields: Optional[str] = None, tenant_id: str = Query(...), status: Optional[str] = None, type: Optional[str] = None):
     try:
         query = {"tenant_id": tenant_id}
         if status:
@@ -215,182 +806,437 @@ async def get_licenses(tenant_id: str = Query(...), status: Optional[str] = None
         if type:
             query["type"] = type
             
-        licenses = await db.licenses.find(query).to_list(1000)
-        return [License(**license) for license in licenses]
+        return await list_page(request, "licenses", query, limit, cursor, include_total, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/licenses/{license_id}", response_model=License)
 async def get_license(license_id: str, tenant_id: str = Query(...)):
     try:
-        license_data = await db.licenses.find_one({"id": license_id, "tenant_id": tenant_id})
+        license_data = await db.licenses.find_one({"id": license_id, "tenant_id": tenant_id}, readers["licenses"].projection)
         if not license_data:
             raise HTTPException(status_code=404, detail="Licença não encontrada")
-        return License(**license_data)
+        return FastJSONResponse(readers["licenses"].fill(license_data))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Project endpoints
 @api_router.post("/projects", response_model=Project)
-async def create_project(project_data: ProjectCreate):
+async def create_project(project_data: ProjectCreate, request: Request, idempotency_key: Optional[str] = Header(None)):
     try:
-        project_obj = Project(**project_data.dict())
-        await db.projects.insert_one(project_obj.dict())
-        return project_obj
+        return await run_idempotent(request, project_data.tenant_id, idempotency_key,
+                                    lambda: create_document("projects", project_data.tenant_id, project_data.dict()))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/projects", response_model=List[Project])
-async def get_projects(tenant_id: str = Query(...), status: Optional[str] = None):
+async def get_projects(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, include_total: bool = False, fields: Optional[str] = None, tenant_id: str = Query(...), status: Optional[str] = None):
     try:
         query = {"tenant_id": tenant_id}
         if status:
             query["status"] = status
             
-        projects = await db.projects.find(query).to_list(1000)
-        return [Project(**project) for project in projects]
+        return await list_page(request, "projects", query, limit, cursor, include_total, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Inspection endpoints
 @api_router.get("/inspections", response_model=List[Inspection])
-async def get_inspections(tenant_id: str = Query(...)):
+async def get_inspections(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, include_total: bool = False, fields: Optional[str] = None, tenant_id: str = Query(...)):
     try:
-        inspections = await db.inspections.find({"tenant_id": tenant_id}).to_list(1000)
-        return [Inspection(**inspection) for inspection in inspections]
+        return await list_page(request, "inspections", {"tenant_id": tenant_id}, limit, cursor, include_total, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Water monitoring endpoints
 @api_router.get("/water-monitoring", response_model=List[WaterMonitoring])
-async def get_water_monitoring(tenant_id: str = Query(...)):
+async def get_water_monitoring(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, include_total: bool = False, fields: Optional[str] = None, tenant_id: str = Query(...)):
+    try:
+        return await list_page(request, "water_monitoring", {"tenant_id": tenant_id}, limit, cursor, include_total, fields)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/water-monitoring", response_model=WaterMonitoring)
+async def create_water_monitoring(reading_data: WaterMonitoringCreate, request: Request, idempotency_key: Optional[str] = Header(None)):
     try:
-        data = await db.water_monitoring.find({"tenant_id": tenant_id}).to_list(1000)
-        return [WaterMonitoring(**item) for item in data]
+        return await run_idempotent(request, reading_data.tenant_id, idempotency_key,
+                                    lambda: create_document("water_monitoring", reading_data.tenant_id, reading_data.dict()))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Bulk sensor ingestion: JSON array or NDJSON body, validated per row and
+# written with unordered insert_many in chunks
+@api_router.post("/water-monitoring/batch")
+async def ingest_water_monitoring(request: Request, tenant_id: str = Query(...), idempotency_key: Optional[str] = Header(None)):
+    try:
+        rows = parse_rows(await request.body(), request.headers.get("content-type", ""))
+    except (BatchParseError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def handler():
+        documents, errors = validate_rows(rows, WaterMonitoring, {"tenant_id": tenant_id})
+        evaluate_readings([doc for _, doc in documents], await load_settings(db, tenant_id))
+        prepare_inserts("water_monitoring", [doc for _, doc in documents])
+        inserted, write_errors = await insert_chunked(db.water_monitoring, documents)
+        if inserted:
+            failed = {error["index"] for error in write_errors}
+            written = [doc for index, doc in documents if index not in failed]
+            await update_rollups(db, written)
+            await tenant_data_changed(tenant_id, "water_monitoring", INSERT, [doc["id"] for doc in written])
+        return {
+            "received": len(rows),
+            "inserted": inserted,
+            "failed": len(errors) + len(write_errors),
+            "errors": sorted(errors + write_errors, key=lambda error: error["index"]),
+        }
+
+    try:
+        return await run_idempotent(request, tenant_id, idempotency_key, handler)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Waste management endpoints
 @api_router.get("/waste", response_model=List[WasteManagement])
-async def get_waste_management(tenant_id: str = Query(...)):
+async def get_waste_management(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, include_total: bool = False, fields: Optional[str] = None, tenant_id: str = Query(...)):
     try:
-        data = await db.waste_management.find({"tenant_id": tenant_id}).to_list(1000)
-        return [WasteManagement(**item) for item in data]
+        return await list_page(request, "waste_management", {"tenant_id": tenant_id}, limit, cursor, include_total, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Commitments endpoints
 @api_router.get("/commitments", response_model=List[Commitment])
-async def get_commitments(tenant_id: str = Query(...)):
+async def get_commitments(request: Request, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, include_total: bool = False, fields: Optional[str] = None, tenant_id: str = Query(...)):
     try:
-        commitments = await db.commitments.find({"tenant_id": tenant_id}).to_list(1000)
-        return [Commitment(**commitment) for commitment in commitments]
+        return await list_page(request, "commitments", {"tenant_id": tenant_id}, limit, cursor, include_total, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Seed data endpoint for development
-@api_router.post("/seed-data")
-async def seed_data(tenant_id: str = Query("demo-tenant")):
+# Search endpoint: accent-insensitive, stemmed, prefix and typo-tolerant matching across
+# licenses, projects and inspections, ranked by field weight
+SEARCH_MODULES = [module for module, (collection_name, _) in MODULES.items() if collection_name in SEARCH_FIELDS]
+
+@api_router.get("/search")
+async def search_modules(tenant_id: str = Query(...), q: str = Query(..., min_length=1, max_length=200), modules: Optional[List[str]] = Query(None), limit: int = Query(20, ge=1, le=100)):
+    modules = modules or SEARCH_MODULES
+    unknown = set(modules) - set(SEARCH_MODULES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Módulos sem busca: {', '.join(sorted(unknown))}")
     try:
-        # Clear existing data for tenant
-        await db.licenses.delete_many({"tenant_id": tenant_id})
-        await db.projects.delete_many({"tenant_id": tenant_id})
-        await db.inspections.delete_many({"tenant_id": tenant_id})
-        
-        # Sample Brazilian licenses
-        sample_licenses = [
-            {
-                "id": str(uuid.uuid4()),
-                "number": "LP001/2024-SP",
-                "type": "LP",
-                "title": "Licença Prévia - Complexo Industrial",
-                "company": "Indústria Brasileira S.A.",
-                "cnpj": "12.345.678/0001-90",
-                "status": "Ativa",
-                "issue_date": "2024-01-15",
-                "expiry_date": "2025-01-15",
-                "issuing_body": "CETESB",
-                "activity_type": "Indústria Química",
-                "description": "Licenciamento para instalação de complexo industrial químico",
-                "tenant_id": tenant_id,
-                "created_at": datetime.now(timezone.utc)
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "number": "LO089/2023-RJ",
-                "type": "LO",
-                "title": "Licença de Operação - Refinaria",
-                "company": "Petróleo do Brasil Ltda",
-                "cnpj": "98.765.432/0001-10",
-                "status": "Ativa",
-                "issue_date": "2023-06-20",
-                "expiry_date": "2028-06-20",
-                "issuing_body": "INEA",
-                "activity_type": "Refino de Petróleo",
-                "description": "Operação de refinaria de petróleo",
-                "tenant_id": tenant_id,
-                "created_at": datetime.now(timezone.utc)
-            }
-        ]
-        
-        # Sample projects
-        sample_projects = [
-            {
-                "id": str(uuid.uuid4()),
-                "name": "Recuperação de Mata Ciliar - Rio Tietê",
-                "description": "Projeto de recuperação de 50 hectares de mata ciliar",
-                "status": "Em Andamento",
-                "start_date": "2024-03-01",
-                "end_date": "2024-12-31",
-                "budget": 2500000.00,
-                "manager": "Dr. Maria Silva",
-                "location": "São Paulo, SP",
-                "environmental_impact": "Recuperação de biodiversidade aquática",
-                "tenant_id": tenant_id,
-                "created_at": datetime.now(timezone.utc)
-            }
-        ]
-        
-        # Sample inspections
-        sample_inspections = [
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Vistoria Trimestral - Tratamento de Efluentes",
-                "location": "Complexo Industrial - São Bernardo do Campo, SP",
-                "scheduled_date": "2024-07-20",
-                "inspector": "Eng. João Santos",
-                "status": "Concluída",
-                "conformity_percentage": 87.5,
-                "checklist_items": [
-                    {"item": "Funcionamento da ETE", "status": "Conforme", "evidence": ""},
-                    {"item": "Qualidade do efluente", "status": "Conforme", "evidence": ""},
-                    {"item": "Documentação atualizada", "status": "Não Conforme", "evidence": ""}
-                ],
-                "observations": "Necessário atualizar certidões de destinação de resíduos",
-                "tenant_id": tenant_id,
-                "created_at": datetime.now(timezone.utc)
-            }
-        ]
-        
-        # Insert sample data
-        await db.licenses.insert_many(sample_licenses)
-        await db.projects.insert_many(sample_projects)
-        await db.inspections.insert_many(sample_inspections)
-        
-        return {"message": "Dados de exemplo criados com sucesso"}
+        selected = {MODULES[module][0]: readers[MODULES[module][0]].summary_fields for module in modules}
+        projections = {name: TrustedReader.projection_for(fields) for name, fields in selected.items()}
+        modules_by_collection = {MODULES[module][0]: module for module in modules}
+        hits = []
+        for collection_name, score, document in await search(read_db, tenant_id, q, projections, limit):
+            item = {name: document[name] for name in selected[collection_name] if name in document}
+            hits.append({
+                "module": modules_by_collection[collection_name],
+                "score": score,
+                "item": readers[collection_name].fill_all([item], selected[collection_name])[0],
+            })
+        return FastJSONResponse(hits)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Include the router in the main app
-app.include_router(api_router)
+# Server-Sent Events: per-tenant change deltas so the frontend can patch its
+# lists instead of polling them. Events: insert/update/delete with module and
+# ids (plus the document when the change stream provides it), or reset when
+# the client fell behind and should refetch.
+EVENT_HEARTBEAT = 15.0
+MODULE_BY_COLLECTION = {collection_name: module for module, (collection_name, _) in MODULES.items()}
 
+def event_payload(event: ChangeEvent) -> bytes:
+    payload = {
+        "module": MODULE_BY_COLLECTION.get(event.collection, event.collection),
+        "operation": event.operation,
+        "ids": list(event.ids),
+        "at": event.at,
+    }
+    if event.document is not None and event.collection in readers:
+        reader = readers[event.collection]
+        payload["document"] = reader.fill({k: v for k, v in event.document.items() if k in reader.fields})
+    return dumps(payload)
+
+@api_router.get("/events")
+async def stream_events(request: Request, tenant_id: str = Query(...), modules: Optional[List[str]] = Query(None)):
+    unknown = set(modules or ()) - set(MODULES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Módulos desconhecidos: {', '.join(sorted(unknown))}")
+    collections = [MODULES[module][0] for module in modules] if modules else None
+    subscription = event_bus.subscribe(tenant_id, collections)
+
+    async def stream():
+        try:
+            yield b"retry: 5000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(EVENT_HEARTBEAT)
+                yield b": keep-alive\n\n" if event is None else sse_message(event, event_payload(event))
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Offline sync for the PWA: deltas since a watermark token, and batched
+# offline mutations with per-record optimistic concurrency on ``version``
+class SyncOperation(str, Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+class SyncMutation(BaseModel):
+    module: str
+    op: SyncOperation
+    id: str
+    base_version: Optional[int] = None  # version the client edited; None creates the record
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+class SyncPush(BaseModel):
+    mutations: List[SyncMutation]
+
+@api_router.get("/sync")
+async def sync_pull(tenant_id: str = Query(...), since: Optional[str] = None, modules: Optional[List[str]] = Query(None), limit: int = Query(DEFAULT_SYNC_LIMIT, ge=1, le=MAX_SYNC_LIMIT)):
+    unknown = set(modules or ()) - set(MODULES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Módulos desconhecidos: {', '.join(sorted(unknown))}")
+    selected = {MODULES[module][0]: module for module in (modules or MODULES)}
+    try:
+        delta = await pull(db, tenant_id, {name: readers[name].projection for name in selected}, since, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return FastJSONResponse({
+        "changes": {selected[name]: readers[name].fill_all(docs) for name, docs in delta["changes"].items()},
+        "deleted": {selected[name]: ids for name, ids in delta["deleted"].items()},
+        "reset": [selected[name] for name in delta["reset"]],
+        "has_more": delta["has_more"],
+        "next": delta["next"],
+    })
+
+@api_router.post("/sync")
+async def sync_push(payload: SyncPush, tenant_id: str = Query(...)):
+    if len(payload.mutations) > MAX_MUTATIONS:
+        raise HTTPException(status_code=413, detail=f"Máximo de {MAX_MUTATIONS} alterações por envio")
+    results = []
+    # In order: a batch may create a record and then edit it
+    for index, mutation in enumerate(payload.mutations):
+        result = {"index": index, "module": mutation.module, "id": mutation.id}
+        if mutation.module not in MODULES:
+            results.append({**result, "status": "invalid", "error": "Módulo desconhecido"})
+            continue
+        collection_name, _ = MODULES[mutation.module]
+        try:
+            if mutation.op == SyncOperation.DELETE:
+                status, document = await delete_document(collection_name, tenant_id, mutation.id, mutation.base_version)
+            elif mutation.base_version is None:
+                existing = await db[collection_name].find_one({"tenant_id": tenant_id, "id": mutation.id}, {"_id": 0})
+                if existing is not None:
+                    status, document = "conflict", existing
+                else:
+                    status, document = "applied", await create_document(collection_name, tenant_id, mutation.data, mutation.id)
+            else:
+                status, document = await update_document(collection_name, tenant_id, mutation.id, mutation.data, mutation.base_version)
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+            results.append({**result, "status": "invalid", "errors": errors})
+            continue
+        except Exception as e:
+            results.append({**result, "status": "error", "error": str(e)})
+            continue
+        result["status"] = status
+        if document is not None:
+            result["version"] = document.get("version", 1)
+            # on conflict the client gets the server copy to merge against
+            result["document"] = readers[collection_name].fill({k: v for k, v in document.items() if k in readers[collection_name].fields})
+        results.append(result)
+    return FastJSONResponse({"results": results})
+
+# Deadline endpoints: licenses expiring, commitments due and inspections
+# scheduled within the next ``days``, read from the materialized view
+@api_router.get("/deadlines")
+async def get_deadlines(tenant_id: str = Query(...), days: int = Query(30, ge=1, le=366), include_overdue: bool = False, kind: Optional[List[str]] = Query(None)):
+    try:
+        return FastJSONResponse(await upcoming(read_db, tenant_id, days, include_overdue, kind))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Tenant limits and daily resource usage (flushed every TENANT_USAGE_FLUSH_INTERVAL seconds)
+@api_router.get("/tenant/usage")
+async def get_tenant_usage(tenant_id: str = Query(...), days: int = Query(30, ge=1, le=366), tenant=Depends(tenant_context)):
+    try:
+        return FastJSONResponse({
+            "tenant_id": tenant_id,
+            "status": tenant.status,
+            "limits": tenant.limits._asdict(),
+            "days": await usage_report(db, tenant_id, days),
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Generic module routes: detail, create (where no dedicated endpoint exists),
+# partial update, delete and batch. Updates and deletes take the expected
+# version in If-Match (412 when stale); every write accepts Idempotency-Key.
+# Feature routers are mounted in front of these, so e.g. /water-monitoring/limits
+# wins over /water-monitoring/{item_id}.
+def parse_if_match(value: Optional[str]) -> Optional[int]:
+    if value is None or value.strip() == "*":
+        return None
+    try:
+        return int(value.strip().strip('W/').strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match deve conter a versão do registro")
+
+def register_module_routes(module: str, create_model=None, detail: bool = True, batch: bool = True):
+    collection_name, model = MODULES[module]
+    reader = readers[collection_name]
+
+    if detail:
+        @api_router.get(f"/{module}/{{item_id}}", response_model=model, name=f"get_{collection_name}_item")
+        async def get_item(item_id: str, tenant_id: str = Query(...)):
+            try:
+                document = await db[collection_name].find_one({"id": item_id, "tenant_id": tenant_id}, reader.projection)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+            if not document:
+                raise HTTPException(status_code=404, detail="Registro não encontrado")
+            return FastJSONResponse(reader.fill(document))
+
+    if create_model is not None:
+        @api_router.post(f"/{module}", response_model=model, name=f"create_{collection_name}")
+        async def create_item(data: create_model, request: Request, idempotency_key: Optional[str] = Header(None)):
+            try:
+                return await run_idempotent(request, data.tenant_id, idempotency_key,
+                                            lambda: create_document(collection_name, data.tenant_id, data.dict()))
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+    @api_router.patch(f"/{module}/{{item_id}}", response_model=model, name=f"update_{collection_name}")
+    async def update_item(item_id: str, request: Request, changes: Dict[str, Any] = Body(...), tenant_id: str = Query(...),
+                          if_match: Optional[str] = Header(None), idempotency_key: Optional[str] = Header(None)):
+        base_version = parse_if_match(if_match)
+
+        async def handler():
+            try:
+                status, document = await update_document(collection_name, tenant_id, item_id, changes, base_version)
+            except ValidationError as e:
+                raise HTTPException(status_code=422, detail=_validation_messages(e))
+            if status == "not_found":
+                raise HTTPException(status_code=404, detail="Registro não encontrado")
+            if status == "conflict":
+                raise HTTPException(status_code=412, detail={"message": "Registro alterado por outra requisição", "version": document.get("version", 1)})
+            return reader.fill({k: v for k, v in document.items() if k in reader.fields})
+
+        try:
+            return await run_idempotent(request, tenant_id, idempotency_key, handler)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @api_router.delete(f"/{module}/{{item_id}}", name=f"delete_{collection_name}")
+    async def delete_item(item_id: str, request: Request, tenant_id: str = Query(...),
+                          if_match: Optional[str] = Header(None), idempotency_key: Optional[str] = Header(None)):
+        base_version = parse_if_match(if_match)
+
+        async def handler():
+            status, document = await delete_document(collection_name, tenant_id, item_id, base_version)
+            if status == "not_found":
+                raise HTTPException(status_code=404, detail="Registro não encontrado")
+            if status == "conflict":
+                raise HTTPException(status_code=412, detail={"message": "Registro alterado por outra requisição", "version": document.get("version", 1)})
+            return {"message": "Registro excluído", "id": item_id}
+
+        try:
+            return await run_idempotent(request, tenant_id, idempotency_key, handler)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    if batch:
+        @api_router.post(f"/{module}/batch", name=f"batch_{collection_name}")
+        async def batch_items(payload: BatchRequest, request: Request, tenant_id: str = Query(...), idempotency_key: Optional[str] = Header(None)):
+            if len(payload.operations) > MAX_BATCH_OPERATIONS:
+                raise HTTPException(status_code=413, detail=f"Máximo de {MAX_BATCH_OPERATIONS} operações por lote")
+
+            async def handler():
+                results = await apply_batch(collection_name, tenant_id, payload.operations)
+                counts: Dict[str, int] = {}
+                for result in results:
+                    counts[result["status"]] = counts.get(result["status"], 0) + 1
+                return {"counts": counts, "results": results}
+
+            try:
+                return await run_idempotent(request, tenant_id, idempotency_key, handler)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+register_module_routes("licenses", detail=False)
+register_module_routes("projects")
+register_module_routes("inspections", InspectionCreate)
+# /water-monitoring/batch is the sensor ingestion endpoint above
+register_module_routes("water-monitoring", batch=False)
+register_module_routes("waste", WasteManagementCreate)
+register_module_routes("commitments", CommitmentCreate)
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+app.router.routes.extend(api_router.routes)
+
+# Feature routers (routers/) are imported by the first request under their
+# paths, keeping them and pandas out of worker startup. The report, evidence
+# and compliance services they call are imported by the lifespan, which
+# starts their background tasks; process pools and report writers load with
+# the first job. LAZY_ROUTERS=false loads every router in the lifespan.
+lazy_routers = LazyRouters(app, {
+    "routers.compliance": ["/api/compliance"],
+    "routers.portfolio": ["/api/portfolio", "/api/portfolios"],
+    "routers.water_quality": ["/api/water-monitoring/limits", "/api/water-monitoring/evaluate",
+                              "/api/water-monitoring/series", "/api/water-monitoring/rollups"],
+    "routers.waste_analytics": ["/api/waste/analytics", "/api/waste/inventory", "/api/waste/mtr-reconciliation"],
+    "routers.reports": ["/api/reports"],
+    "routers.evidence": ["/api/evidence", "/api/inspections/{inspection_id}/evidence"],
+    "routers.seed": ["/api/seed-data"],
+})
+
+app.add_middleware(LazyRoutesMiddleware, routers=lazy_routers, schema_path=app.openapi_url)
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Configure logging
 logging.basicConfig(
@@ -399,6 +1245,78 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+# Startup and shutdown steps, run by ``lifespan`` once the client is open
+async def reconcile_indexes():
+    # indexes.py names every feature's collections; load it here, not at import
+    from indexes import ensure_indexes
+    try:
+        report = await ensure_indexes(db, drop_undeclared=os.environ.get('DROP_UNDECLARED_INDEXES', 'false').lower() == 'true')
+        created = {name: entry["created"] + entry["changed"] for name, entry in report.items() if entry["created"] or entry["changed"]}
+        if created:
+            logger.info("Índices criados/atualizados: %s", created)
+        failed = {name: entry["failed"] for name, entry in report.items() if entry["failed"]}
+        if failed:
+            logger.error("Índices não reconciliados: %s", failed)
+    except Exception as e:
+        logger.error("Falha ao reconciliar índices: %s", e)
+
+# Search keys and sync stamps for documents written before those existed;
+# runs in the background so startup is not held up by large tenants
+background_tasks = set()
+
+def backfill_derived_fields():
+    async def run():
+        try:
+            counts = {name: count for name, count in (await reindex_all(db)).items() if count}
+            if counts:
+                logger.info("Chaves de busca geradas: %s", counts)
+            counts = {name: count for name, count in (await backfill_sync_fields(db, COLLECTION_MODELS)).items() if count}
+            if counts:
+                logger.info("Versões de sincronização iniciadas: %s", counts)
+            count = await backfill_waste_analytics(db)
+            if count:
+                logger.info("Resíduos incluídos nos totais mensais: %s", count)
+        except Exception as e:
+            logger.error("Falha ao completar campos derivados: %s", e)
+    task = asyncio.create_task(run())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+# Expires licenses on time and backfills parsed due dates; every worker runs
+# one, the updates are idempotent
+deadline_scheduler: Optional[DeadlineScheduler] = None
+
+def start_deadline_scheduler():
+    global deadline_scheduler
+    if os.environ.get('DEADLINE_SCHEDULER_ENABLED', 'true').lower() == 'true':
+        deadline_scheduler = DeadlineScheduler(db, lambda tenant_id: tenant_data_changed(tenant_id, "licenses"), interval=float(os.environ.get('DEADLINE_SCAN_INTERVAL', '300')))
+        deadline_scheduler.start()
+
+async def start_event_bus():
+    await event_bus.start(db)
+
+report_service: Optional["ReportService"] = None
+
+def start_report_service():
+    global report_service
+    from reports import ReportService, make_storage
+    report_service = ReportService(db, make_storage(db), os.environ['MONGO_URL'], os.environ['DB_NAME'])
+    report_service.start()
+
+evidence_service: Optional["EvidenceService"] = None
+
+# Materialized compliance/ESG scores, recomputed in the background after writes
+compliance_scores: Optional["ComplianceScores"] = None
+
+def start_compliance_scores():
+    global compliance_scores
+    from compliance import ComplianceScores
+    compliance_scores = ComplianceScores(db, interval=float(os.environ.get('COMPLIANCE_REFRESH_INTERVAL', '5')))
+    compliance_scores.on_refresh = invalidate_portfolio_cache
+    compliance_scores.start()
+
+def start_evidence_service():
+    global evidence_service
+    from evidence import EvidenceService, make_storage as make_evidence_storage
+    evidence_service = EvidenceService(db, make_evidence_storage(db))
+    evidence_service.start()
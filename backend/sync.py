@@ -0,0 +1,233 @@
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from pagination import InvalidCursor
+
+TOMBSTONE_COLLECTION = "sync_tombstones"
+# Deletions older than this are forgotten; clients that last synced before
+# then get a full reset instead of a delta
+TOMBSTONE_TTL_DAYS = int(os.environ.get("SYNC_TOMBSTONE_DAYS", "90"))
+# Writes from different workers can commit slightly out of updated_at order;
+# positions never advance past now - SETTLE, so late commits are still sent
+# (clients apply changes idempotently by id and version)
+SETTLE_SECONDS = float(os.environ.get("SYNC_SETTLE_SECONDS", "5"))
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 2000
+MAX_MUTATIONS = 500
+
+# Tombstone id meaning "every document of this collection up to deleted_at"
+ALL_DOCUMENTS = "*"
+
+Position = Tuple[datetime, str]
+
+
+def now_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def stamp_new(documents: Iterable[Dict[str, Any]], now: Optional[datetime] = None) -> None:
+    """Set ``updated_at``/``version`` in place on documents about to be inserted."""
+    now = now or now_utc()
+    for document in documents:
+        document["updated_at"] = now
+        document["version"] = 1
+
+
+def touch(update: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Add the ``updated_at``/``version`` bump to an update document."""
+    return {
+        **update,
+        "$set": {**update.get("$set", {}), "updated_at": now or now_utc()},
+        "$inc": {**update.get("$inc", {}), "version": 1},
+    }
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def encode_token(issued: datetime, positions: Dict[str, Position]) -> str:
+    payload = {
+        "v": 1,
+        "issued": _aware(issued).isoformat(),
+        "p": {key: [_aware(at).isoformat(), doc_id] for key, (at, doc_id) in positions.items()},
+    }
+    encoded = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(encoded).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Tuple[datetime, Dict[str, Position]]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        positions = {key: (datetime.fromisoformat(at), str(doc_id)) for key, (at, doc_id) in payload["p"].items()}
+        return datetime.fromisoformat(payload["issued"]), positions
+    except Exception:
+        raise InvalidCursor("Token de sincronização inválido")
+
+
+def _after(field: str, position: Optional[Position]) -> Dict[str, Any]:
+    if position is None:
+        return {}
+    at, doc_id = position
+    at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return {"$or": [{field: {"$gt": at}}, {field: at, "id": {"$gt": doc_id}}]}
+
+
+def _advance(documents: List[Dict[str, Any]], field: str, position: Optional[Position],
+             more: bool, cutoff: datetime) -> Tuple[Optional[Position], bool]:
+    """New position after ``documents``, held back to the settle cutoff."""
+    if not documents:
+        return position, False
+    last = (_aware(documents[-1][field]), documents[-1]["id"])
+    if last[0] > cutoff:
+        # Too recent to be final: resend from the cutoff next time
+        held = (cutoff, "")
+        if position is not None and _aware(position[0]) > cutoff:
+            held = position
+        return held, False
+    return last, more
+
+
+async def _reset_at(db, tenant_id: str, collection_name: str, position: Optional[Position]) -> Optional[datetime]:
+    """When the collection was last replaced wholesale, if after ``position``."""
+    if position is None:
+        return None
+    query = {"tenant_id": tenant_id, "collection": collection_name, "id": ALL_DOCUMENTS}
+    marker = await db[TOMBSTONE_COLLECTION].find_one(
+        {**query, **_after("deleted_at", position)}, {"_id": 0, "deleted_at": 1}, sort=[("deleted_at", -1)]
+    )
+    return _aware(marker["deleted_at"]) if marker else None
+
+
+async def pull(db, tenant_id: str, projections: Dict[str, Dict[str, int]], token: Optional[str],
+               limit: int = DEFAULT_SYNC_LIMIT) -> Dict[str, Any]:
+    """Documents changed and ids deleted per collection since ``token``.
+
+    Each collection keeps its own keyset position on (updated_at, id) and on
+    (deleted_at, id) for tombstones, so a client may sync a subset of modules.
+    Without a token (or with one older than the tombstone retention) the
+    collections are sent whole and listed in ``reset``: the client clears
+    them before applying the changes. ``has_more`` asks the client to call
+    again with ``next`` right away.
+    """
+    now = now_utc()
+    cutoff = now - timedelta(seconds=SETTLE_SECONDS)
+    positions: Dict[str, Position] = {}
+    expired = False
+    if token:
+        issued, positions = decode_token(token)
+        expired = _aware(issued) < now - timedelta(days=TOMBSTONE_TTL_DAYS)
+
+    changes: Dict[str, List[Dict[str, Any]]] = {}
+    deleted: Dict[str, List[str]] = {}
+    reset: List[str] = []
+    has_more = False
+    for collection_name, projection in projections.items():
+        position = positions.get(collection_name)
+        deleted_key = f"{collection_name}:deleted"
+        replaced_at = await _reset_at(db, tenant_id, collection_name, positions.get(deleted_key))
+        if expired or position is None or replaced_at is not None:
+            reset.append(collection_name)
+            position = None
+            # tombstones up to the replacement are covered by the reset
+            positions[deleted_key] = max((cutoff, ""), (replaced_at or cutoff, ALL_DOCUMENTS))
+
+        query = {"tenant_id": tenant_id, **_after("updated_at", position)}
+        documents = await (
+            db[collection_name].find(query, projection).sort([("updated_at", 1), ("id", 1)]).to_list(limit + 1)
+        )
+        more = len(documents) > limit
+        documents = documents[:limit]
+        new_position, more = _advance(documents, "updated_at", position, more, cutoff)
+        if new_position is not None:
+            positions[collection_name] = new_position
+        elif position is None:
+            positions[collection_name] = (datetime.min.replace(tzinfo=timezone.utc), "")
+        changes[collection_name] = documents
+        has_more = has_more or more
+
+        if collection_name in reset:
+            deleted[collection_name] = []
+            continue
+        tombstone_position = positions.get(deleted_key)
+        query = {"tenant_id": tenant_id, "collection": collection_name, **_after("deleted_at", tombstone_position)}
+        tombstones = await (
+            db[TOMBSTONE_COLLECTION].find(query, {"_id": 0, "id": 1, "deleted_at": 1})
+            .sort([("deleted_at", 1), ("id", 1)]).to_list(limit + 1)
+        )
+        more = len(tombstones) > limit
+        tombstones = tombstones[:limit]
+        new_position, more = _advance(tombstones, "deleted_at", tombstone_position, more, cutoff)
+        if new_position is not None:
+            positions[deleted_key] = new_position
+        deleted[collection_name] = [t["id"] for t in tombstones if t["id"] != ALL_DOCUMENTS]
+        has_more = has_more or more
+
+    return {
+        "changes": changes,
+        "deleted": deleted,
+        "reset": reset,
+        "has_more": has_more,
+        "next": encode_token(now, positions),
+    }
+
+
+async def write_tombstones(db, tenant_id: str, collection_name: str, ids: Iterable[str],
+                           now: Optional[datetime] = None) -> None:
+    now = now or now_utc()
+    operations = [
+        UpdateOne(
+            {"tenant_id": tenant_id, "collection": collection_name, "id": doc_id},
+            {"$set": {"deleted_at": now}},
+            upsert=True,
+        )
+        for doc_id in ids
+    ]
+    for start in range(0, len(operations), 1000):
+        await db[TOMBSTONE_COLLECTION].bulk_write(operations[start:start + 1000], ordered=False)
+
+
+async def start_versions(collection, tenant_id: str, ids: List[str]) -> None:
+    """Give documents from before versioning version 1 ahead of a guarded write.
+
+    They already read as version 1, and ``touch`` increments a missing
+    version to 1 only; started here, the write takes them to 2.
+    """
+    await collection.update_many(
+        {"tenant_id": tenant_id, "id": {"$in": ids}, "version": {"$exists": False}}, {"$set": {"version": 1}}
+    )
+
+
+async def mark_reset(db, tenant_id: str, collection_name: str) -> None:
+    """Record that a whole collection was replaced (seed data, imports)."""
+    await write_tombstones(db, tenant_id, collection_name, [ALL_DOCUMENTS])
+
+
+async def backfill(db, collection_names: Iterable[str], batch_size: int = 1000) -> Dict[str, int]:
+    """Give documents written before sync existed ``updated_at = created_at`` and version 1."""
+    counts = {}
+    for collection_name in collection_names:
+        collection = db[collection_name]
+        processed = 0
+        batch: List[UpdateOne] = []
+        async for document in collection.find({"updated_at": {"$exists": False}}, {"_id": 1, "created_at": 1}).batch_size(batch_size):
+            batch.append(UpdateOne(
+                {"_id": document["_id"]},
+                {"$set": {"updated_at": document.get("created_at") or now_utc(), "version": 1}},
+            ))
+            if len(batch) >= batch_size:
+                await collection.bulk_write(batch, ordered=False)
+                processed += len(batch)
+                batch = []
+        if batch:
+            await collection.bulk_write(batch, ordered=False)
+            processed += len(batch)
+        counts[collection_name] = processed
+    return counts
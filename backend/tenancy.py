@@ -0,0 +1,269 @@
+import asyncio
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo import UpdateOne, monitoring
+
+from cache import TTLCache
+from metrics import tenant_usage
+
+logger = logging.getLogger(__name__)
+
+TENANTS_COLLECTION = "tenants"
+USAGE_COLLECTION = "tenant_usage"
+USAGE_FLUSH_INTERVAL = float(os.environ.get("TENANT_USAGE_FLUSH_INTERVAL", "30"))
+
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+ACTIVE, SUSPENDED = "active", "suspended"
+
+
+class TenantLimits(NamedTuple):
+    """Per-tenant limits, cluster-wide.
+
+    ``rate``/``burst`` are request tokens per second and bucket size,
+    ``max_concurrency`` the requests handled at once and ``query_budget_ms``
+    the time all Mongo operations of one request may take (sent to the server
+    as maxTimeMS). Each worker enforces its WEB_CONCURRENCY share of the rate
+    and concurrency.
+    """
+    rate: float
+    burst: float
+    max_concurrency: int
+    query_budget_ms: int
+
+
+DEFAULT_LIMITS = TenantLimits(
+    rate=float(os.environ.get("TENANT_RATE_LIMIT", "100")),
+    burst=float(os.environ.get("TENANT_BURST", "200")),
+    max_concurrency=int(os.environ.get("TENANT_MAX_CONCURRENCY", "32")),
+    query_budget_ms=int(os.environ.get("TENANT_QUERY_BUDGET_MS", "5000")),
+)
+# How long a request may wait for one of its tenant's concurrency slots
+QUEUE_TIMEOUT = float(os.environ.get("TENANT_QUEUE_TIMEOUT", "2"))
+
+
+class Tenant(NamedTuple):
+    tenant_id: str
+    status: str
+    limits: TenantLimits
+
+
+class TenantRejected(Exception):
+    """Request refused before reaching the handler."""
+
+    def __init__(self, message: str, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# Tenant of the request being handled. Motor copies the context into its
+# driver threads, so command listeners see it too.
+current_tenant: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_tenant", default=None)
+
+
+def valid_tenant_id(tenant_id: str) -> bool:
+    return bool(TENANT_ID_PATTERN.match(tenant_id))
+
+
+def _workers() -> int:
+    try:
+        return max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+    except ValueError:
+        return 1
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Spend ``cost`` tokens; returns 0, or the seconds until they are available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class TenantLimiter:
+    """Token bucket and concurrency slots for every tenant seen by this worker."""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or _workers()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._limits: Dict[str, TenantLimits] = {}
+
+    def _configure(self, tenant: Tenant) -> None:
+        if self._limits.get(tenant.tenant_id) == tenant.limits:
+            return
+        limits = tenant.limits
+        rate = limits.rate / self.workers
+        self._buckets[tenant.tenant_id] = TokenBucket(rate, max(1.0, limits.burst / self.workers))
+        slots = max(1, limits.max_concurrency // self.workers)
+        self._slots[tenant.tenant_id] = asyncio.Semaphore(slots)
+        self._limits[tenant.tenant_id] = limits
+
+    def check_rate(self, tenant: Tenant, cost: float = 1.0) -> None:
+        self._configure(tenant)
+        wait = self._buckets[tenant.tenant_id].take(cost)
+        if wait:
+            raise TenantRejected("Limite de requisições do tenant excedido", 429, wait)
+
+    async def acquire(self, tenant: Tenant) -> asyncio.Semaphore:
+        self._configure(tenant)
+        slots = self._slots[tenant.tenant_id]
+        try:
+            await asyncio.wait_for(slots.acquire(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TenantRejected("Muitas requisições simultâneas do tenant", 429, 1.0)
+        return slots
+
+
+class TenantDirectory:
+    """Resolves tenants from the ``tenants`` collection, cached per worker.
+
+    A tenant without a document is active with the default limits; a document
+    only needs the fields it overrides, e.g.
+    ``{"tenant_id": "big-client", "limits": {"rate": 300, "max_concurrency": 64}}``.
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        self._cache = TTLCache(maxsize=10000, ttl=ttl)
+
+    async def resolve(self, db, tenant_id: str) -> Tenant:
+        tenant = self._cache.get(tenant_id)
+        if tenant is None:
+            document = await db[TENANTS_COLLECTION].find_one({"tenant_id": tenant_id}, {"_id": 0})
+            tenant = tenant_from_document(tenant_id, document)
+            self._cache.set(tenant_id, tenant)
+        return tenant
+
+    def invalidate(self, tenant_id: str) -> None:
+        self._cache.invalidate(tenant_id)
+
+
+def tenant_from_document(tenant_id: str, document: Optional[Dict[str, Any]]) -> Tenant:
+    if not document:
+        return Tenant(tenant_id, ACTIVE, DEFAULT_LIMITS)
+    overrides = {k: v for k, v in (document.get("limits") or {}).items() if k in TenantLimits._fields}
+    return Tenant(tenant_id, document.get("status", ACTIVE), DEFAULT_LIMITS._replace(**overrides))
+
+
+# -- usage ------------------------------------------------------------------
+
+class UsageRecorder:
+    """Per-tenant, per-day resource counters.
+
+    Accumulated in memory (from request handling and the Mongo command
+    listener, which runs on driver threads), exported on /metrics and added
+    to ``tenant_usage`` by ``flush`` with one upsert per tenant-day.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, tenant_id: str, **amounts: float) -> None:
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        with self._lock:
+            counters = self._pending.setdefault((tenant_id, day), {})
+            for field, amount in amounts.items():
+                counters[field] = counters.get(field, 0) + amount
+        for field, amount in amounts.items():
+            tenant_usage.inc(tenant_id, field, amount=amount)
+
+    async def flush(self, db) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        operations = [
+            UpdateOne(
+                {"tenant_id": tenant_id, "day": day},
+                {"$inc": {field: round(value, 6) for field, value in counters.items()},
+                 "$set": {"updated_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+            for (tenant_id, day), counters in pending.items()
+        ]
+        try:
+            await db[USAGE_COLLECTION].bulk_write(operations, ordered=False)
+        except Exception:
+            # keep the counts for the next flush
+            with self._lock:
+                for key, counters in pending.items():
+                    merged = self._pending.setdefault(key, {})
+                    for field, value in counters.items():
+                        merged[field] = merged.get(field, 0) + value
+            raise
+        return len(operations)
+
+    def start(self, db, interval: float = USAGE_FLUSH_INTERVAL) -> None:
+        async def run():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.flush(db)
+                except Exception as e:
+                    logger.warning("Falha ao gravar uso por tenant: %s", e)
+
+        if self._task is None:
+            self._task = asyncio.create_task(run())
+
+    async def stop(self, db) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush(db)
+        except Exception as e:
+            logger.warning("Falha ao gravar uso por tenant: %s", e)
+
+
+usage = UsageRecorder()
+
+
+class TenantUsageListener(monitoring.CommandListener):
+    """Attributes Mongo time and returned documents to ``current_tenant``."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        tenant_id = current_tenant.get()
+        if tenant_id is None:
+            return
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        returned = len(cursor.get("firstBatch") or cursor.get("nextBatch") or []) if cursor else 0
+        usage.add(tenant_id, mongo_seconds=event.duration_micros / 1e6, mongo_commands=1, documents=returned)
+
+    def failed(self, event):
+        tenant_id = current_tenant.get()
+        if tenant_id is not None:
+            usage.add(tenant_id, mongo_seconds=event.duration_micros / 1e6, mongo_commands=1)
+
+
+async def usage_report(db, tenant_id: str, days: int) -> List[Dict[str, Any]]:
+    since = datetime.fromtimestamp(time.time() - days * 86400, timezone.utc).strftime("%Y-%m-%d")
+    return await db[USAGE_COLLECTION].find(
+        {"tenant_id": tenant_id, "day": {"$gte": since}}, {"_id": 0, "tenant_id": 0}
+    ).sort("day", 1).to_list(days + 1)
@@ -0,0 +1,41 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Tuple
+
+VERSIONS_COLLECTION = "collection_versions"
+
+
+async def bump_version(db, tenant_id: str, collection_name: str) -> None:
+    """Count one more write to a tenant's collection (after it is applied)."""
+    await db[VERSIONS_COLLECTION].update_one(
+        {"tenant_id": tenant_id, "collection": collection_name},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+async def current_version(db, tenant_id: str, collection_name: str) -> int:
+    document = await db[VERSIONS_COLLECTION].find_one(
+        {"tenant_id": tenant_id, "collection": collection_name}, {"_id": 0, "version": 1}
+    )
+    return document["version"] if document else 0
+
+
+def list_etag(version: int, collection_name: str, params: Iterable[Tuple[str, str]]) -> str:
+    """Strong ETag of a list response: the collection version plus the request's query.
+
+    The version changes with every write to the tenant's collection, and the
+    query (tenant, page, cursor, fields, filters) picks the page, so equal
+    tags mean equal bodies.
+    """
+    query = "&".join(f"{name}={value}" for name, value in sorted(params))
+    digest = hashlib.blake2b(f"{collection_name}?{query}".encode(), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 asks for GET)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in tags]
@@ -0,0 +1,263 @@
+import re
+import unicodedata
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import UpdateOne
+
+from rollups import parse_timestamp
+
+ROLLUP_COLLECTION = "waste_rollups"
+MTR_COLLECTION = "waste_mtrs"
+MTR_FIELD = "mtr_key"
+# Set with the MTR key by the backfill run that claimed a record
+CLAIM_FIELD = "_waste_backfill"
+
+# Monthly cube: one document per tenant, month and combination of these
+# fields. Any grouping the API offers is a sum over a handful of cells, so an
+# annual inventory reads at most 12 x (classes x types x destinations x
+# transporters) small documents instead of the raw records.
+DIMENSIONS = ("classification", "waste_type", "destination", "transport_company")
+MEASURES = ("count", "mass_kg", "volume_m3", "unknown_unit")
+
+# Quantities are folded into kilograms (mass) or cubic metres (volume); the
+# two are kept apart because converting needs a density the records do not
+# carry. Unit spellings are accent- and case-folded before the lookup.
+MASS_UNITS = {
+    "g": 0.001, "grama": 0.001, "gramas": 0.001,
+    "kg": 1.0, "kgs": 1.0, "quilo": 1.0, "quilos": 1.0, "quilograma": 1.0, "quilogramas": 1.0,
+    "t": 1000.0, "ton": 1000.0, "tons": 1000.0, "tonelada": 1000.0, "toneladas": 1000.0,
+}
+VOLUME_UNITS = {
+    "l": 0.001, "lt": 0.001, "litro": 0.001, "litros": 0.001,
+    "m3": 1.0, "metrocubico": 1.0, "metroscubicos": 1.0,
+}
+
+MAX_RECONCILIATION_ITEMS = 1000
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.replace("³", "3"))
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def normalize_quantity(quantity: Any, unit: Any) -> Tuple[Optional[str], float]:
+    """``("mass_kg" | "volume_m3", value)``, or ``(None, 0.0)`` for an unknown unit."""
+    try:
+        value = float(quantity)
+    except (TypeError, ValueError):
+        return None, 0.0
+    key = re.sub(r"[\s.]", "", _fold(str(unit or "")))
+    if key in MASS_UNITS:
+        return "mass_kg", value * MASS_UNITS[key]
+    if key in VOLUME_UNITS:
+        return "volume_m3", value * VOLUME_UNITS[key]
+    return None, 0.0
+
+
+def mtr_key(value: Any) -> Optional[str]:
+    """Canonical MTR number: upper case without spaces; None when blank."""
+    key = re.sub(r"\s+", "", str(value or "")).upper()
+    return key or None
+
+
+def add_mtr_keys(collection_name: str, documents: Iterable[Dict[str, Any]]) -> None:
+    """Set the indexed MTR key in place before a write."""
+    if collection_name != "waste_management":
+        return
+    for document in documents:
+        document[MTR_FIELD] = mtr_key(document.get("mtr_number"))
+
+
+def month_of(value: Any) -> Optional[str]:
+    moment = parse_timestamp(value)
+    return moment.strftime("%Y-%m") if moment else None
+
+
+def _accumulate(removed: Iterable[Dict[str, Any]], added: Iterable[Dict[str, Any]]):
+    """Net cube and registry changes of taking ``removed`` out and putting ``added`` in."""
+    cells: Dict[Tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    mtrs: Dict[Tuple[str, str], int] = defaultdict(int)
+    for sign, documents in ((-1, removed), (1, added)):
+        for document in documents:
+            key = mtr_key(document.get("mtr_number"))
+            if key:
+                mtrs[(document["tenant_id"], key)] += sign
+            month = month_of(document.get("collection_date"))
+            if month is None:
+                continue
+            cell = cells[(document["tenant_id"], month) + tuple(str(document.get(d) or "") for d in DIMENSIONS)]
+            cell["count"] += sign
+            measure, value = normalize_quantity(document.get("quantity"), document.get("unit"))
+            cell[measure or "unknown_unit"] += sign * (value if measure else 1)
+    return (
+        {key: {m: v for m, v in cell.items() if v} for key, cell in cells.items() if any(cell.values())},
+        {key: delta for key, delta in mtrs.items() if delta},
+    )
+
+
+async def update_waste_analytics(db, added: Sequence[Dict[str, Any]] = (), removed: Sequence[Dict[str, Any]] = ()) -> int:
+    """Fold written records into the monthly cube and the MTR registry.
+
+    ``removed`` are the previous versions of updated or deleted records. Both
+    sides are netted in memory first, so an update that changes neither the
+    month, dimensions, quantity nor MTR number writes nothing. Records without
+    an MTR key predate the cube (see backfill_waste_analytics) and were never
+    counted, so they are not taken out.
+    """
+    cells, mtrs = _accumulate([document for document in removed if MTR_FIELD in document], added)
+    if cells:
+        await db[ROLLUP_COLLECTION].bulk_write([
+            UpdateOne({"tenant_id": key[0], "month": key[1], **dict(zip(DIMENSIONS, key[2:]))}, {"$inc": increments}, upsert=True)
+            for key, increments in cells.items()
+        ], ordered=False)
+    if mtrs:
+        await db[MTR_COLLECTION].bulk_write([
+            UpdateOne({"tenant_id": tenant_id, MTR_FIELD: key}, {"$inc": {"count": delta}}, upsert=True)
+            for (tenant_id, key), delta in mtrs.items()
+        ], ordered=False)
+    return len(cells) + len(mtrs)
+
+
+async def rebuild_waste_analytics(db, tenant_id: str, batch_size: int = 5000) -> int:
+    """Recompute a tenant's cube, MTR registry and MTR keys from the raw records."""
+    await db[ROLLUP_COLLECTION].delete_many({"tenant_id": tenant_id})
+    await db[MTR_COLLECTION].delete_many({"tenant_id": tenant_id})
+    projection = {"_id": 0, "id": 1, "tenant_id": 1, "collection_date": 1, "quantity": 1, "unit": 1,
+                  "mtr_number": 1, MTR_FIELD: 1, **{d: 1 for d in DIMENSIONS}}
+    cursor = db.waste_management.find({"tenant_id": tenant_id}, projection).batch_size(batch_size)
+    batch, processed = [], 0
+
+    async def flush():
+        stale = [document for document in batch if document.get(MTR_FIELD, False) != mtr_key(document.get("mtr_number"))]
+        if stale:
+            await db.waste_management.bulk_write([
+                UpdateOne({"tenant_id": tenant_id, "id": document["id"]}, {"$set": {MTR_FIELD: mtr_key(document.get("mtr_number"))}})
+                for document in stale
+            ], ordered=False)
+        await update_waste_analytics(db, batch)
+
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await flush()
+            processed += len(batch)
+            batch = []
+    if batch:
+        await flush()
+        processed += len(batch)
+    return processed
+
+
+async def backfill_waste_analytics(db, batch_size: int = 1000) -> int:
+    """Fold records written before the cube existed into it and give them their MTR key.
+
+    Every worker runs this at startup. Each record is claimed by the write of
+    its MTR key (guarded by ``$exists: False``) together with this run's
+    token, and only the records carrying the token are added to the cube, so
+    a record is counted once however many workers race for it.
+    """
+    projection = {"id": 1, "tenant_id": 1, "collection_date": 1, "quantity": 1, "unit": 1,
+                  "mtr_number": 1, **{d: 1 for d in DIMENSIONS}}
+    token = uuid.uuid4().hex
+    processed = 0
+    while True:
+        candidates = await db.waste_management.find({MTR_FIELD: {"$exists": False}}, {"_id": 1, "mtr_number": 1}).limit(batch_size).to_list(None)
+        if not candidates:
+            return processed
+        ids = [d["_id"] for d in candidates]
+        await db.waste_management.bulk_write([
+            UpdateOne({"_id": d["_id"], MTR_FIELD: {"$exists": False}},
+                      {"$set": {MTR_FIELD: mtr_key(d.get("mtr_number")), CLAIM_FIELD: token}})
+            for d in candidates
+        ], ordered=False)
+        claimed = await db.waste_management.find({"_id": {"$in": ids}, CLAIM_FIELD: token}, projection).to_list(None)
+        if claimed:
+            await update_waste_analytics(db, claimed)
+            await db.waste_management.update_many({"_id": {"$in": ids}, CLAIM_FIELD: token}, {"$unset": {CLAIM_FIELD: ""}})
+        processed += len(claimed)
+
+
+def _totals(cells: Iterable[Dict[str, Any]], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    groups: Dict[Tuple, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+    for cell in cells:
+        group = groups[tuple(cell.get(f, "") for f in fields)]
+        for measure in MEASURES:
+            group[measure] += cell.get(measure, 0)
+    rows = []
+    for key, measures in sorted(groups.items()):
+        if measures["count"] <= 0:
+            continue
+        rows.append({**dict(zip(fields, key)), "count": int(measures["count"]), "mass_kg": round(measures["mass_kg"], 3),
+                     "volume_m3": round(measures["volume_m3"], 3), "unknown_unit": int(measures["unknown_unit"])})
+    return rows
+
+
+async def _cells(db, tenant_id: str, start: str, end: str) -> List[Dict[str, Any]]:
+    return await db[ROLLUP_COLLECTION].find(
+        {"tenant_id": tenant_id, "month": {"$gte": start, "$lte": end}, "count": {"$gt": 0}},
+        {"_id": 0, "tenant_id": 0},
+    ).to_list(None)
+
+
+async def monthly_totals(db, tenant_id: str, start: str, end: str, group_by: Sequence[str]) -> Dict[str, Any]:
+    """Totals per month and per ``group_by`` combination between two YYYY-MM months."""
+    cells = await _cells(db, tenant_id, start, end)
+    return {
+        "start": start,
+        "end": end,
+        "group_by": list(group_by),
+        "monthly": _totals(cells, ("month", *group_by)),
+        "totals": _totals(cells, group_by),
+    }
+
+
+async def mtr_summary(db, tenant_id: str) -> Dict[str, int]:
+    duplicated = await db[MTR_COLLECTION].count_documents({"tenant_id": tenant_id, "count": {"$gt": 1}})
+    missing = await db.waste_management.count_documents({"tenant_id": tenant_id, MTR_FIELD: None})
+    return {"duplicated_mtrs": duplicated, "missing_mtr_records": missing}
+
+
+async def annual_inventory(db, tenant_id: str, year: int) -> Dict[str, Any]:
+    """Yearly waste inventory: totals per class, type, destination and transporter."""
+    cells = await _cells(db, tenant_id, f"{year:04d}-01", f"{year:04d}-12")
+    return {
+        "year": year,
+        "totals": _totals(cells, ()),
+        "monthly": _totals(cells, ("month",)),
+        **{f"by_{dimension}": _totals(cells, (dimension,)) for dimension in DIMENSIONS},
+        "by_classification_and_destination": _totals(cells, ("classification", "destination")),
+        "mtr": await mtr_summary(db, tenant_id),
+    }
+
+
+async def reconcile_mtrs(db, tenant_id: str, limit: int = MAX_RECONCILIATION_ITEMS) -> Dict[str, Any]:
+    """Records sharing an MTR number and records without one.
+
+    Duplicates come from the registry's (tenant_id, count) index and missing
+    numbers from the records' (tenant_id, mtr_key) index, so the cost follows
+    the number of problems found, not the size of the tenant.
+    """
+    projection = {"_id": 0, "id": 1, "mtr_number": 1, "waste_type": 1, "collection_date": 1, "transport_company": 1}
+    registry = await db[MTR_COLLECTION].find(
+        {"tenant_id": tenant_id, "count": {"$gt": 1}}, {"_id": 0, MTR_FIELD: 1, "count": 1}
+    ).sort(MTR_FIELD, 1).limit(limit).to_list(None)
+    records: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    if registry:
+        async for document in db.waste_management.find(
+            {"tenant_id": tenant_id, MTR_FIELD: {"$in": [entry[MTR_FIELD] for entry in registry]}},
+            {**projection, MTR_FIELD: 1},
+        ):
+            records[document.pop(MTR_FIELD)].append(document)
+    missing = await db.waste_management.find(
+        {"tenant_id": tenant_id, MTR_FIELD: None}, projection
+    ).sort("collection_date", 1).limit(limit).to_list(None)
+    return {
+        "duplicates": [
+            {"mtr_number": entry[MTR_FIELD], "count": entry["count"], "records": records.get(entry[MTR_FIELD], [])}
+            for entry in registry
+        ],
+        "missing": missing,
+        **await mtr_summary(db, tenant_id),
+    }
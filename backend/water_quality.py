@@ -0,0 +1,191 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from sync import touch
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+SETTINGS_COLLECTION = "water_quality_settings"
+
+PARAMETERS = ["ph_level", "turbidity", "dissolved_oxygen", "temperature", "conductivity"]
+
+STATUS_NORMAL = "Normal"
+STATUS_ATTENTION = "Atenção"
+STATUS_CRITICAL = "Crítico"
+
+# CONAMA 357/2005 limits for fresh water (and CONAMA 430/2011 for effluents),
+# as (minimum, maximum); None means the resolution sets no limit.
+CONAMA_LIMITS: Dict[str, Dict[str, Tuple[Optional[float], Optional[float]]]] = {
+    "Classe 1": {"ph_level": (6.0, 9.0), "dissolved_oxygen": (6.0, None), "turbidity": (None, 40.0)},
+    "Classe 2": {"ph_level": (6.0, 9.0), "dissolved_oxygen": (5.0, None), "turbidity": (None, 100.0)},
+    "Classe 3": {"ph_level": (6.0, 9.0), "dissolved_oxygen": (4.0, None), "turbidity": (None, 100.0)},
+    "Classe 4": {"ph_level": (6.0, 9.0), "dissolved_oxygen": (2.0, None)},
+    "Efluente": {"ph_level": (5.0, 9.0), "temperature": (None, 40.0)},
+}
+
+DEFAULT_CLASS = "Classe 2"
+
+# Rolling mean over the last N samples of a station must also respect the limits
+ROLLING_WINDOW = 5
+# A sample more than TREND_Z standard deviations away from the previous
+# TREND_WINDOW samples of the same station counts as a trend break
+TREND_WINDOW = 10
+TREND_Z = 3.0
+# Earlier readings of a station a batch needs to see for both windows
+CONTEXT_ROWS = max(ROLLING_WINDOW - 1, TREND_WINDOW)
+
+WRITE_CHUNK_SIZE = 1000
+
+
+def resolve_limits(settings: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Tuple[Optional[float], Optional[float]]]]:
+    limits = {water_class: dict(params) for water_class, params in CONAMA_LIMITS.items()}
+    for water_class, params in ((settings or {}).get("overrides") or {}).items():
+        limits.setdefault(water_class, {}).update({p: tuple(bounds) for p, bounds in params.items()})
+    return limits
+
+
+def _bounds(classes: "pd.Series", limits, parameter: str) -> Tuple["np.ndarray", "np.ndarray"]:
+    # NaN bounds never compare true, so parameters without a limit never flag
+    low = {c: (p.get(parameter) or (None, None))[0] for c, p in limits.items()}
+    high = {c: (p.get(parameter) or (None, None))[1] for c, p in limits.items()}
+    return (
+        classes.map(low).astype(float).to_numpy(),
+        classes.map(high).astype(float).to_numpy(),
+    )
+
+
+def evaluate_frame(frame: "pd.DataFrame", settings: Optional[Dict[str, Any]] = None,
+                   rolling: bool = True) -> "pd.DataFrame":
+    """Evaluate readings for every station at once.
+
+    ``frame`` needs ``location``, ``collection_date`` and the parameter columns.
+    Returns ``frame`` sorted by station and time with ``water_class``,
+    ``status`` and ``exceedances`` columns added. Instant exceedances make a
+    reading critical; rolling-window violations and trend breaks mark it for
+    attention.
+    """
+    # pandas/numpy load on the first evaluation rather than with the server
+    import numpy as np
+    import pandas as pd
+
+    settings = settings or {}
+    limits = resolve_limits(settings)
+    frame = frame.copy()
+    frame["_ts"] = pd.to_datetime(frame["collection_date"], format="ISO8601", errors="coerce", utc=True)
+    frame = frame.sort_values(["location", "_ts"], kind="stable").reset_index(drop=True)
+    location_classes = settings.get("location_classes") or {}
+    frame["water_class"] = frame["location"].map(location_classes).fillna(settings.get("default_class") or DEFAULT_CLASS)
+
+    n = len(frame)
+    exceeded = np.zeros((n, len(PARAMETERS)), dtype=bool)
+    attention = np.zeros(n, dtype=bool)
+
+    for column, parameter in enumerate(PARAMETERS):
+        if parameter not in frame:
+            continue
+        values = pd.to_numeric(frame[parameter], errors="coerce")
+        low, high = _bounds(frame["water_class"], limits, parameter)
+        array = values.to_numpy(dtype=float)
+        exceeded[:, column] = (array < low) | (array > high)
+
+        if not rolling:
+            continue
+        grouped = values.groupby(frame["location"], sort=False)
+        window_mean = grouped.rolling(ROLLING_WINDOW, min_periods=ROLLING_WINDOW).mean().reset_index(level=0, drop=True).sort_index().to_numpy()
+        attention |= (window_mean < low) | (window_mean > high)
+
+        previous = grouped.shift(1).groupby(frame["location"], sort=False)
+        prior_mean = previous.rolling(TREND_WINDOW, min_periods=TREND_WINDOW).mean().reset_index(level=0, drop=True).sort_index().to_numpy()
+        prior_std = previous.rolling(TREND_WINDOW, min_periods=TREND_WINDOW).std().reset_index(level=0, drop=True).sort_index().to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = np.abs(array - prior_mean) / prior_std
+        attention |= np.nan_to_num(z, nan=0.0) > TREND_Z
+
+    critical = exceeded.any(axis=1)
+    frame["status"] = np.where(critical, STATUS_CRITICAL, np.where(attention, STATUS_ATTENTION, STATUS_NORMAL))
+    names = np.array(PARAMETERS, dtype=object)
+    exceedances = [[] for _ in range(n)]
+    for row in np.flatnonzero(critical):
+        exceedances[row] = names[exceeded[row]].tolist()
+    frame["exceedances"] = exceedances
+    return frame.drop(columns="_ts")
+
+
+def evaluate_readings(readings: List[Dict[str, Any]], settings: Optional[Dict[str, Any]] = None) -> None:
+    """Set ``status``/``exceedances`` in place on freshly ingested readings.
+
+    Only instant limits apply here; rolling and trend checks need station
+    history and run in :func:`reevaluate_tenant`.
+    """
+    if not readings:
+        return
+    import numpy as np
+    import pandas as pd
+
+    frame = pd.DataFrame(readings, columns=["location", "collection_date", *PARAMETERS])
+    frame["_row"] = np.arange(len(readings))
+    result = evaluate_frame(frame, settings, rolling=False)
+    for row, status, exceedances in zip(result["_row"], result["status"], result["exceedances"]):
+        readings[row]["status"] = status
+        readings[row]["exceedances"] = exceedances
+
+
+async def load_settings(db, tenant_id: str) -> Dict[str, Any]:
+    return await db[SETTINGS_COLLECTION].find_one({"tenant_id": tenant_id}, {"_id": 0}) or {"tenant_id": tenant_id}
+
+
+async def reevaluate_tenant(db, tenant_id: str, batch_size: int = 5000) -> Dict[str, int]:
+    """Re-evaluate a tenant's full history and persist only changed verdicts.
+
+    Stations are read one at a time in collection order, ``batch_size``
+    readings per round. Each batch is evaluated behind the last CONTEXT_ROWS
+    readings of the one before, so rolling and trend windows span batches
+    while memory stays bounded by the batch.
+    """
+    settings = await load_settings(db, tenant_id)
+    projection = {"location": 1, "collection_date": 1, "status": 1, "exceedances": 1, **{p: 1 for p in PARAMETERS}}
+    evaluated = changed = 0
+    for location in await db.water_monitoring.distinct("location", {"tenant_id": tenant_id}):
+        cursor = (db.water_monitoring.find({"tenant_id": tenant_id, "location": location}, projection)
+                  .sort("collection_date", 1).batch_size(batch_size))
+        context: List[Dict[str, Any]] = []
+        batch: List[Dict[str, Any]] = []
+        async for row in cursor:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                changed += await _reevaluate_batch(db, settings, context, batch)
+                evaluated += len(batch)
+                context, batch = (context + batch)[-CONTEXT_ROWS:], []
+        if batch:
+            changed += await _reevaluate_batch(db, settings, context, batch)
+            evaluated += len(batch)
+    return {"evaluated": evaluated, "changed": changed}
+
+
+async def _reevaluate_batch(db, settings: Dict[str, Any], context: List[Dict[str, Any]], batch: List[Dict[str, Any]]) -> int:
+    import numpy as np
+    import pandas as pd
+
+    frame = pd.DataFrame(context + batch)
+    previous_status = frame.get("status", pd.Series([None] * len(frame))).copy()
+    previous_exceedances = frame.get("exceedances", pd.Series([None] * len(frame))).copy()
+    frame = frame.assign(_previous_status=previous_status, _previous_exceedances=previous_exceedances,
+                         _context=np.arange(len(frame)) < len(context))
+    result = evaluate_frame(frame.drop(columns=["status", "exceedances"], errors="ignore"), settings)
+
+    changed_mask = (result["status"] != result["_previous_status"]).to_numpy() | np.array([
+        old != new for old, new in zip(result["_previous_exceedances"], result["exceedances"])
+    ], dtype=bool)
+    # context rows were written by the previous batch
+    changed = result.loc[changed_mask & ~result["_context"].to_numpy(dtype=bool), ["_id", "status", "exceedances"]]
+
+    operations = [
+        UpdateOne({"_id": _id}, touch({"$set": {"status": status, "exceedances": exceedances}}))
+        for _id, status, exceedances in changed.itertuples(index=False, name=None)
+    ]
+    for start in range(0, len(operations), WRITE_CHUNK_SIZE):
+        await db.water_monitoring.bulk_write(operations[start:start + WRITE_CHUNK_SIZE], ordered=False)
+    return len(operations)
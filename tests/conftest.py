@@ -0,0 +1,66 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py reads these at import; tests inject a mongomock-motor client
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "gaia_test")
+os.environ.setdefault("DEADLINE_SCHEDULER_ENABLED", "false")
+# the compliance view aggregates with $unionWith, which mongomock lacks
+os.environ.setdefault("COMPLIANCE_REFRESH_INTERVAL", "3600")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def api():
+    """A client for the app running its lifespan on a fresh mongomock database."""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+
+    server.use_client(AsyncMongoMockClient())
+    async with server.lifespan(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
+
+
+@pytest.fixture
+def tenant_id():
+    # limiter buckets, tenant limits and caches live in the server module
+    # across tests; a fresh tenant per test keeps them apart
+    return f"t-{uuid.uuid4().hex[:12]}"
+
+
+def license_data(tenant_id: str, **fields):
+    return {
+        "number": "LO-001/2024", "type": "LO", "title": "Licença de Operação", "company": "Mineração Serra Azul",
+        "cnpj": "12.345.678/0001-90", "status": "Ativa", "issue_date": "2024-01-10", "expiry_date": "2030-01-10",
+        "issuing_body": "CETESB", "activity_type": "Mineração", "tenant_id": tenant_id, **fields,
+    }
+
+
+def waste_data(tenant_id: str, **fields):
+    return {
+        "waste_type": "Classe II A", "classification": "Não perigoso", "quantity": 120.0, "unit": "kg",
+        "destination": "Aterro sanitário", "collection_date": "2024-07-01", "transport_company": "Transportes Verdes",
+        "mtr_number": "MTR-0001", "status": "Coletado", "tenant_id": tenant_id, **fields,
+    }
+
+
+def reading_data(**fields):
+    return {
+        "location": "Poço 1", "collection_date": "2024-06-01T10:00:00", "ph_level": 7.0, "turbidity": 10.0,
+        "dissolved_oxygen": 7.5, "temperature": 22.0, "conductivity": 300.0, **fields,
+    }
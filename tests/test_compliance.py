@@ -0,0 +1,52 @@
+import pytest
+
+from compliance import SCORED_COLLECTIONS, SCORE_FIELDS
+from dashboard import DASHBOARD_COLLECTIONS
+from tests.conftest import license_data, waste_data
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def computed(api):
+    """Counts per collection in place of the $unionWith aggregation, which mongomock lacks."""
+    import server
+
+    calls = []
+
+    async def compute(db, tenant_id):
+        calls.append(tenant_id)
+        totals = {name: await db[name].count_documents({"tenant_id": tenant_id}) for name in DASHBOARD_COLLECTIONS}
+        return {field: 0 for field in SCORE_FIELDS} | {
+            "licenses_total": totals["licenses"], "waste_total": totals["waste_management"],
+        }
+
+    server.compliance_scores.compute = compute
+    return calls
+
+
+async def dashboard(api, tenant_id):
+    response = await api.get("/api/dashboard/stats", params={"tenant_id": tenant_id})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_every_dashboard_collection_is_scored():
+    assert SCORED_COLLECTIONS == set(DASHBOARD_COLLECTIONS)
+
+
+async def test_write_shows_on_the_next_dashboard_read(api, tenant_id, computed):
+    assert (await dashboard(api, tenant_id))["waste_total"] == 0
+
+    response = await api.post("/api/waste", json=waste_data(tenant_id))
+    assert response.status_code == 200, response.text
+    assert (await dashboard(api, tenant_id))["waste_total"] == 1
+
+    await api.post("/api/licenses", json=license_data(tenant_id))
+    assert (await dashboard(api, tenant_id))["licenses_total"] == 1
+
+
+async def test_unchanged_tenant_is_served_from_the_view(api, tenant_id, computed):
+    await dashboard(api, tenant_id)
+    await dashboard(api, tenant_id)
+    assert computed == [tenant_id]
@@ -0,0 +1,27 @@
+import pytest
+
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_not_modified_keeps_the_encoded_etag(api, tenant_id):
+    for number in range(5):
+        await api.post("/api/licenses", json=license_data(tenant_id, number=f"LO-{number:03d}/2024"))
+    params = {"tenant_id": tenant_id}
+
+    full = await api.get("/api/licenses", params=params, headers={"Accept-Encoding": "gzip"})
+    assert full.headers["Content-Encoding"] == "gzip"
+    etag = full.headers["ETag"]
+    assert etag.endswith('-gzip"')
+
+    cached = await api.get("/api/licenses", params=params, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    # without compression the client holds the identity representation
+    plain = await api.get("/api/licenses", params=params, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    cached = await api.get("/api/licenses", params=params,
+                           headers={"Accept-Encoding": "identity", "If-None-Match": plain.headers["ETag"]})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == plain.headers["ETag"]
@@ -0,0 +1,70 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from dashboard import DASHBOARD_COLLECTIONS, _branch, build_stats_pipeline, summarize
+
+pytestmark = pytest.mark.anyio
+
+TODAY = "2024-06-30"
+T = "t-dashboard"
+
+DOCUMENTS = {
+    "licenses": [{"status": "Ativa"}, {"status": "Ativa"}, {"status": "Cancelada"}, {"status": "Vencida"}],
+    "inspections": [
+        {"status": "Concluída", "scheduled_date": "2024-05-01", "conformity_percentage": 80},
+        {"status": "Concluída", "scheduled_date": "2024-02-01", "conformity_percentage": 60},
+        {"status": "Agendada", "scheduled_date": "2024-07-10"},
+    ],
+    "water_monitoring": [
+        {"status": "Normal", "collection_date": "2024-06-01"},
+        {"status": "Alerta", "collection_date": "2024-06-02"},
+        {"status": "Alerta", "collection_date": "2023-01-01"},
+    ],
+    "commitments": [
+        {"status": "Pendente", "due_date": "2024-01-01", "progress": 40},
+        {"status": "Pendente", "due_date": "2025-01-01", "progress": 60},
+    ],
+}
+
+
+async def facets(db):
+    """Runs the pipeline with the union done by hand: mongomock lacks $unionWith."""
+    pipeline = build_stats_pipeline(T, TODAY)
+    rows = []
+    for collection in DASHBOARD_COLLECTIONS:
+        rows += await db[collection].aggregate(_branch(collection, T, TODAY)).to_list(None)
+    if rows:
+        await db.union.insert_many(rows)
+    return (await db.union.aggregate([pipeline[-1]]).to_list(1))[0]
+
+
+def test_one_aggregation_unions_every_collection():
+    pipeline = build_stats_pipeline(T, TODAY)
+    unions = [stage["$unionWith"]["coll"] for stage in pipeline if "$unionWith" in stage]
+    assert unions == DASHBOARD_COLLECTIONS[1:]
+    assert "$facet" in pipeline[-1]
+
+
+async def test_scores_from_the_aggregated_counts():
+    db = AsyncMongoMockClient()["dashboard"]
+    for collection, documents in DOCUMENTS.items():
+        await db[collection].insert_many([{**document, "tenant_id": T} for document in documents])
+    await db.licenses.insert_one({"status": "Ativa", "tenant_id": "other"})
+
+    stats = summarize(await facets(db))
+
+    assert stats["licenses_total"] == 4
+    assert stats["licenses_active"] == 2
+    assert stats["water_alerts"] == 2
+    assert stats["commitments_overdue"] == 1
+    assert stats["compliance_components"] == {"licenses": 66.7, "inspections": 70.0, "commitments": 50.0, "water": 50.0}
+    assert stats["compliance_score"] == 61.8
+    assert stats["inspection_conformity_trend"] == 20.0
+    assert stats["esg_score"] == 57.9
+
+
+def test_empty_tenant_scores_zero():
+    stats = summarize({})
+    assert stats["licenses_total"] == 0
+    assert stats["compliance_score"] == stats["esg_score"] == 0.0
+    assert stats["inspection_conformity_trend"] is None
@@ -0,0 +1,117 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import events
+from events import DELETE, INSERT, RESET, UPDATE, EventBus, Subscription, sse_message
+from sync import ALL_DOCUMENTS, TOMBSTONE_COLLECTION, write_tombstones
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+
+def drain(subscription):
+    received = []
+    while not subscription.queue.empty():
+        received.append(subscription.queue.get_nowait())
+    return [(e.tenant_id, e.collection, e.operation, e.ids) for e in received]
+
+
+def tombstone_change(tenant_id, collection, doc_id):
+    return {
+        "operationType": "insert",
+        "ns": {"coll": TOMBSTONE_COLLECTION},
+        "fullDocument": {"_id": 1, "tenant_id": tenant_id, "collection": collection, "id": doc_id},
+    }
+
+
+async def test_subscribers_get_only_their_tenant_and_modules():
+    bus = EventBus()
+    everything = bus.subscribe("a")
+    licenses = bus.subscribe("a", ["licenses"])
+    other = bus.subscribe("b")
+
+    bus.publish_local("a", "licenses", INSERT, ["L1"])
+    bus.publish_local("a", "projects", UPDATE, ["P1"])
+
+    assert drain(everything) == [("a", "licenses", INSERT, ("L1",)), ("a", "projects", UPDATE, ("P1",))]
+    assert drain(licenses) == [("a", "licenses", INSERT, ("L1",))]
+    assert drain(other) == []
+
+    bus.unsubscribe(other)
+    assert bus.subscriber_count() == 2
+
+
+async def test_overflow_replaces_the_backlog_with_a_reset():
+    subscription = Subscription("a", maxsize=2)
+    bus = EventBus()
+    for doc_id in ("1", "2", "3"):
+        subscription.put(bus.event("a", "licenses", INSERT, [doc_id]))
+
+    assert drain(subscription) == [("a", "licenses", RESET, ())]
+
+
+async def test_change_stream_deletes_reach_subscribers_from_the_tombstone():
+    bus = EventBus()
+    bus.mode = "changestream"
+    seen = []
+    bus.add_listener(seen.append)
+    subscription = bus.subscribe("a")
+
+    # the local announcement updates caches only; the stream delivers it
+    bus.publish_local("a", "licenses", DELETE, ["L1"])
+    assert drain(subscription) == []
+    bus.publish(bus._from_change(tombstone_change("a", "licenses", "L1")))
+    bus.publish(bus._from_change(tombstone_change("a", "licenses", ALL_DOCUMENTS)))
+
+    assert drain(subscription) == [("a", "licenses", DELETE, ("L1",)), ("a", "licenses", RESET, ())]
+    assert [e.tenant_id for e in seen] == ["a", "a", "a"]
+
+
+async def test_poller_announces_other_workers_deletes(api, tenant_id, monkeypatch):
+    import server
+
+    monkeypatch.setattr(events, "SETTLE_SECONDS", 0)
+    bus = EventBus()
+    subscription = bus.subscribe(tenant_id)
+    start = (datetime.now(timezone.utc) - timedelta(minutes=1), None)
+
+    bus.publish_local(tenant_id, "licenses", DELETE, ["MINE"])
+    await write_tombstones(server.db, tenant_id, "licenses", ["MINE", "THEIRS"])
+    position = await bus._poll_tombstones(server.db, start)
+
+    # MINE comes from the local announcement only, not again from the poller
+    assert drain(subscription) == [(tenant_id, "licenses", DELETE, ("MINE",)), (tenant_id, "licenses", DELETE, ("THEIRS",))]
+    assert await bus._poll_tombstones(server.db, position) == position
+    assert drain(subscription) == []
+
+
+async def test_api_delete_is_streamed(api, tenant_id):
+    import server
+
+    subscription = server.event_bus.subscribe(tenant_id, ["licenses"])
+    try:
+        created = (await api.post("/api/licenses", json=license_data(tenant_id))).json()
+        await api.delete(f"/api/licenses/{created['id']}", params={"tenant_id": tenant_id})
+        received = drain(subscription)
+    finally:
+        server.event_bus.unsubscribe(subscription)
+
+    assert received == [(tenant_id, "licenses", INSERT, (created["id"],)), (tenant_id, "licenses", DELETE, (created["id"],))]
+
+
+async def test_sse_frame_carries_the_document(api, tenant_id):
+    import server
+
+    created = (await api.post("/api/licenses", json=license_data(tenant_id))).json()
+    stored = await server.db.licenses.find_one({"id": created["id"]}, {"_id": 0})
+    event = server.event_bus.event(tenant_id, "licenses", UPDATE, [created["id"]], stored)
+
+    frame = sse_message(event, server.event_payload(event))
+    header, data = frame.decode().rstrip("\n").rsplit("\n", 1)
+    assert header == f"id: {event.seq}\nevent: update"
+    payload = json.loads(data.removeprefix("data: "))
+    assert payload["ids"] == [created["id"]]
+    assert payload["document"]["title"] == created["title"]
+    assert "search_keys" not in payload["document"]
@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from evidence import BLOBS_COLLECTION, EVIDENCE_COLLECTION, RangeNotSatisfiable, parse_range
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = b"relatorio de vistoria " * 100
+
+
+@pytest.fixture
+async def service(api, tmp_path, monkeypatch):
+    """The evidence service storing under a scratch directory, analyzing on a thread instead of a process."""
+    import server
+    from evidence import DiskStorage
+
+    service = server.evidence_service
+    (tmp_path / "staging").mkdir()
+    monkeypatch.setattr(service, "storage", DiskStorage(tmp_path / "blobs"))
+    monkeypatch.setattr(service, "staging_dir", tmp_path / "staging")
+    monkeypatch.setattr(service, "_executor", lambda: None)
+    return service
+
+
+@pytest.fixture
+async def inspection_id(api, tenant_id):
+    response = await api.post("/api/inspections", json={
+        "title": "Vistoria de campo", "location": "Área 1", "scheduled_date": "2024-06-01", "inspector": "Ana",
+        "status": "Agendada", "tenant_id": tenant_id,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+async def open_upload(api, tenant_id, inspection_id, **fields):
+    response = await api.post(f"/api/inspections/{inspection_id}/evidence/uploads", params={"tenant_id": tenant_id},
+                              json={"filename": "laudo.txt", "size": len(CONTENT), **fields})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+async def send(api, tenant_id, upload_id, offset, data):
+    return await api.patch(f"/api/evidence/uploads/{upload_id}", params={"tenant_id": tenant_id},
+                           headers={"Upload-Offset": str(offset)}, content=data)
+
+
+async def upload(api, tenant_id, inspection_id, service):
+    upload_id = (await open_upload(api, tenant_id, inspection_id))["id"]
+    assert (await send(api, tenant_id, upload_id, 0, CONTENT)).status_code == 200
+    await asyncio.gather(*service._tasks)
+    return (await api.get(f"/api/evidence/uploads/{upload_id}", params={"tenant_id": tenant_id})).json()
+
+
+async def refs(service, tenant_id):
+    blob = await service.db[BLOBS_COLLECTION].find_one({"tenant_id": tenant_id})
+    return blob["refs"] if blob else 0
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=90-500", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=-500", 100) == (0, 99)
+    # several ranges, other units and garbage get the whole file
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    assert parse_range("bytes=a-b", 100) is None
+    for header in ("bytes=100-", "bytes=10-5", "bytes=-0"):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range(header, 100)
+
+
+async def test_chunks_must_continue_at_the_stored_offset(api, tenant_id, inspection_id, service):
+    upload_id = (await open_upload(api, tenant_id, inspection_id))["id"]
+    half = len(CONTENT) // 2
+
+    first = await send(api, tenant_id, upload_id, 0, CONTENT[:half])
+    assert first.status_code == 200
+    assert first.headers["Upload-Offset"] == str(half)
+    # a retried chunk, and one skipping ahead, are told where to continue
+    for offset in (0, half + 10):
+        stale = await send(api, tenant_id, upload_id, offset, CONTENT[half:])
+        assert stale.status_code == 409
+        assert stale.headers["Upload-Offset"] == str(half)
+    too_long = await send(api, tenant_id, upload_id, half, CONTENT[half:] + b"x")
+    assert too_long.status_code == 413
+
+    last = await send(api, tenant_id, upload_id, half, CONTENT[half:])
+    assert last.json()["status"] == "processing"
+    await asyncio.gather(*service._tasks)
+    evidence_id = (await api.get(f"/api/evidence/uploads/{upload_id}", params={"tenant_id": tenant_id})).json()["evidence_id"]
+    content = await api.get(f"/api/evidence/{evidence_id}/content", params={"tenant_id": tenant_id},
+                            headers={"Range": "bytes=0-9"})
+    assert content.status_code == 206
+    assert content.content == CONTENT[:10]
+
+
+async def test_identical_content_is_stored_once_and_counted(api, tenant_id, inspection_id, service, tmp_path):
+    first = await upload(api, tenant_id, inspection_id, service)
+    second = await upload(api, tenant_id, inspection_id, service)
+    assert (first["duplicate"], second["duplicate"]) == (False, True)
+    # a known digest completes without sending the bytes
+    third = await open_upload(api, tenant_id, inspection_id, sha256=hashlib.sha256(CONTENT).hexdigest())
+    assert third["status"] == "complete"
+    assert await refs(service, tenant_id) == 3
+
+    for done in (first, second):
+        await api.delete(f"/api/evidence/{done['evidence_id']}", params={"tenant_id": tenant_id})
+    assert await refs(service, tenant_id) == 1
+    await api.delete(f"/api/evidence/{third['evidence_id']}", params={"tenant_id": tenant_id})
+    assert await refs(service, tenant_id) == 0
+    assert not any(path.is_file() for path in (tmp_path / "blobs").rglob("*"))
+
+
+class FailingEvidenceCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert_one(self, document):
+        raise RuntimeError("falha de escrita")
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+class FailingEvidenceDatabase:
+    def __init__(self, db):
+        self.db = db
+
+    def __getitem__(self, name):
+        collection = self.db[name]
+        return FailingEvidenceCollection(collection) if name == EVIDENCE_COLLECTION else collection
+
+
+async def test_failed_attach_gives_the_reference_back(api, tenant_id, inspection_id, service, monkeypatch):
+    await upload(api, tenant_id, inspection_id, service)
+    monkeypatch.setattr(service, "db", FailingEvidenceDatabase(service.db))
+
+    with pytest.raises(RuntimeError):
+        await service.create_upload(tenant_id, inspection_id, "laudo.txt", None, len(CONTENT),
+                                    sha256=hashlib.sha256(CONTENT).hexdigest())
+    assert await refs(service, tenant_id) == 1
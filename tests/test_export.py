@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+
+import pytest
+
+from export import stream_csv
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+
+async def export(api, tenant_id, **params):
+    response = await api.get("/api/licenses/export", params={"tenant_id": tenant_id, **params})
+    assert response.status_code == 200, response.text
+    return response
+
+
+async def test_ndjson_export_streams_every_document_in_page_order(api, tenant_id):
+    numbers = [f"LO-{n:03d}/2024" for n in range(3)]
+    for number in numbers:
+        await api.post("/api/licenses", json=license_data(tenant_id, number=number, description="Descrição longa"))
+    await api.post("/api/licenses", json=license_data(tenant_id + "-b"))
+
+    response = await export(api, tenant_id)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert f'filename="licenses-{tenant_id}.ndjson"' in response.headers["content-disposition"]
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["number"] for row in rows] == numbers
+    # exports carry the full document, summary excludes do not apply
+    assert rows[0]["description"] == "Descrição longa"
+    assert "_id" not in rows[0] and "search_keys" not in rows[0]
+
+
+async def test_csv_export_selects_fields(api, tenant_id):
+    await api.post("/api/licenses", json=license_data(tenant_id, title="Licença, \"especial\""))
+
+    response = await export(api, tenant_id, format="csv", fields="number,title")
+    assert response.content.startswith("\ufeff".encode())
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert rows[0] == ["id", "number", "title", "created_at"]
+    assert rows[1][1:3] == ["LO-001/2024", 'Licença, "especial"']
+
+    unknown = await api.get("/api/licenses/export", params={"tenant_id": tenant_id, "fields": "nope"})
+    assert unknown.status_code == 400
+
+
+async def test_csv_batches_flush_as_they_fill():
+    async def cursor():
+        for n in range(5):
+            yield {"n": n, "tags": ["a", "b"] if n == 0 else None}
+
+    chunks = [chunk async for chunk in stream_csv(cursor(), ["n", "tags"], batch_size=2)]
+    assert len(chunks) == 3
+    text = b"".join(chunks).decode("utf-8-sig")
+    assert text.splitlines() == ["n,tags", '0,"[""a"", ""b""]"', "1,", "2,", "3,", "4,"]
@@ -0,0 +1,42 @@
+import pytest
+
+from server import License, readers
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+
+async def licenses(api, tenant_id, **params):
+    return await api.get("/api/licenses", params={"tenant_id": tenant_id, **params})
+
+
+async def test_lists_leave_bulky_fields_out_by_default(api, tenant_id):
+    await api.post("/api/licenses", json=license_data(tenant_id, description="Texto longo"))
+
+    summary = (await licenses(api, tenant_id)).json()[0]
+    assert "description" not in summary
+    assert set(summary) == set(License.model_fields) - {"description"}
+
+    full = (await licenses(api, tenant_id, fields="*")).json()[0]
+    assert full["description"] == "Texto longo"
+    detail = (await api.get(f"/api/licenses/{full['id']}", params={"tenant_id": tenant_id})).json()
+    assert detail == full
+
+
+async def test_sparse_fieldset_keeps_the_cursor_fields(api, tenant_id):
+    await api.post("/api/licenses", json=license_data(tenant_id))
+
+    rows = (await licenses(api, tenant_id, fields="number, status")).json()
+    assert set(rows[0]) == {"id", "created_at", "number", "status"}
+
+    unknown = await licenses(api, tenant_id, fields="number,senha")
+    assert unknown.status_code == 400
+    assert "senha" in unknown.json()["detail"]
+
+
+def test_missing_optional_fields_get_the_model_default():
+    reader = readers["licenses"]
+    document = reader.fill({"id": "x"})
+    assert document["description"] == License.model_fields["description"].default
+    # filling a sparse fieldset adds nothing that was not asked for
+    assert reader.fill_all([{"id": "x"}], ("id", "number")) == [{"id": "x"}]
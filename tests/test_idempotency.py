@@ -0,0 +1,79 @@
+import pytest
+
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+
+async def count_licenses(api, tenant_id):
+    return len((await api.get("/api/licenses", params={"tenant_id": tenant_id})).json())
+
+
+async def test_retry_replays_the_stored_response(api, tenant_id):
+    headers = {"Idempotency-Key": "create-1"}
+    first = await api.post("/api/licenses", json=license_data(tenant_id), headers=headers)
+    retry = await api.post("/api/licenses", json=license_data(tenant_id), headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert await count_licenses(api, tenant_id) == 1
+
+
+async def test_key_reused_for_another_request_is_rejected(api, tenant_id):
+    headers = {"Idempotency-Key": "create-1"}
+    await api.post("/api/licenses", json=license_data(tenant_id), headers=headers)
+    other = await api.post("/api/licenses", json=license_data(tenant_id, number="LO-999/2024"), headers=headers)
+
+    assert other.status_code == 422
+    assert await count_licenses(api, tenant_id) == 1
+
+
+async def test_keys_are_scoped_per_tenant(api, tenant_id):
+    other = tenant_id + "-b"
+    headers = {"Idempotency-Key": "create-1"}
+    first = await api.post("/api/licenses", json=license_data(tenant_id), headers=headers)
+    second = await api.post("/api/licenses", json=license_data(other), headers=headers)
+
+    assert second.status_code == 200
+    assert "Idempotent-Replayed" not in second.headers
+    assert second.json()["id"] != first.json()["id"]
+
+
+async def test_failed_request_can_be_retried(api, tenant_id):
+    headers = {"Idempotency-Key": "edit-1"}
+    params = {"tenant_id": tenant_id}
+    missing = await api.patch("/api/licenses/nope", params=params, json={"title": "x"}, headers=headers)
+    assert missing.status_code == 404
+
+    created = await api.post("/api/licenses", json=license_data(tenant_id))
+    license_id = created.json()["id"]
+    # the failed attempt released its key instead of pinning the 404
+    retry = await api.patch("/api/licenses/nope", params=params, json={"title": "x"}, headers=headers)
+    assert retry.status_code == 404
+    assert "Idempotent-Replayed" not in retry.headers
+
+    edit = await api.patch(f"/api/licenses/{license_id}", params=params, json={"title": "Nova"}, headers={"Idempotency-Key": "edit-2"})
+    replay = await api.patch(f"/api/licenses/{license_id}", params=params, json={"title": "Nova"}, headers={"Idempotency-Key": "edit-2"})
+    assert edit.json()["version"] == replay.json()["version"] == 2
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+async def test_key_left_pending_is_taken_over_after_its_lease(api, tenant_id, monkeypatch):
+    import idempotency
+    import server
+
+    headers = {"Idempotency-Key": "create-1"}
+    body = license_data(tenant_id)
+    await api.post("/api/licenses", json=body, headers=headers)
+    # the worker running the first attempt died before storing the response
+    await server.db.idempotency_keys.update_one({"tenant_id": tenant_id}, {"$set": {"state": idempotency.PENDING}})
+    await server.db.licenses.delete_many({"tenant_id": tenant_id})
+
+    assert (await api.post("/api/licenses", json=body, headers=headers)).status_code == 409
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LEASE_SECONDS", 0)
+    retry = await api.post("/api/licenses", json=body, headers=headers)
+    assert retry.status_code == 200
+    assert "Idempotent-Replayed" not in retry.headers
+    assert await count_licenses(api, tenant_id) == 1
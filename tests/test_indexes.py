@@ -0,0 +1,120 @@
+import os
+import uuid
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import OperationFailure
+
+import indexes
+
+pytestmark = pytest.mark.anyio
+
+# The COLLSCAN check needs a real mongod; mongomock has no query planner
+TEST_MONGO_URL = os.environ.get("TEST_MONGO_URL")
+
+
+class FailingCollection:
+    """Delegates to a mongomock collection but fails index builds with ``error``."""
+
+    def __init__(self, collection, error):
+        self.collection = collection
+        self.error = error
+
+    async def create_indexes(self, models):
+        raise self.error
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+class FailingDatabase:
+    def __init__(self, db, failures):
+        self.db = db
+        self.failures = failures
+
+    def __getitem__(self, name):
+        if name in self.failures:
+            return FailingCollection(self.db[name], self.failures[name])
+        return self.db[name]
+
+
+class ExtraIndexCollection:
+    """Delegates to a mongomock collection, listing ``extra`` indexes mongomock cannot build."""
+
+    def __init__(self, collection, extra):
+        self.collection = collection
+        self.extra = extra
+
+    async def index_information(self):
+        return {**await self.collection.index_information(), **self.extra}
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+class ExtraIndexDatabase:
+    def __init__(self, db, extra):
+        self.db = db
+        self.extra = extra
+
+    def __getitem__(self, name):
+        if name in self.extra:
+            return ExtraIndexCollection(self.db[name], self.extra[name])
+        return self.db[name]
+
+
+async def test_reconcile_continues_past_failed_indexes():
+    db = AsyncMongoMockClient()["gaia_test"]
+    failing = FailingDatabase(db, {
+        "licenses": OperationFailure("disk full", code=14031),
+        "projects": OperationFailure("Index with name: tenant_id_1_id_1 already exists with different options", code=85),
+    })
+    report = await indexes.ensure_indexes(failing)
+
+    assert len(report["licenses"]["failed"]) == len(indexes.INDEX_SPECS["licenses"])
+    assert report["projects"]["failed"] == []
+    assert report["projects"]["created"] == [spec.name for spec in indexes.INDEX_SPECS["projects"]]
+    created = await db.inspections.index_information()
+    assert {spec.name for spec in indexes.INDEX_SPECS["inspections"]} <= set(created)
+
+
+async def test_reconcile_drops_retired_indexes():
+    db = AsyncMongoMockClient()["gaia_test"]
+    await db.upcoming_deadlines.create_index([("source", 1), ("source_id", 1)], name="source_1_source_id_1", unique=True)
+    report = await indexes.ensure_indexes(db)
+
+    assert "source_1_source_id_1" in report["upcoming_deadlines"]["changed"]
+    assert "source_1_source_id_1" not in await db.upcoming_deadlines.index_information()
+
+
+@pytest.mark.skipif(not TEST_MONGO_URL, reason="TEST_MONGO_URL não definido")
+async def test_endpoint_queries_use_indexes():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(TEST_MONGO_URL, serverSelectionTimeoutMS=5000)
+    db = client[f"gaia_test_{uuid.uuid4().hex[:8]}"]
+    try:
+        report = await indexes.ensure_indexes(db)
+        assert not any(entry["failed"] for entry in report.values())
+        assert await indexes.find_collscans(db) == []
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+async def test_special_indexes_are_reported_not_crashed_on():
+    info = {
+        "_id_": {"key": [("_id", 1)]},
+        "title_text": {"key": [("_fts", "text"), ("_ftsx", 1)]},
+        "location_2dsphere": {"key": [("location", "2dsphere")]},
+        "created_at_1": {"key": [("created_at", 1.0)], "expireAfterSeconds": 3600.0},
+    }
+    specs = indexes._existing_specs(info)
+    assert specs["title_text"].keys == (("_fts", "text"), ("_ftsx", 1))
+    assert specs["location_2dsphere"].name == "location_2dsphere"
+    assert specs["created_at_1"] == indexes._idx("created_at", expire_after=3600)
+
+    db = AsyncMongoMockClient()["gaia_test"]
+    report = await indexes.ensure_indexes(ExtraIndexDatabase(db, {"licenses": {"title_text": info["title_text"]}}))
+    assert report["licenses"]["extra"] == ["title_text"]
+    assert report["licenses"]["failed"] == []
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from ingest import BatchParseError, parse_rows
+from tests.conftest import reading_data
+
+pytestmark = pytest.mark.anyio
+
+
+async def ingest(api, tenant_id, body, content_type="application/json", **headers):
+    return await api.post("/api/water-monitoring/batch", params={"tenant_id": tenant_id}, content=body,
+                          headers={"content-type": content_type, **headers})
+
+
+def test_parse_rows_accepts_arrays_and_ndjson():
+    assert parse_rows(b'[{"a": 1}]', "application/json") == [{"a": 1}]
+    assert parse_rows(b'{"a": 1}\n\n{"a": 2}\n', "application/x-ndjson") == [{"a": 1}, {"a": 2}]
+    with pytest.raises(BatchParseError, match="Linha 2"):
+        parse_rows(b'{"a": 1}\n{a}', "application/x-ndjson")
+    with pytest.raises(BatchParseError):
+        parse_rows(b'{"a": 1}', "application/json")
+
+
+async def test_bad_rows_are_reported_without_blocking_the_rest(api, tenant_id):
+    rows = [
+        reading_data(),
+        reading_data(ph_level="ácido"),
+        "não é objeto",
+        # protected fields are the server's: a client id or tenant is ignored
+        reading_data(id="mine", tenant_id="someone-else", ph_level=4.0),
+    ]
+    response = await ingest(api, tenant_id, json.dumps(rows))
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["received"], result["inserted"], result["failed"]) == (4, 2, 2)
+    assert [error["index"] for error in result["errors"]] == [1, 2]
+
+    stored = (await api.get("/api/water-monitoring", params={"tenant_id": tenant_id})).json()
+    assert len(stored) == 2
+    assert "mine" not in [reading["id"] for reading in stored]
+    # readings are evaluated against the CONAMA limits on the way in
+    assert sorted(reading["status"] for reading in stored) == ["Crítico", "Normal"]
+
+
+async def test_ndjson_ingest_is_idempotent(api, tenant_id):
+    body = "\n".join(json.dumps(reading_data(collection_date=f"2024-06-0{day}")) for day in (1, 2, 3))
+    first = await ingest(api, tenant_id, body, "application/x-ndjson", **{"Idempotency-Key": "sensor-1"})
+    retry = await ingest(api, tenant_id, body, "application/x-ndjson", **{"Idempotency-Key": "sensor-1"})
+
+    assert first.json()["inserted"] == retry.json()["inserted"] == 3
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len((await api.get("/api/water-monitoring", params={"tenant_id": tenant_id})).json()) == 3
+
+    malformed = await ingest(api, tenant_id, "{", "application/x-ndjson")
+    assert malformed.status_code == 400
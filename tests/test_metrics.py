@@ -0,0 +1,57 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+import metrics
+from metrics import Histogram, MongoCommandListener, filter_shape
+
+pytestmark = pytest.mark.anyio
+
+
+def sample(text, line_prefix):
+    values = [float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(line_prefix)]
+    return sum(values)
+
+
+async def test_requests_are_counted_by_route_template(api, tenant_id):
+    route = 'gaia_http_requests_total{method="GET",route="/api/licenses/{license_id}",status="404"}'
+    before = sample((await api.get("/metrics")).text, route)
+    for license_id in ("a", "b"):
+        await api.get(f"/api/licenses/{license_id}", params={"tenant_id": tenant_id})
+
+    text = (await api.get("/metrics")).text
+    assert sample(text, route) == before + 2
+    assert "/api/licenses/a" not in text
+    assert 'gaia_http_request_duration_seconds_count{method="GET",route="/api/licenses/{license_id}"}' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h", "help", ("route",), buckets=(1.0, 2.0))
+    for value in (0.5, 1.5, 1.7, 9.0):
+        histogram.observe(value, "/x")
+
+    lines = list(histogram.render())
+    assert lines[2:] == [
+        'h_bucket{route="/x",le="1"} 1', 'h_bucket{route="/x",le="2"} 3', 'h_bucket{route="/x",le="+Inf"} 4',
+        'h_sum{route="/x"} 12.7', 'h_count{route="/x"} 4',
+    ]
+
+
+def test_slow_commands_are_logged_by_shape(monkeypatch, caplog):
+    monkeypatch.setattr(metrics, "SLOW_QUERY_MS", 50)
+    listener = MongoCommandListener()
+    command = {"find": "licenses", "filter": {"tenant_id": "acme", "status": {"$in": ["Ativa", "Vencida"]}}}
+    started = SimpleNamespace(command=command, command_name="find", request_id=1, operation_id=1)
+    finished = SimpleNamespace(command_name="find", request_id=1, operation_id=1, duration_micros=80000,
+                               reply={"cursor": {"firstBatch": [{}, {}, {}]}})
+    before = sample(metrics.render_metrics(), 'gaia_mongo_documents_returned_total{collection="licenses",command="find"}')
+
+    listener.started(started)
+    with caplog.at_level(logging.WARNING, logger="metrics"):
+        listener.succeeded(finished)
+
+    after = sample(metrics.render_metrics(), 'gaia_mongo_documents_returned_total{collection="licenses",command="find"}')
+    assert after == before + 3
+    assert "acme" not in caplog.text and "Ativa" not in caplog.text
+    assert str(filter_shape(command["filter"])) in caplog.text
@@ -0,0 +1,84 @@
+import pytest
+
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_licenses(api, tenant_id, count):
+    ids = []
+    for n in range(count):
+        response = await api.post("/api/licenses", json=license_data(tenant_id, number=f"LO-{n:03d}/2024"))
+        assert response.status_code == 200
+        ids.append(response.json()["id"])
+    return ids
+
+
+async def test_cursor_walks_every_record_once_in_order(api, tenant_id):
+    ids = await create_licenses(api, tenant_id, 5)
+
+    seen, cursor = [], None
+    while True:
+        params = {"tenant_id": tenant_id, "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = await api.get("/api/licenses", params=params)
+        assert response.status_code == 200
+        seen += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == ids
+
+
+async def test_cursor_is_stable_across_inserts(api, tenant_id):
+    ids = await create_licenses(api, tenant_id, 3)
+    first = await api.get("/api/licenses", params={"tenant_id": tenant_id, "limit": 2})
+    cursor = first.headers["X-Next-Cursor"]
+
+    # keyset cursors continue after the last row, whatever was added since
+    later = await create_licenses(api, tenant_id, 1)
+    second = await api.get("/api/licenses", params={"tenant_id": tenant_id, "limit": 2, "cursor": cursor})
+    assert [item["id"] for item in second.json()] == ids[2:] + later
+
+
+async def test_total_count_on_request(api, tenant_id):
+    await create_licenses(api, tenant_id, 3)
+    response = await api.get("/api/licenses", params={"tenant_id": tenant_id, "limit": 1, "include_total": "true"})
+    assert response.headers["X-Total-Count"] == "3"
+
+
+async def test_invalid_cursor_is_rejected(api, tenant_id):
+    response = await api.get("/api/licenses", params={"tenant_id": tenant_id, "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+async def test_list_etag_answers_304_until_a_write(api, tenant_id):
+    await create_licenses(api, tenant_id, 2)
+    params = {"tenant_id": tenant_id}
+    first = await api.get("/api/licenses", params=params)
+    etag = first.headers["ETag"]
+
+    cached = await api.get("/api/licenses", params=params, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+
+    # another page of the same collection has its own tag
+    other = await api.get("/api/licenses", params={**params, "limit": 1}, headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+    await create_licenses(api, tenant_id, 1)
+    changed = await api.get("/api/licenses", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()) == 3
+
+
+async def test_request_without_limit_returns_the_whole_list(api, tenant_id):
+    data = {k: v for k, v in license_data(tenant_id).items() if k != "tenant_id"}
+    operations = [{"op": "create", "id": f"LIC-{n:03d}", "data": {**data, "number": f"LO-{n:03d}/2024"}} for n in range(150)]
+    created = await api.post("/api/licenses/batch", params={"tenant_id": tenant_id}, json={"operations": operations})
+    assert created.status_code == 200, created.text
+
+    # the frontend loads lists without a cursor; they must not be cut short
+    response = await api.get("/api/licenses", params={"tenant_id": tenant_id})
+    assert len(response.json()) == 150
+    assert "X-Next-Cursor" not in response.headers
@@ -0,0 +1,56 @@
+import pytest
+
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+
+async def module_page(api, owner, **params):
+    response = await api.get("/api/portfolio/licenses", params={"tenant_id": owner, **params})
+    assert response.status_code == 200, response.text
+    return response
+
+
+async def test_module_page_groups_by_tenant_and_follows_writes(api, tenant_id):
+    clients = [tenant_id + "-a", tenant_id + "-b"]
+    for client in clients:
+        await api.post("/api/licenses", json=license_data(client))
+    members = ",".join(clients)
+
+    groups = (await module_page(api, tenant_id, tenant_ids=members)).json()
+    assert [(g["tenant_id"], len(g["items"])) for g in groups] == [(clients[0], 1), (clients[1], 1)]
+
+    # a member's write drops the cached page
+    await api.post("/api/licenses", json=license_data(clients[1], number="LO-002/2024"))
+    groups = (await module_page(api, tenant_id, tenant_ids=members)).json()
+    assert [len(g["items"]) for g in groups] == [1, 2]
+
+
+async def test_module_pages_across_tenants(api, tenant_id):
+    clients = [tenant_id + "-a", tenant_id + "-b"]
+    for client in clients:
+        for number in ("LO-001/2024", "LO-002/2024"):
+            await api.post("/api/licenses", json=license_data(client, number=number))
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"tenant_ids": ",".join(clients), "limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = await module_page(api, tenant_id, **params)
+        seen += [(g["tenant_id"], item["number"]) for g in response.json() for item in g["items"]]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == [(c, n) for c in clients for n in ("LO-001/2024", "LO-002/2024")]
+
+
+async def test_saved_portfolios_belong_to_their_owner(api, tenant_id):
+    other = tenant_id + "-x"
+    saved = await api.put("/api/portfolios/main", params={"tenant_id": tenant_id},
+                          json={"name": "Clientes", "tenant_ids": [other + "-b", other + "-a", other + "-a"]})
+    assert saved.json()["tenant_ids"] == [other + "-a", other + "-b"]
+
+    assert (await api.get("/api/portfolios/main", params={"tenant_id": other})).status_code == 404
+    assert (await module_page(api, tenant_id, portfolio_id="main")).json() == []
+    missing = await api.get("/api/portfolio/licenses", params={"tenant_id": tenant_id})
+    assert missing.status_code == 400
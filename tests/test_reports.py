@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+import pytest
+
+from report_writers import WRITERS, ReportWriter
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def service(api, tmp_path, monkeypatch):
+    """The report service writing to a scratch directory, generating on a thread instead of a process."""
+    import server
+    from reports import DiskStorage
+
+    service = server.report_service
+    monkeypatch.setattr(service, "storage", DiskStorage(tmp_path))
+    monkeypatch.setattr(service, "_executor", lambda: None)
+    return service
+
+
+class InterleavedCollection:
+    """Delegates to a mongomock collection, letting other tasks run before each awaited call as a server round trip would."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        attribute = getattr(self.collection, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return await attribute(*args, **kwargs)
+        return call
+
+
+class InterleavedDatabase:
+    def __init__(self, db):
+        self.db = db
+
+    def __getitem__(self, name):
+        return InterleavedCollection(self.db[name])
+
+
+async def submit(api, tenant_id):
+    return await api.post("/api/reports", params={"tenant_id": tenant_id}, json={"modules": ["licenses"]})
+
+
+async def settle(service):
+    await asyncio.gather(*service._tasks, return_exceptions=True)
+
+
+def test_writers_implement_every_method():
+    class Partial(ReportWriter):
+        def row(self, values):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+    assert all(issubclass(writer, ReportWriter) for writer in WRITERS.values())
+
+
+async def test_report_is_generated_and_downloaded(api, tenant_id, service, monkeypatch):
+    monkeypatch.setattr(service, "generate", lambda spec, path: open(path, "wb").write(b"report") and {"rows": 1, "size": 6})
+
+    job = (await submit(api, tenant_id)).json()
+    await settle(service)
+
+    stored = (await api.get(f"/api/reports/{job['id']}", params={"tenant_id": tenant_id})).json()
+    assert stored["status"] == "done"
+    download = await api.get(f"/api/reports/{job['id']}/download", params={"tenant_id": tenant_id})
+    assert download.content == b"report"
+
+
+async def test_active_jobs_are_capped_under_concurrent_submits(api, tenant_id, service, monkeypatch):
+    from reports import MAX_ACTIVE_JOBS_PER_TENANT
+
+    release = threading.Event()
+
+    def generate(spec, path):
+        release.wait(10)
+        open(path, "wb").close()
+        return {"rows": 0, "size": 0}
+
+    monkeypatch.setattr(service, "generate", generate)
+    monkeypatch.setattr(service, "db", InterleavedDatabase(service.db))
+    try:
+        responses = await asyncio.gather(*(submit(api, tenant_id) for _ in range(MAX_ACTIVE_JOBS_PER_TENANT + 3)))
+        assert sorted(r.status_code for r in responses) == [202] * MAX_ACTIVE_JOBS_PER_TENANT + [429] * 3
+    finally:
+        release.set()
+        await settle(service)
+    # finished jobs give their slots back
+    assert (await submit(api, tenant_id)).status_code == 202
+    await settle(service)
+
+
+async def test_job_deleted_while_running_leaves_no_artifact(api, tenant_id, service, tmp_path, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def generate(spec, path):
+        started.set()
+        release.wait(10)
+        open(path, "wb").write(b"report")
+        return {"rows": 1, "size": 6}
+
+    monkeypatch.setattr(service, "generate", generate)
+    job = (await submit(api, tenant_id)).json()
+    while not started.is_set():
+        await asyncio.sleep(0.01)
+    deleted = await api.delete(f"/api/reports/{job['id']}", params={"tenant_id": tenant_id})
+    assert deleted.status_code == 200
+    release.set()
+    await settle(service)
+
+    assert not (tmp_path / tenant_id).exists() or not any((tmp_path / tenant_id).iterdir())
+    assert not any((tmp_path / "tmp").iterdir())
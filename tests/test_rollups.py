@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from rollups import bin_key, choose_resolution, parse_timestamp, percentile
+from tests.conftest import reading_data
+
+pytestmark = pytest.mark.anyio
+
+DAY = {"start": "2024-06-01T00:00:00", "end": "2024-06-02T00:00:00"}
+
+
+async def ingest(api, tenant_id, rows):
+    response = await api.post("/api/water-monitoring/batch", params={"tenant_id": tenant_id}, content=json.dumps(rows))
+    assert response.json()["inserted"] == len(rows)
+
+
+async def series(api, tenant_id, **params):
+    params = {"tenant_id": tenant_id, "location": "Poço 1", "parameter": "ph_level", **DAY, **params}
+    response = await api.get("/api/water-monitoring/series", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_percentiles_keep_about_one_percent_error():
+    values = [float(v) for v in range(1, 1001)]
+    hist = {}
+    for value in values:
+        hist[bin_key(value)] = hist.get(bin_key(value), 0) + 1
+    assert percentile(hist, 0.5) == pytest.approx(500, rel=0.02)
+    assert percentile(hist, 0.95) == pytest.approx(950, rel=0.02)
+    assert percentile({}, 0.5) is None
+
+
+def test_resolution_follows_the_range():
+    start = parse_timestamp("2024-06-01T00:00:00Z")
+    assert choose_resolution(start, parse_timestamp("2024-06-03T00:00:00")) == "raw"
+    assert choose_resolution(start, parse_timestamp("2024-07-01T00:00:00")) == "hour"
+    assert choose_resolution(start, parse_timestamp("2025-06-01T00:00:00")) == "day"
+
+
+async def test_hourly_and_daily_buckets_summarise_the_readings(api, tenant_id):
+    rows = [reading_data(collection_date=f"2024-06-01T{hour:02d}:{minute:02d}:00", ph_level=ph)
+            for hour, minute, ph in [(10, 0, 6.0), (10, 30, 8.0), (11, 15, 7.0)]]
+    await ingest(api, tenant_id, rows + [reading_data(location="Poço 2", collection_date="2024-06-01T10:00:00")])
+
+    hourly = await series(api, tenant_id, resolution="hour")
+    assert [(p["count"], p["min"], p["max"], p["mean"]) for p in hourly["points"]] == [(2, 6.0, 8.0, 7.0), (1, 7.0, 7.0, 7.0)]
+
+    daily = (await series(api, tenant_id, resolution="day"))["points"]
+    assert [(p["count"], p["mean"]) for p in daily] == [(3, 7.0)]
+    assert daily[0]["p50"] == pytest.approx(7.0, rel=0.02)
+
+    raw = await series(api, tenant_id, resolution="raw")
+    assert [p["mean"] for p in raw["points"]] == [6.0, 8.0, 7.0]
+
+    # downsampling merges neighbouring buckets
+    merged = await series(api, tenant_id, resolution="hour", max_points=1)
+    assert [(p["count"], p["min"], p["max"]) for p in merged["points"]] == [(3, 6.0, 8.0)]
+
+
+async def test_rebuild_matches_the_incremental_rollups(api, tenant_id):
+    await ingest(api, tenant_id, [reading_data(collection_date=f"2024-06-01T{hour:02d}:00:00", ph_level=6 + hour / 10)
+                                  for hour in range(0, 24, 3)])
+    incremental = await series(api, tenant_id, resolution="hour")
+
+    response = await api.post("/api/water-monitoring/rollups/rebuild", params={"tenant_id": tenant_id})
+    assert response.json()["readings"] == 8
+    assert await series(api, tenant_id, resolution="hour") == incremental
+
+
+async def test_series_rejects_unknown_parameters(api, tenant_id):
+    response = await api.get("/api/water-monitoring/series", params={
+        "tenant_id": tenant_id, "location": "Poço 1", "parameter": "chumbo", **DAY})
+    assert response.status_code == 400
@@ -0,0 +1,59 @@
+import pytest
+
+import search
+from search import _search_collection, _trigram_rank, fuzzy_keys, min_shared_trigrams, query_terms
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+UNSEARCHED = {"number": "", "cnpj": "", "activity_type": "Lavra", "issuing_body": "DNPM"}
+
+
+async def create(api, tenant_id, **fields):
+    response = await api.post("/api/licenses", json=license_data(tenant_id, **UNSEARCHED, **fields))
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+async def found(api, tenant_id, q):
+    response = await api.get("/api/search", params={"tenant_id": tenant_id, "q": q})
+    assert response.status_code == 200, response.text
+    return [hit["item"]["id"] for hit in response.json()]
+
+
+async def test_accents_stems_and_prefixes_match(api, tenant_id):
+    license_id = await create(api, tenant_id, title="Licença Prévia", company="Minerais Tupi")
+
+    for q in ("licenca previa", "Licenças", "minera", "LICEN"):
+        assert await found(api, tenant_id, q) == [license_id], q
+
+
+async def test_prefix_matches_are_ranked_before_the_cap(api, tenant_id, monkeypatch):
+    monkeypatch.setattr(search, "CANDIDATES_PER_COLLECTION", 1)
+    # two prefixes in the heaviest fields against one whole word in the lightest
+    prefixes = await create(api, tenant_id, title="Licença", company="Minerais Tupi")
+    await create(api, tenant_id, title="Outorga", company="Agro Vale", description="Barragem")
+
+    assert await found(api, tenant_id, "licen miner barragem") == [prefixes]
+
+
+async def test_typo_finds_the_word(api, tenant_id):
+    license_id = await create(api, tenant_id, title="Plano de sustentabilidade", company="Agro Vale")
+
+    assert await found(api, tenant_id, "sustentabelidade") == [license_id]
+    assert await found(api, tenant_id, "sutentabilidade") == [license_id]
+
+
+async def test_fuzzy_candidates_share_enough_trigrams(api, tenant_id):
+    import server
+
+    await create(api, tenant_id, title="Plano de sustentabilidade", company="Agro Vale")
+    await create(api, tenant_id, title="Suporte", company="Agro Vale")
+    query = query_terms("sustentabelidade")
+    keys = fuzzy_keys(query)
+
+    assert min_shared_trigrams(query) > 1
+    assert min_shared_trigrams(query_terms("licensa")) == 1
+    _, documents = await _search_collection(server.db, "licenses", tenant_id, {"$in": keys}, _trigram_rank(keys),
+                                            {"_id": 0, "id": 1}, min_shared_trigrams(query))
+    assert [document["title"] for document in documents] == ["Plano de sustentabilidade"]
@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+from tests.conftest import BACKEND_DIR
+
+DEFERRED = ["pandas", "numpy", "PIL", "reports", "report_writers", "evidence", "compliance", "indexes", "routers.reports"]
+
+
+def test_import_server_leaves_feature_modules_unloaded():
+    code = f"import json, sys, server; print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env={**os.environ, "PYTHONPATH": str(BACKEND_DIR)},
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+@pytest.mark.anyio
+async def test_lazy_router_loads_on_first_request(api, tenant_id):
+    # a scratch app, as earlier tests may have loaded the server's routers already
+    from fastapi import FastAPI
+    from lazy_routes import LazyRouters, LazyRoutesMiddleware
+
+    app = FastAPI()
+    routers = LazyRouters(app, {"routers.reports": ["/api/reports"]})
+    transport = httpx.ASGITransport(app=LazyRoutesMiddleware(app, routers=routers))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/api/other")).status_code == 404
+        assert routers.loaded == set()
+        response = await client.get("/api/reports", params={"tenant_id": tenant_id})
+
+    assert response.status_code == 200, response.text
+    assert routers.loaded == {"routers.reports"}
@@ -0,0 +1,106 @@
+import pytest
+
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+
+def data(tenant_id, **fields):
+    return {k: v for k, v in license_data(tenant_id, **fields).items() if k != "tenant_id"}
+
+
+async def push(api, tenant_id, *mutations):
+    response = await api.post("/api/sync", params={"tenant_id": tenant_id}, json={"mutations": list(mutations)})
+    assert response.status_code == 200, response.text
+    return response.json()["results"]
+
+
+async def pull(api, tenant_id, since=None):
+    params = {"tenant_id": tenant_id, "modules": "licenses", **({"since": since} if since else {})}
+    response = await api.get("/api/sync", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_create_then_edit_in_one_push(api, tenant_id):
+    results = await push(
+        api, tenant_id,
+        {"module": "licenses", "op": "upsert", "id": "LIC-1", "data": data(tenant_id)},
+        {"module": "licenses", "op": "upsert", "id": "LIC-1", "base_version": 1, "data": {"title": "Renovada"}},
+    )
+    assert [(r["status"], r["version"]) for r in results] == [("applied", 1), ("applied", 2)]
+    assert results[1]["document"]["title"] == "Renovada"
+
+
+async def test_stale_base_version_conflicts_with_the_server_copy(api, tenant_id):
+    await push(api, tenant_id, {"module": "licenses", "op": "upsert", "id": "LIC-1", "data": data(tenant_id)})
+    await push(api, tenant_id, {"module": "licenses", "op": "upsert", "id": "LIC-1", "base_version": 1, "data": {"title": "Servidor"}})
+
+    results = await push(api, tenant_id, {"module": "licenses", "op": "upsert", "id": "LIC-1", "base_version": 1, "data": {"title": "Cliente"}})
+    assert results[0]["status"] == "conflict"
+    assert results[0]["version"] == 2
+    assert results[0]["document"]["title"] == "Servidor"
+
+    # creating an id that exists is a conflict too, never an overwrite
+    results = await push(api, tenant_id, {"module": "licenses", "op": "upsert", "id": "LIC-1", "data": data(tenant_id, title="Outro")})
+    assert results[0]["status"] == "conflict"
+    stored = await api.get("/api/licenses/LIC-1", params={"tenant_id": tenant_id})
+    assert stored.json()["title"] == "Servidor"
+
+
+async def test_stale_delete_conflicts(api, tenant_id):
+    await push(api, tenant_id, {"module": "licenses", "op": "upsert", "id": "LIC-1", "data": data(tenant_id)})
+    await push(api, tenant_id, {"module": "licenses", "op": "upsert", "id": "LIC-1", "base_version": 1, "data": {"title": "Editada"}})
+
+    results = await push(api, tenant_id, {"module": "licenses", "op": "delete", "id": "LIC-1", "base_version": 1})
+    assert results[0]["status"] == "conflict"
+    assert (await api.get("/api/licenses/LIC-1", params={"tenant_id": tenant_id})).status_code == 200
+
+
+async def test_pull_sends_tombstones_for_deletes(api, tenant_id):
+    await push(api, tenant_id,
+               {"module": "licenses", "op": "upsert", "id": "LIC-1", "data": data(tenant_id)},
+               {"module": "licenses", "op": "upsert", "id": "LIC-2", "data": data(tenant_id, number="LO-002/2024")})
+
+    first = await pull(api, tenant_id)
+    assert first["reset"] == ["licenses"]
+    assert sorted(doc["id"] for doc in first["changes"]["licenses"]) == ["LIC-1", "LIC-2"]
+
+    results = await push(api, tenant_id, {"module": "licenses", "op": "delete", "id": "LIC-1", "base_version": 1})
+    assert results[0]["status"] == "applied"
+
+    second = await pull(api, tenant_id, first["next"])
+    assert second["reset"] == []
+    assert second["deleted"]["licenses"] == ["LIC-1"]
+    assert "LIC-1" not in [doc["id"] for doc in second["changes"]["licenses"]]
+
+
+async def test_tombstones_stay_in_their_tenant(api, tenant_id):
+    other = tenant_id + "-b"
+    for tenant in (tenant_id, other):
+        await push(api, tenant, {"module": "licenses", "op": "upsert", "id": "LIC-1", "data": data(tenant)})
+    tokens = {tenant: (await pull(api, tenant))["next"] for tenant in (tenant_id, other)}
+
+    await push(api, tenant_id, {"module": "licenses", "op": "delete", "id": "LIC-1", "base_version": 1})
+
+    assert (await pull(api, tenant_id, tokens[tenant_id]))["deleted"]["licenses"] == ["LIC-1"]
+    assert (await pull(api, other, tokens[other]))["deleted"]["licenses"] == []
+
+
+async def test_edits_take_documents_from_before_versioning_to_version_2(api, tenant_id):
+    import server
+
+    first = (await api.post("/api/licenses", json=license_data(tenant_id))).json()["id"]
+    second = (await api.post("/api/licenses", json=license_data(tenant_id))).json()["id"]
+    await server.db.licenses.update_many({"tenant_id": tenant_id}, {"$unset": {"version": ""}})
+
+    edited = await api.patch(f"/api/licenses/{first}", params={"tenant_id": tenant_id}, json={"title": "Editada"},
+                             headers={"If-Match": '"1"'})
+    assert edited.status_code == 200, edited.text
+    batch = await api.post("/api/licenses/batch", params={"tenant_id": tenant_id}, json={"operations": [
+        {"op": "update", "id": second, "base_version": 1, "data": {"title": "Em lote"}},
+    ]})
+    assert batch.json()["results"][0]["version"] == 2
+
+    stored = {d["id"]: d["version"] async for d in server.db.licenses.find({"tenant_id": tenant_id})}
+    assert stored == {first: 2, second: 2}
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+
+def soon(days: int) -> str:
+    return (datetime.now(timezone.utc) + timedelta(days=days)).date().isoformat()
+
+
+async def create_with_id(api, tenant_id, license_id, **fields):
+    data = {k: v for k, v in license_data(tenant_id, **fields).items() if k != "tenant_id"}
+    response = await api.post("/api/licenses/batch", params={"tenant_id": tenant_id},
+                              json={"operations": [{"op": "create", "id": license_id, "data": data}]})
+    assert response.status_code == 200, response.text
+    return response
+
+
+async def deadline_ids(api, tenant_id):
+    response = await api.get("/api/deadlines", params={"tenant_id": tenant_id, "days": 60})
+    assert response.status_code == 200
+    return [(row["source"], row["source_id"]) for row in response.json()]
+
+
+async def test_reads_never_cross_tenants(api, tenant_id):
+    response = await api.post("/api/licenses", json=license_data(tenant_id))
+    license_id = response.json()["id"]
+    other = tenant_id + "-b"
+
+    assert (await api.get(f"/api/licenses/{license_id}", params={"tenant_id": other})).status_code == 404
+    assert (await api.get("/api/licenses", params={"tenant_id": other})).json() == []
+    deleted = await api.delete(f"/api/licenses/{license_id}", params={"tenant_id": other})
+    assert deleted.status_code == 404
+    assert (await api.get(f"/api/licenses/{license_id}", params={"tenant_id": tenant_id})).status_code == 200
+
+
+async def test_same_client_id_keeps_one_deadline_per_tenant(api, tenant_id):
+    other = tenant_id + "-b"
+    await create_with_id(api, tenant_id, "LIC-1", expiry_date=soon(10))
+    await create_with_id(api, other, "LIC-1", expiry_date=soon(20))
+
+    assert await deadline_ids(api, tenant_id) == [("licenses", "LIC-1")]
+    assert await deadline_ids(api, other) == [("licenses", "LIC-1")]
+
+    response = await api.delete("/api/licenses/LIC-1", params={"tenant_id": tenant_id})
+    assert response.status_code == 200
+    assert await deadline_ids(api, tenant_id) == []
+    assert await deadline_ids(api, other) == [("licenses", "LIC-1")]
+
+
+async def test_expiry_only_touches_the_expired_tenant(api, tenant_id):
+    import server
+    from deadlines import expire_licenses
+
+    other = tenant_id + "-b"
+    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).date().isoformat()
+    await create_with_id(api, tenant_id, "LIC-1", expiry_date=yesterday)
+    await create_with_id(api, other, "LIC-1", expiry_date=soon(30))
+
+    assert await expire_licenses(server.db) == [tenant_id]
+
+    expired = await api.get("/api/licenses/LIC-1", params={"tenant_id": tenant_id})
+    active = await api.get("/api/licenses/LIC-1", params={"tenant_id": other})
+    assert expired.json()["status"] == "Vencida"
+    assert active.json()["status"] == "Ativa"
+    deadline = await server.db.upcoming_deadlines.find_one({"tenant_id": other, "source_id": "LIC-1"})
+    assert deadline["status"] == "Ativa"
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+import tenancy
+from tenancy import ACTIVE, Tenant, TenantLimiter, TenantLimits, TenantRejected
+from tests.conftest import license_data
+
+pytestmark = pytest.mark.anyio
+
+
+async def set_limits(tenant_id, **limits):
+    import server
+
+    await server.db.tenants.update_one({"tenant_id": tenant_id}, {"$set": {"limits": limits}}, upsert=True)
+    server.tenant_directory.invalidate(tenant_id)
+
+
+async def test_rate_limit_answers_429_after_the_burst(api, tenant_id):
+    await set_limits(tenant_id, rate=0.01, burst=3)
+    params = {"tenant_id": tenant_id}
+    statuses = [(await api.get("/api/licenses", params=params)).status_code for _ in range(4)]
+
+    assert statuses == [200, 200, 200, 429]
+    throttled = await api.get("/api/licenses", params=params)
+    assert int(throttled.headers["Retry-After"]) >= 1
+
+
+async def test_rate_limit_is_per_tenant(api, tenant_id):
+    await set_limits(tenant_id, rate=0.01, burst=1)
+    other = tenant_id + "-b"
+    assert (await api.get("/api/licenses", params={"tenant_id": tenant_id})).status_code == 200
+    assert (await api.get("/api/licenses", params={"tenant_id": tenant_id})).status_code == 429
+    assert (await api.get("/api/licenses", params={"tenant_id": other})).status_code == 200
+
+
+async def test_large_pages_cost_more(api, tenant_id):
+    await set_limits(tenant_id, rate=0.01, burst=6)
+    params = {"tenant_id": tenant_id}
+    # a 1000-row page costs five tokens
+    assert (await api.get("/api/licenses", params={**params, "limit": 1000})).status_code == 200
+    assert (await api.get("/api/licenses", params={**params, "limit": 1000})).status_code == 429
+    assert (await api.get("/api/licenses", params=params)).status_code == 200
+
+
+async def test_suspended_tenant_is_refused(api, tenant_id):
+    import server
+
+    await server.db.tenants.update_one({"tenant_id": tenant_id}, {"$set": {"status": "suspended"}}, upsert=True)
+    server.tenant_directory.invalidate(tenant_id)
+    assert (await api.get("/api/licenses", params={"tenant_id": tenant_id})).status_code == 403
+
+
+async def test_concurrency_slots_queue_then_reject(monkeypatch):
+    monkeypatch.setattr(tenancy, "QUEUE_TIMEOUT", 0.05)
+    limiter = TenantLimiter(workers=1)
+    tenant = Tenant("t", ACTIVE, TenantLimits(rate=100, burst=100, max_concurrency=2, query_budget_ms=5000))
+    other = Tenant("u", ACTIVE, tenant.limits)
+
+    held = [await limiter.acquire(tenant), await limiter.acquire(tenant)]
+    with pytest.raises(TenantRejected) as rejected:
+        await limiter.acquire(tenant)
+    assert rejected.value.status_code == 429
+    # slots are per tenant
+    (await limiter.acquire(other)).release()
+
+    # a queued request gets the slot freed within the timeout
+    waiting = asyncio.ensure_future(limiter.acquire(tenant))
+    held.pop().release()
+    (await waiting).release()
+    for slots in held:
+        slots.release()
+
+
+async def test_concurrency_limit_over_http(api, tenant_id, monkeypatch):
+    import server
+
+    monkeypatch.setattr(tenancy, "QUEUE_TIMEOUT", 0.05)
+    await set_limits(tenant_id, max_concurrency=1)
+    tenant = await server.tenant_directory.resolve(server.db, tenant_id)
+    slot = await server.tenant_limiter.acquire(tenant)
+    try:
+        busy = await api.get("/api/licenses", params={"tenant_id": tenant_id})
+    finally:
+        slot.release()
+    assert busy.status_code == 429
+    assert (await api.get("/api/licenses", params={"tenant_id": tenant_id})).status_code == 200
+
+
+async def test_query_and_body_tenants_must_agree(api, tenant_id):
+    other = tenant_id + "-b"
+    response = await api.post("/api/licenses", params={"tenant_id": other}, json=license_data(tenant_id))
+    assert response.status_code == 400
+    assert (await api.get("/api/licenses", params={"tenant_id": tenant_id})).json() == []
+
+    same = await api.post("/api/licenses", params={"tenant_id": tenant_id}, json=license_data(tenant_id))
+    assert same.status_code == 200
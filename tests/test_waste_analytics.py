@@ -0,0 +1,45 @@
+import pytest
+
+from tests.conftest import waste_data
+from waste_analytics import mtr_key, normalize_quantity
+
+pytestmark = pytest.mark.anyio
+
+
+async def analytics(api, tenant_id):
+    response = await api.get("/api/waste/analytics", params={"tenant_id": tenant_id, "start": "2024-01", "end": "2024-12"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_quantities_fold_into_kilograms_and_cubic_metres():
+    assert normalize_quantity("2", "Toneladas") == ("mass_kg", 2000.0)
+    assert normalize_quantity(500, "Litros") == ("volume_m3", 0.5)
+    assert normalize_quantity(3, "m³") == ("volume_m3", 3.0)
+    assert normalize_quantity(3, "tambores") == (None, 0.0)
+    assert mtr_key(" mtr 0001 ") == "MTR0001"
+    assert mtr_key("  ") is None
+
+
+async def test_cached_totals_follow_writes(api, tenant_id):
+    await api.post("/api/waste", json=waste_data(tenant_id))
+    first = await analytics(api, tenant_id)
+    assert first["totals"] == [{"classification": "Não perigoso", "count": 1, "mass_kg": 120.0, "volume_m3": 0.0, "unknown_unit": 0}]
+
+    await api.post("/api/waste", json=waste_data(tenant_id, quantity=2, unit="t", mtr_number="MTR-0002"))
+    second = await analytics(api, tenant_id)
+    assert second["totals"][0]["count"] == 2
+    assert second["totals"][0]["mass_kg"] == 2120.0
+
+
+async def test_inventory_reports_duplicate_and_missing_mtrs(api, tenant_id):
+    await api.post("/api/waste", json=waste_data(tenant_id))
+    await api.post("/api/waste", json=waste_data(tenant_id, mtr_number=" mtr-0001", collection_date="2024-08-01"))
+    await api.post("/api/waste", json=waste_data(tenant_id, mtr_number=""))
+
+    response = await api.get("/api/waste/inventory", params={"tenant_id": tenant_id, "year": 2024})
+    assert response.status_code == 200, response.text
+    inventory = response.json()
+    assert inventory["totals"][0]["count"] == 3
+    assert [row["month"] for row in inventory["monthly"]] == ["2024-07", "2024-08"]
+    assert inventory["mtr"] == {"duplicated_mtrs": 1, "missing_mtr_records": 1}
@@ -0,0 +1,66 @@
+import json
+
+import pandas as pd
+import pytest
+
+from tests.conftest import reading_data
+from water_quality import STATUS_ATTENTION, STATUS_CRITICAL, STATUS_NORMAL, evaluate_frame, evaluate_readings
+
+pytestmark = pytest.mark.anyio
+
+
+async def put_limits(api, tenant_id, **settings):
+    return await api.put("/api/water-monitoring/limits", params={"tenant_id": tenant_id}, json=settings)
+
+
+def test_instant_limits_follow_the_station_class():
+    readings = [reading_data(turbidity=60.0), reading_data(location="Nascente", turbidity=60.0), reading_data(ph_level=5.0)]
+    evaluate_readings(readings, {"location_classes": {"Nascente": "Classe 1"}})
+
+    assert [r["status"] for r in readings] == [STATUS_NORMAL, STATUS_CRITICAL, STATUS_CRITICAL]
+    assert readings[1]["exceedances"] == ["turbidity"]
+    assert readings[2]["exceedances"] == ["ph_level"]
+
+
+def frame_of(parameter, values):
+    return pd.DataFrame([reading_data(collection_date=f"2024-06-{day + 1:02d}", **{parameter: value})
+                         for day, value in enumerate(values)])
+
+
+def test_rolling_mean_and_trend_breaks_need_attention():
+    # the last sample is within the limit, but the mean of its window is not
+    result = evaluate_frame(frame_of("turbidity", [60.0, 60.0, 60.0, 60.0, 39.0]), {"default_class": "Classe 1"})
+    assert result["status"].tolist() == [STATUS_CRITICAL] * 4 + [STATUS_ATTENTION]
+
+    # a legal pH far outside the station's recent spread
+    result = evaluate_frame(frame_of("ph_level", [7.0, 7.1] * 5 + [8.5]))
+    assert result["status"].tolist() == [STATUS_NORMAL] * 10 + [STATUS_ATTENTION]
+
+
+async def test_malformed_overrides_are_rejected(api, tenant_id):
+    for overrides in (
+        {"Classe 2": {"ph_level": [6.5]}},
+        {"Classe 2": {"ph_level": [6.5, 8.5, 9.0]}},
+        {"Classe 2": {"chumbo": [None, 0.01]}},
+        {"Classe 2": {"ph_level": [9.0, 6.0]}},
+        {" ": {"ph_level": [6.0, 9.0]}},
+    ):
+        response = await put_limits(api, tenant_id, overrides=overrides)
+        assert response.status_code == 422, overrides
+
+    unknown_class = await put_limits(api, tenant_id, default_class="Classe 9")
+    assert unknown_class.status_code == 400
+
+
+async def test_new_limits_reevaluate_history(api, tenant_id):
+    rows = [reading_data(collection_date=f"2024-06-0{day}T10:00:00", turbidity=80.0) for day in (1, 2)]
+    await api.post("/api/water-monitoring/batch", params={"tenant_id": tenant_id}, content=json.dumps(rows))
+
+    response = await put_limits(api, tenant_id, overrides={"Classe 2": {"turbidity": [None, 50.0]}})
+    assert response.status_code == 200, response.text
+    assert response.json()["changed"] == 2
+
+    stored = (await api.get("/api/water-monitoring", params={"tenant_id": tenant_id})).json()
+    assert {r["status"] for r in stored} == {STATUS_CRITICAL}
+    limits = (await api.get("/api/water-monitoring/limits", params={"tenant_id": tenant_id})).json()
+    assert limits["limits"]["Classe 2"]["turbidity"] == [None, 50.0]